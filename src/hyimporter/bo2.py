@@ -5,6 +5,8 @@ from typing import Dict, List
 
 import numpy as np
 
+from .utils import atomic_path
+
 
 def _block_id_for_label(label_name: str, block_ids: Dict[str, int]) -> int:
     if label_name in block_ids:
@@ -50,5 +52,5 @@ def export_tile_bo2(
 
             lines.append(f"{x},{top},{z},{top_id}")
 
-    path.parent.mkdir(parents=True, exist_ok=True)
-    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    with atomic_path(path) as tmp:
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
@@ -2,15 +2,63 @@ from __future__ import annotations
 
 import argparse
 import json
+from typing import Dict, List, Tuple
 
 from .config import load_config, map_output_dir
-from .export import run_pipeline
+from .export import merge_shards, preview_height_fit, run_pipeline
 from .importer_mcp import run_importer_mcp_review
+from .preflight import run_preflight
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """``"K/N"`` -> ``(K, N)`` with ``1 <= K <= N``."""
+    try:
+        k, n = (int(v) for v in text.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"--shard expects K/N, got {text!r}") from None
+    if not 1 <= k <= n:
+        raise argparse.ArgumentTypeError(f"--shard expects 1 <= K <= N, got {text!r}")
+    return k, n
+
+
+def parse_tile_list(text: str) -> List[Tuple[int, int]]:
+    """``"0_0,0_1"`` -> ``[(0, 0), (0, 1)]`` (tile ``i_j`` names as in ``tile_<i>_<j>``)."""
+    out: List[Tuple[int, int]] = []
+    for item in text.split(","):
+        item = item.strip().removeprefix("tile_")
+        try:
+            i, j = (int(v) for v in item.split("_"))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"--tiles expects i_j[,i_j...], got {item!r}") from None
+        out.append((i, j))
+    return out
 
 
 def parse_args() -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Build Hytale OBJ tiles from WoW exports")
+    p.add_argument(
+        "command",
+        nargs="?",
+        choices=["build", "merge"],
+        default="build",
+        help="build (default), or merge the shard outputs of a multi-host build into the final manifest/summary/QA.",
+    )
     p.add_argument("--config", required=True, help="Path to YAML config")
+    shards = p.add_mutually_exclusive_group()
+    shards.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        metavar="K/N",
+        help="Export only shard K of N (cost-balanced, identical on every host); finish with the merge command.",
+    )
+    shards.add_argument(
+        "--tiles",
+        type=parse_tile_list,
+        default=None,
+        metavar="I_J,...",
+        help="Export only these tiles as one shard; finish with the merge command.",
+    )
     p.add_argument(
         "--allow-8bit-height",
         action="store_true",
@@ -27,6 +75,11 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Tile export worker count for async mode (0=auto, default from config).",
     )
+    p.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted build: keep finished tiles and export only missing or incomplete ones.",
+    )
     p.add_argument(
         "--skip-importer-mcp",
         action="store_true",
@@ -38,7 +91,20 @@ def parse_args() -> argparse.Namespace:
         default="none",
         help="Optional quality gate behavior for Importer_MCP review.",
     )
-    return p.parse_args()
+    p.add_argument(
+        "--height-fit-preview",
+        action="store_true",
+        help="Print height fit stats from the cached height histogram and exit (fast gamma/margin tuning).",
+    )
+    p.add_argument(
+        "--preflight",
+        action="store_true",
+        help="Scan input headers only (bit depth, shapes, layers, RAM/output estimates), print JSON and exit.",
+    )
+    args = p.parse_args()
+    if args.command == "merge" and (args.shard is not None or args.tiles is not None):
+        p.error("merge combines every shard under runbook/shards/; drop --shard/--tiles")
+    return args
 
 
 def main() -> None:
@@ -50,13 +116,48 @@ def main() -> None:
         if args.tile_workers < 0:
             raise ValueError("--tile-workers must be >= 0")
         cfg.runtime.tile_workers = int(args.tile_workers)
-    summary = run_pipeline(cfg, allow_8bit_override=args.allow_8bit_height)
-    if not args.skip_importer_mcp:
-        report = run_importer_mcp_review(
+    if args.preflight:
+        report = run_preflight(cfg, allow_8bit_override=args.allow_8bit_height)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        if not report["ok"]:
+            raise SystemExit(1)
+        return
+    if args.height_fit_preview:
+        preview = preview_height_fit(cfg, allow_8bit_override=args.allow_8bit_height)
+        print(json.dumps(preview, indent=2, sort_keys=True))
+        return
+    reports: Dict[str, Dict[str, object]] = {}
+
+    def review() -> None:
+        # Runs as the build's last stage, overlapping QA plots once summary.json and the manifest exist.
+        reports["importer_mcp"] = run_importer_mcp_review(
             map_output_dir(cfg),
             fail_on=args.importer_mcp_fail_on,
             index_with_voxelviewer=False,
         )
+
+    if args.shard is not None or args.tiles is not None:
+        report = run_pipeline(
+            cfg,
+            allow_8bit_override=args.allow_8bit_height,
+            resume=args.resume,
+            shard=args.shard,
+            tiles=args.tiles,
+        )
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return
+    post_build = None if args.skip_importer_mcp else review
+    if args.command == "merge":
+        summary = merge_shards(cfg, allow_8bit_override=args.allow_8bit_height, post_build=post_build)
+    else:
+        summary = run_pipeline(
+            cfg,
+            allow_8bit_override=args.allow_8bit_height,
+            resume=args.resume,
+            post_build=post_build,
+        )
+    if "importer_mcp" in reports:
+        report = reports["importer_mcp"]
         summary["importer_mcp"] = {
             "verdict": report.get("verdict"),
             "score": report.get("score"),
@@ -60,6 +60,7 @@ class PathsConfig:
 @dataclass
 class InputConfig:
     allow_8bit_height: bool = False
+    weight_top_k: int = 4  # 0 => dense float32 plane per layer
 
 
 @dataclass
@@ -135,6 +136,8 @@ class OutputsConfig:
     export_bo2: bool = False
     schematic_full_volume: bool = False
     bo2_include_subsurface: bool = False
+    export_prefabs: bool = False
+    prefab_rotation_step: float = 90.0  # degrees; 0 => exact rotations (one prefab per distinct angle)
     minecraft_block_ids: Dict[str, int] = field(
         default_factory=lambda: {
             "grass": 2,
@@ -153,6 +156,12 @@ class OutputsConfig:
 class RuntimeConfig:
     async_tile_export: bool = True
     tile_workers: int = 0  # 0 => auto
+    tile_executor: str = "process"  # "process" (shared-memory y/labels) or "thread"
+    stage_cache: bool = True
+    stage_cache_max_mb: int = 4096  # <= 0 => unbounded
+    memory_budget_mb: int = 0  # tile export admission budget; 0 => unbounded
+    stream_cleanup: bool = True  # export tiles while expanded-tile cleanup is still running
+    tile_queue_depth: int = 0  # cleaned tiles waiting for export before cleanup pauses; 0 => 2 x workers
 
 
 @dataclass
@@ -285,9 +294,19 @@ def load_config(path: str | Path) -> PipelineConfig:
     if cfg.tiling.tile_size != 512:
         raise ValueError("tile_size must be 512 for deterministic safety constraints")
 
+    if not (0 <= cfg.input.weight_top_k < 255):
+        raise ValueError("input.weight_top_k must be in [0, 254]")
+
     if cfg.tiling.overlap <= 0:
         raise ValueError("tiling.overlap must be > 0")
 
+    if cfg.runtime.tile_executor not in ("process", "thread"):
+        raise ValueError("runtime.tile_executor must be 'process' or 'thread'")
+    if int(cfg.runtime.memory_budget_mb) < 0:
+        raise ValueError("runtime.memory_budget_mb must be >= 0")
+    if int(cfg.runtime.tile_queue_depth) < 0:
+        raise ValueError("runtime.tile_queue_depth must be >= 0")
+
     return cfg
 
 
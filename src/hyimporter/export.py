@@ -1,34 +1,37 @@
 from __future__ import annotations
 
-import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from dataclasses import asdict, dataclass
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
 
 import numpy as np
 
-from .cleanup import cleanup_labels
 from .bo2 import export_tile_bo2
 from .config import PipelineConfig, map_input_dir, map_output_dir
-from .geom_fields import compute_geom_fields
-from .height_fit import fit_height_to_budget
-from .hydrology import apply_hydrology
-from .io_images import (
-    load_colormap,
-    load_height_image,
-    load_masks,
-    load_object_placements,
-    load_weight_maps,
-)
-from .materials import assign_material_labels
+from .height_fit import HeightHistogram, height_fit_lut
+from .io_images import height_nodata_mask, image_shape, load_height_image
+from .memory_monitor import PeakMemorySampler
 from .meshing_obj import (
     build_base_volume_mesh_from_vertex_grid,
     build_surface_shell_mesh,
     height_to_vertex_grid,
     write_obj,
 )
-from .noise import apply_multiscale_noise
+from .pipeline_stages import (
+    PipelineInputs,
+    cached_height_histogram,
+    fit_kwargs,
+    height_histogram_cache_path,
+    height_histogram_key,
+    height_raster_path,
+    stage_chain,
+)
+from .placements import PlacementIndex, PlacementTable, load_placement_table, tile_placement_summary
+from .prefabs import PrefabLibrary, build_prefab_library, write_tile_placement_list
 from .qa import (
     assert_height_range,
     assert_seam_threshold,
@@ -38,11 +41,18 @@ from .qa import (
     save_seam_heatmap,
     seam_diff_report,
 )
-from .resample import resample_colormap, resample_height, resample_masks, resample_weights
 from .runbook import write_generated_hytale_runbook, write_tile_manifest
 from .schematic import export_tile_schematic
+from .shards import check_selection, merge_shard_reports, shard_name, shard_tiles, tile_of_file, write_shard_report
+from .shared_arrays import SharedArraySpec, attach_ndarray, shared_ndarray
+from .stage_cache import StageCache, StageState, code_digest, config_digest
+from .stage_graph import StageGraph
+from .tile_cleanup import CleanupStream, cleanup_tile_keyed, cleanup_tile_shared
+from .tile_costs import write_tile_cost_log
+from .tile_fingerprints import TileFingerprints, TileRecord, file_stats, tile_fingerprint
+from .tile_scheduler import TilePlan, TileScheduler, process_context, resolve_tile_workers, tile_parts
 from .tiling import TileSpec, build_tiles
-from .utils import ensure_dir, read_optional_csv, write_json
+from .utils import ensure_dir, read_optional_csv, remove_stale_temp_files, write_json
 
 
 def _warn(msg: str, warnings: List[str]) -> None:
@@ -57,35 +67,8 @@ class TileExportResult:
     manifest_row: Dict[str, object]
     vertex_grid: np.ndarray
     warnings: List[str]
-
-
-def _load_inputs(cfg: PipelineConfig, allow_8bit_override: bool = False):
-    in_dir = map_input_dir(cfg)
-    allow_8bit = bool(cfg.input.allow_8bit_height or allow_8bit_override)
-
-    height, height_meta = load_height_image(
-        in_dir / "height" / "height.png",
-        allow_8bit=allow_8bit,
-    )
-
-    weights_dir = in_dir / "weights"
-    if not weights_dir.exists():
-        weights_dir = in_dir / "weightmaps"
-
-    weights = load_weight_maps(weights_dir)
-    masks = load_masks(in_dir / "masks")
-    colormap = load_colormap(in_dir / "color" / "colormap.png")
-    anchors = read_optional_csv(in_dir / "anchors" / "landmarks.csv")
-    objects = load_object_placements(in_dir)
-
-    return in_dir, height, height_meta, weights, masks, colormap, anchors, objects
-
-
-def _target_shape(height: np.ndarray, cfg: PipelineConfig) -> tuple[int, int]:
-    if cfg.resample.target_resolution is None:
-        return int(height.shape[0]), int(height.shape[1])
-    r = int(cfg.resample.target_resolution)
-    return r, r
+    files: List[Path] = field(default_factory=list)
+    seconds: float = 0.0
 
 
 def _check_tile_coverage(shape: Tuple[int, int], tiles: List[TileSpec]) -> None:
@@ -142,58 +125,60 @@ def _check_mesh_limits(
         _warn(f"{tile_name} OBJ size={mb:.2f}MB exceeds {limit_mb:.2f}MB", warnings)
 
 
-def _export_single_tile(
+@dataclass
+class _TilePart:
+    """Output of one exporter task for a tile (see :func:`.tile_scheduler.tile_parts`)."""
+
+    name: str
+    files: List[Path] = field(default_factory=list)
+    mesh_vertices: int = 0
+    vertex_grid: Optional[np.ndarray] = None
+    seconds: float = 0.0
+
+
+def _export_tile_part(
     cfg: PipelineConfig,
     t: TileSpec,
     y: np.ndarray,
     labels: np.ndarray,
     out_tiles_dir: Path,
-) -> TileExportResult:
-    tile_warnings: List[str] = []
+    part: str,
+) -> _TilePart:
     bbox_cfg = asdict(cfg.mesh.stabilize_bbox)
     tile_name = f"tile_{t.i}_{t.j}"
     core_y = y[t.x0 : t.x1, t.z0 : t.z1]
     core_labels = labels[t.x0 : t.x1, t.z0 : t.z1]
-    core_v = _core_vertex_grid_from_expanded(y, t)
-
-    tile_obj_paths: List[Path] = []
-    mesh_vertices_total = 0
-
-    base_obj_path = out_tiles_dir / f"{tile_name}.obj"
-    if cfg.outputs.export_obj and cfg.mesh.export_base:
-        base_mesh = build_base_volume_mesh_from_vertex_grid(
-            core_v,
-            bottom_y=cfg.height.bottom_y,
-            stabilize_bbox=bbox_cfg,
-        )
-        write_obj(base_obj_path, base_mesh)
-        tile_obj_paths.append(base_obj_path)
-        mesh_vertices_total += len(base_mesh.vertices)
-
-    shell_names: List[str] = []
-    if cfg.outputs.export_obj and cfg.mesh.export_shells:
-        for li, lname in enumerate(cfg.materials.layers):
-            m = core_labels == li
-            if not np.any(m):
-                continue
-            shell_mesh = build_surface_shell_mesh(
-                core_y,
-                m,
-                thickness=cfg.mesh.shell_thickness,
+    out = _TilePart(name=part)
+    t0 = time.perf_counter()
+
+    if part == "grid":
+        out.vertex_grid = _core_vertex_grid_from_expanded(y, t)
+        if cfg.outputs.export_obj and cfg.mesh.export_base:
+            base_mesh = build_base_volume_mesh_from_vertex_grid(
+                out.vertex_grid,
+                bottom_y=cfg.height.bottom_y,
                 stabilize_bbox=bbox_cfg,
             )
-            shell_name = f"{tile_name}__{lname}.obj"
-            shell_path = out_tiles_dir / shell_name
-            write_obj(shell_path, shell_mesh)
-            tile_obj_paths.append(shell_path)
-            mesh_vertices_total += len(shell_mesh.vertices)
-            shell_names.append(shell_name)
-
-    schematic_name = f"{tile_name}.schematic"
-    bo2_name = f"{tile_name}.bo2"
-    if cfg.outputs.export_schematic:
+            base_obj_path = out_tiles_dir / f"{tile_name}.obj"
+            write_obj(base_obj_path, base_mesh)
+            out.files.append(base_obj_path)
+            out.mesh_vertices = len(base_mesh.vertices)
+    elif part.startswith("shell:"):
+        li = int(part.split(":", 1)[1])
+        shell_mesh = build_surface_shell_mesh(
+            core_y,
+            core_labels == li,
+            thickness=cfg.mesh.shell_thickness,
+            stabilize_bbox=bbox_cfg,
+        )
+        shell_path = out_tiles_dir / f"{tile_name}__{cfg.materials.layers[li]}.obj"
+        write_obj(shell_path, shell_mesh)
+        out.files.append(shell_path)
+        out.mesh_vertices = len(shell_mesh.vertices)
+    elif part == "schematic":
+        path = out_tiles_dir / f"{tile_name}.schematic"
         export_tile_schematic(
-            path=out_tiles_dir / schematic_name,
+            path=path,
             y_int=core_y,
             labels=core_labels,
             layer_names=cfg.materials.layers,
@@ -201,10 +186,11 @@ def _export_single_tile(
             bottom_y=cfg.height.bottom_y,
             full_volume=cfg.outputs.schematic_full_volume,
         )
-
-    if cfg.outputs.export_bo2:
+        out.files.append(path)
+    elif part == "bo2":
+        path = out_tiles_dir / f"{tile_name}.bo2"
         export_tile_bo2(
-            path=out_tiles_dir / bo2_name,
+            path=path,
             y_int=core_y,
             labels=core_labels,
             layer_names=cfg.materials.layers,
@@ -212,9 +198,48 @@ def _export_single_tile(
             include_subsurface=cfg.outputs.bo2_include_subsurface,
             bottom_y=cfg.height.bottom_y,
         )
+        out.files.append(path)
+    else:
+        raise ValueError(f"Unknown tile export part: {part}")
+    out.seconds = time.perf_counter() - t0
+    return out
+
+
+def _merge_tile_parts(
+    cfg: PipelineConfig,
+    t: TileSpec,
+    y: np.ndarray,
+    parts: List[_TilePart],
+    out_tiles_dir: Path,
+    placements: Optional[PlacementTable] = None,
+    placement_index: Optional[PlacementIndex] = None,
+    prefabs: Optional[PrefabLibrary] = None,
+) -> TileExportResult:
+    """Check limits, write the placement list and meta JSON, and build the manifest row from finished parts."""
+    t0 = time.perf_counter()
+    tile_warnings: List[str] = []
+    tile_name = f"tile_{t.i}_{t.j}"
+    core_y = y[t.x0 : t.x1, t.z0 : t.z1]
+    by_name = {p.name: p for p in parts}
+    core_v = by_name["grid"].vertex_grid
+
+    base_obj_path = out_tiles_dir / f"{tile_name}.obj"
+    schematic_name = f"{tile_name}.schematic"
+    bo2_name = f"{tile_name}.bo2"
+    tile_obj_paths = [f for p in parts if p.name == "grid" or p.name.startswith("shell:") for f in p.files]
+    shell_names = [f.name for p in parts if p.name.startswith("shell:") for f in p.files]
+    mesh_vertices_total = sum(p.mesh_vertices for p in parts)
 
     _check_mesh_limits(cfg, tile_name, mesh_vertices_total, tile_obj_paths, tile_warnings)
 
+    tile_rows = placement_index.lookup(t.i, t.j) if placement_index is not None else np.zeros(0, dtype=np.int64)
+    placements_name = f"{tile_name}.placements.csv"
+    n_prefab_rows = 0
+    if prefabs is not None and placements is not None:
+        n_prefab_rows = write_tile_placement_list(
+            out_tiles_dir / placements_name, prefabs, placements, tile_rows, tile_origin=(t.x0, t.z0), y=y
+        )
+
     meta = {
         "tile": {"i": t.i, "j": t.j},
         "world_origin": {"x0": t.x0, "z0": t.z0},
@@ -230,7 +255,9 @@ def _export_single_tile(
             "shells": shell_names,
             "schematic": schematic_name if cfg.outputs.export_schematic else None,
             "bo2": bo2_name if cfg.outputs.export_bo2 else None,
+            "placements": placements_name if n_prefab_rows else None,
         },
+        "placements": tile_placement_summary(placements, tile_rows),
     }
     write_json(out_tiles_dir / f"{tile_name}.meta.json", meta)
 
@@ -247,57 +274,383 @@ def _export_single_tile(
         "meta_json": str(out_tiles_dir / f"{tile_name}.meta.json"),
     }
 
+    files = [f for p in parts for f in p.files]
+    if n_prefab_rows:
+        files.append(out_tiles_dir / placements_name)
+    files.append(out_tiles_dir / f"{tile_name}.meta.json")
+
     return TileExportResult(
         tile_i=t.i,
         tile_j=t.j,
         manifest_row=manifest_row,
-        vertex_grid=core_v,
+        vertex_grid=core_v,  # type: ignore[arg-type]
         warnings=tile_warnings,
+        files=files,
+        seconds=sum(p.seconds for p in parts) + (time.perf_counter() - t0),
     )
 
 
+def _export_single_tile(
+    cfg: PipelineConfig,
+    t: TileSpec,
+    y: np.ndarray,
+    labels: np.ndarray,
+    out_tiles_dir: Path,
+    placements: Optional[PlacementTable] = None,
+    placement_index: Optional[PlacementIndex] = None,
+    prefabs: Optional[PrefabLibrary] = None,
+) -> TileExportResult:
+    parts = [_export_tile_part(cfg, t, y, labels, out_tiles_dir, p) for p in tile_parts(cfg, t, labels)]
+    return _merge_tile_parts(cfg, t, y, parts, out_tiles_dir, placements, placement_index, prefabs)
+
+
+def _export_tile_job(
+    cfg: PipelineConfig,
+    t: TileSpec,
+    part: Optional[str],
+    y: np.ndarray,
+    labels: np.ndarray,
+    out_tiles_dir: Path,
+    placements: Optional[PlacementTable],
+    placement_index: Optional[PlacementIndex],
+    prefabs: Optional[PrefabLibrary],
+):
+    """A whole tile (``part=None``) as a :class:`TileExportResult`, or one :class:`_TilePart` of it."""
+    if part is not None:
+        return _export_tile_part(cfg, t, y, labels, out_tiles_dir, part)
+    return _export_single_tile(cfg, t, y, labels, out_tiles_dir, placements, placement_index, prefabs)
+
+
+# Minimum seconds between journal/manifest saves while tiles finish; a crash loses at most this much.
+_JOURNAL_FLUSH_S = 1.0
+
+
+class _TileJournal:
+    """Results of one tile export, saved as tiles finish.
+
+    With ``fingerprints_path``, tiles whose inputs and output files are unchanged since the last export are
+    not rewritten (their manifest rows and warnings are reused). The fingerprint journal (and
+    ``manifest_path``, when given) is saved as tiles finish. Tiles recorded by an interrupted export are only
+    trusted with ``resume``; ``grids_dir`` overrides where the fingerprint store keeps vertex grids.
+    """
+
+    def __init__(
+        self,
+        fingerprints_path: Optional[Path] = None,
+        manifest_path: Optional[Path] = None,
+        grids_dir: Optional[Path] = None,
+        resume: bool = False,
+    ) -> None:
+        self.store = TileFingerprints.load(fingerprints_path, grids_dir) if fingerprints_path is not None else None
+        self.manifest_path = manifest_path
+        self.resume = resume
+        self.interrupted = self.store is not None and not self.store.complete
+        self.results: Dict[Tuple[int, int], TileExportResult] = {}
+        self.first_tile_s: Optional[float] = None
+        self._fingerprints: Dict[Tuple[int, int], str] = {}
+        self._base = ""
+        self._out_tiles_dir = Path()
+        self._t_start = self._last_flush = time.perf_counter()
+
+    def start(self, cfg: PipelineConfig, tiles: List[TileSpec], out_tiles_dir: Path, prefabs) -> None:
+        self._out_tiles_dir = out_tiles_dir
+        self._t_start = self._last_flush = time.perf_counter()
+        if self.store is None:
+            return
+        if self.interrupted and not self.resume:
+            self.store.tiles = {}
+        names = {f"tile_{t.i}_{t.j}" for t in tiles}
+        self.store.tiles = {name: rec for name, rec in self.store.tiles.items() if name in names}
+        self._base = _tile_export_digest(cfg, out_tiles_dir, prefabs)
+        self.store.complete = False
+        self.store.save()
+
+    def reuse(self, t: TileSpec, y: np.ndarray, labels: np.ndarray, placement_bytes: List[bytes]) -> bool:
+        """Fingerprint a tile (its expanded window must be final); True when its last export is reused."""
+        if self.store is None:
+            return False
+        fp = tile_fingerprint(self._base, t, y, labels, placement_bytes)
+        self._fingerprints[(t.i, t.j)] = fp
+        hit = self.store.current(f"tile_{t.i}_{t.j}", fp, self._out_tiles_dir)
+        if hit is None:
+            return False
+        rec, grid = hit
+        self.results[(t.i, t.j)] = TileExportResult(
+            tile_i=t.i,
+            tile_j=t.j,
+            manifest_row=rec.manifest_row,
+            vertex_grid=grid,
+            warnings=list(rec.warnings),
+        )
+        return True
+
+    def record(self, result: TileExportResult) -> None:
+        # Runs on the calling thread only, so the journal needs no locking.
+        key = (result.tile_i, result.tile_j)
+        self.results[key] = result
+        if self.first_tile_s is None:
+            self.first_tile_s = round(time.perf_counter() - self._t_start, 3)
+        if self.store is not None:
+            name = f"tile_{result.tile_i}_{result.tile_j}"
+            self.store.save_grid(name, result.vertex_grid)
+            self.store.tiles[name] = TileRecord(
+                fingerprint=self._fingerprints[key],
+                files=file_stats(result.files),
+                manifest_row=result.manifest_row,
+                warnings=result.warnings,
+            )
+        if time.perf_counter() - self._last_flush >= _JOURNAL_FLUSH_S:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.store is not None:
+            self.store.save()
+        if self.manifest_path is not None:
+            write_tile_manifest(self.manifest_path, [self.results[k].manifest_row for k in sorted(self.results)])
+        self._last_flush = time.perf_counter()
+
+    def close(self) -> None:
+        if self.store is not None:
+            self.store.complete = True
+        self.flush()
+
+
+# Per-process state of a tile export worker, set once by _init_tile_worker.
+_TILE_WORKER: Dict[str, object] = {}
+
+
+def _init_tile_worker(
+    cfg: PipelineConfig,
+    y_spec: SharedArraySpec,
+    labels_spec: SharedArraySpec,
+    out_tiles_dir: Path,
+    placements: Optional[PlacementTable],
+    placement_index: Optional[PlacementIndex],
+    prefabs: Optional[PrefabLibrary],
+) -> None:
+    # The attachments stay open for the worker's lifetime; the parent unlinks the blocks afterwards.
+    stack = ExitStack()
+    y = stack.enter_context(attach_ndarray(y_spec))
+    labels = stack.enter_context(attach_ndarray(labels_spec))
+    _TILE_WORKER["stack"] = stack
+    _TILE_WORKER["args"] = (cfg, y, labels, out_tiles_dir, placements, placement_index, prefabs)
+
+
+def _export_tile_in_worker(t: TileSpec, part: Optional[str] = None):
+    cfg, y, labels, out_tiles_dir, placements, placement_index, prefabs = _TILE_WORKER["args"]  # type: ignore[misc]
+    return _export_tile_job(cfg, t, part, y, labels, out_tiles_dir, placements, placement_index, prefabs)
+
+
+def _tile_export_digest(cfg: PipelineConfig, out_tiles_dir: Path, prefabs: Optional[PrefabLibrary]) -> str:
+    """Digest of the exporter settings and code shared by every tile's fingerprint."""
+    return "|".join(
+        [
+            config_digest(cfg.outputs, cfg.mesh, cfg.hytale, cfg.safety, cfg.tiling),
+            json.dumps([list(cfg.materials.layers), cfg.height.bottom_y, prefabs is not None]),
+            code_digest("export", "meshing_obj", "schematic", "bo2", "prefabs", "voxelize"),
+            str(out_tiles_dir.resolve()),
+        ]
+    )
+
+
+def _tile_placement_bytes(
+    t: TileSpec,
+    placements: Optional[PlacementTable],
+    placement_index: Optional[PlacementIndex],
+    prefabs: Optional[PrefabLibrary],
+) -> List[bytes]:
+    if placements is None or placement_index is None:
+        return []
+    rows = placement_index.lookup(t.i, t.j)
+    out = [rows.tobytes()] + [a[rows].tobytes() for a in (placements.kind, placements.position, placements.rotation)]
+    out.append(placements.scale[rows].tobytes())
+    out.append("|".join(placements.models[int(m)] for m in placements.model[rows]).encode("utf-8"))
+    if prefabs is not None:
+        used = [prefabs.prefabs[p] for p in prefabs.instance_prefab[rows] if p >= 0]
+        out.append("|".join(f"{p.name}{p.origin}" for p in used).encode("utf-8"))
+    return out
+
+
 def _export_tiles(
     cfg: PipelineConfig,
     y: np.ndarray,
     labels: np.ndarray,
     out_tiles_dir: Path,
     warnings: List[str],
+    placements: Optional[PlacementTable] = None,
+    placement_index: Optional[PlacementIndex] = None,
+    prefabs: Optional[PrefabLibrary] = None,
+    journal: Optional[_TileJournal] = None,
+    export_stats: Optional[Dict[str, object]] = None,
+    cost_log_path: Optional[Path] = None,
+    tile_filter: Optional[Set[Tuple[int, int]]] = None,
+    cleanup: Optional[CleanupStream] = None,
 ) -> tuple[List[Dict[str, object]], Dict[Tuple[int, int], np.ndarray]]:
+    """Export every tile, or those ``(i, j)`` in ``tile_filter`` (one shard of a multi-host build), and return
+    their manifest rows and core vertex grids in tile order. ``journal`` reuses unchanged tiles and saves
+    progress as tiles finish.
+
+    Jobs run through a :class:`.tile_scheduler.TileScheduler`, longest estimated cost first inside the
+    memory budget; ``cost_log_path`` receives the estimated and measured seconds of every exported tile.
+
+    With ``cleanup``, ``labels`` are the uncleaned material labels: expanded-tile cleanup runs as jobs on
+    the same workers and each tile is released for export as soon as its expanded window is clean
+    (``cleanup.labels`` holds the cleaned map afterwards).
+    """
     tiles = build_tiles(y.shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
     if len(tiles) > int(cfg.safety.warn_max_tiles):
         _warn(f"Tile count {len(tiles)} exceeds safety warning threshold {cfg.safety.warn_max_tiles}", warnings)
 
     _check_tile_coverage(y.shape, tiles)
-
-    requested_workers = int(cfg.runtime.tile_workers)
-    if requested_workers < 0:
-        raise ValueError("runtime.tile_workers must be >= 0")
-
-    if requested_workers == 0:
-        requested_workers = max(1, min(len(tiles), os.cpu_count() or 1))
-    else:
-        requested_workers = max(1, min(len(tiles), requested_workers))
-
-    run_async = bool(cfg.runtime.async_tile_export and len(tiles) > 1)
-    results_by_tile: Dict[Tuple[int, int], TileExportResult] = {}
-
-    if run_async:
-        with ThreadPoolExecutor(max_workers=requested_workers) as pool:
-            futures = {pool.submit(_export_single_tile, cfg, t, y, labels, out_tiles_dir): (t.i, t.j) for t in tiles}
-            for future in as_completed(futures):
-                result = future.result()
-                results_by_tile[(result.tile_i, result.tile_j)] = result
+    if tile_filter is not None:
+        tiles = [t for t in tiles if (t.i, t.j) in tile_filter]
+    wanted = {(t.i, t.j) for t in tiles}
+    if placements is not None and placement_index is None:
+        placement_index = PlacementIndex.build(placements, y.shape, cfg.tiling.tile_size)
+    journal = journal if journal is not None else _TileJournal()
+    journal.start(cfg, tiles, out_tiles_dir, prefabs)
+
+    raw_labels = labels
+    if cleanup is not None:
+        # Filled in by the cleanup jobs; process workers swap in a shared-memory block below.
+        labels = np.full(raw_labels.shape, -1, dtype=np.int16)
+
+    def prepare(t: TileSpec) -> bool:
+        return not journal.reuse(t, y, labels, _tile_placement_bytes(t, placements, placement_index, prefabs))
+
+    # With fewer tiles than workers, each tile's exporters (vertex grid/base OBJ, per-layer shells, schematic,
+    # BO2) run as separate jobs and are merged once all of a tile's parts are in. A streamed export decides
+    # before tiles are released, on the tile count.
+    pending = [t for t in tiles if prepare(t)] if cleanup is None else []
+    n_export = len(pending) if cleanup is None else len(tiles)
+    split = bool(cfg.runtime.async_tile_export and n_export and resolve_tile_workers(cfg, n_export + 1) > n_export)
+    plan = TilePlan(cfg, y, split)
+    jobs = [job for t in pending for job in plan.add(t, labels)]
+    if cleanup is None:
+        planned = [plan.memory(job) for job in jobs]
     else:
-        for t in tiles:
-            result = _export_single_tile(cfg, t, y, labels, out_tiles_dir)
-            results_by_tile[(result.tile_i, result.tile_j)] = result
+        # Streamed tiles are released later, but all of them are known now: estimate their jobs from the raw
+        # labels (cleanup changes few pixels, hence hardly the layer mix) next to the cleanup jobs.
+        planned = [cleanup.memory(plan.memory_model, t) for t in cleanup.pending]
+        planned += plan.estimate_memory(tiles, raw_labels)
+    scheduler = TileScheduler(cfg, plan, planned, cleanup)
+    scheduler.add(jobs)
+
+    def release(t: TileSpec) -> None:
+        if (t.i, t.j) in wanted and prepare(t):
+            scheduler.add(plan.add(t, labels))
+
+    def collect(t: TileSpec, out) -> None:
+        if plan.split:
+            parts = plan.collect(t, out)
+            if parts is None:
+                return
+            out = _merge_tile_parts(cfg, t, y, parts, out_tiles_dir, placements, placement_index, prefabs)
+        journal.record(out)
+
+    run_async = bool(cfg.runtime.async_tile_export and scheduler.n_jobs > 1)
+    with PeakMemorySampler() as memory, ExitStack() as stack:
+        if run_async and cfg.runtime.tile_executor == "process" and scheduler.workers > 1:
+            # y/labels go to workers through shared memory; everything else is pickled once per worker.
+            y_spec, _y = stack.enter_context(shared_ndarray(y))
+            if cleanup is not None:
+                # Workers read raw labels and write cleaned cores into the block the exporters attach.
+                src_spec, _src = stack.enter_context(shared_ndarray(raw_labels.astype(np.int16, copy=False)))
+                labels_spec, labels = stack.enter_context(shared_ndarray(shape=labels.shape, dtype=np.int16, fill=-1))
+                dithered_spec = None
+                if cleanup.dithered is not None:
+                    dithered_spec, _dithered = stack.enter_context(shared_ndarray(cleanup.dithered))
+            else:
+                labels_spec, _labels = stack.enter_context(shared_ndarray(labels))
+            pool = stack.enter_context(
+                ProcessPoolExecutor(
+                    max_workers=scheduler.workers,
+                    mp_context=process_context([__name__]),
+                    initializer=_init_tile_worker,
+                    initargs=(cfg, y_spec, labels_spec, out_tiles_dir, placements, placement_index, prefabs),
+                )
+            )
+            scheduler.run(
+                lambda t, part: pool.submit(_export_tile_in_worker, t, part),
+                collect,
+                lambda t: pool.submit(
+                    cleanup_tile_shared,
+                    src_spec,
+                    labels_spec,
+                    t,
+                    cleanup.majority_radius,
+                    cleanup.min_area,
+                    dithered_spec,
+                ),
+                release,
+            )
+        elif run_async:
+            pool = stack.enter_context(ThreadPoolExecutor(max_workers=scheduler.workers))
+            scheduler.run(
+                lambda t, part: pool.submit(
+                    _export_tile_job, cfg, t, part, y, labels, out_tiles_dir, placements, placement_index, prefabs
+                ),
+                collect,
+                lambda t: pool.submit(
+                    cleanup_tile_keyed,
+                    raw_labels,
+                    labels,
+                    t,
+                    cleanup.majority_radius,
+                    cleanup.min_area,
+                    cleanup.dithered,
+                ),
+                release,
+            )
+        else:
+            scheduler.run_inline(
+                lambda t: journal.record(
+                    _export_single_tile(cfg, t, y, labels, out_tiles_dir, placements, placement_index, prefabs)
+                ),
+                lambda t: cleanup.clean(raw_labels, labels, t),
+                release,
+            )
+        if cleanup is not None:
+            # Copy out before the shared block is released.
+            cleanup.finish(labels)
+
+    results = journal.results
+    todo = plan.tiles
+    if cost_log_path is not None and todo:
+        write_tile_cost_log(cost_log_path, plan.cost_rows({key: r.seconds for key, r in results.items()}))
+    journal.close()
+    if export_stats is not None:
+        export_stats.update({"tiles": len(tiles), "exported": len(todo), "reused": len(tiles) - len(todo)})
+        if journal.store is not None:
+            export_stats["resumed"] = int(journal.interrupted and journal.resume)
+        if split:
+            export_stats["part_jobs"] = sum(len(plan.parts[(t.i, t.j)]) for t in todo)
+        if cost_log_path is not None and todo:
+            export_stats["estimated_s"] = round(sum(plan.cost((t, None)) for t in todo), 3)
+            export_stats["actual_s"] = round(sum(results[(t.i, t.j)].seconds for t in todo), 3)
+        if todo:
+            mb = 1024 * 1024
+            export_stats["memory"] = {
+                "budget_mb": int(cfg.runtime.memory_budget_mb),
+                "workers": int(scheduler.workers) if run_async else 1,
+                "estimated_peak_mb": round(scheduler.peak / mb, 1),
+                "baseline_mb": None if memory.baseline is None else round(memory.baseline / mb, 1),
+                "observed_peak_mb": None if memory.peak is None else round(memory.peak / mb, 1),
+            }
+        if cleanup is not None:
+            export_stats["stream"] = {
+                "queue_depth": scheduler.queue_depth,
+                "first_release_s": scheduler.first_release_s,
+                "first_tile_s": journal.first_tile_s,
+                "max_queued": scheduler.max_queued,
+            }
 
     manifest_rows: List[Dict[str, object]] = []
     tile_vertex_grids: Dict[Tuple[int, int], np.ndarray] = {}
 
     # Deterministic output order regardless of async completion timing.
-    for key in sorted(results_by_tile):
-        result = results_by_tile[key]
+    for key in sorted(results):
+        result = results[key]
         manifest_rows.append(result.manifest_row)
         tile_vertex_grids[key] = result.vertex_grid
         warnings.extend(result.warnings)
@@ -305,162 +658,325 @@ def _export_tiles(
     return manifest_rows, tile_vertex_grids
 
 
-def _cleanup_labels_in_expanded_tiles(cfg: PipelineConfig, labels: np.ndarray) -> tuple[np.ndarray, float]:
-    tiles = build_tiles(labels.shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
-    out = np.full_like(labels, -1, dtype=np.int16)
-    speckle_vals: List[float] = []
+def _output_shape(cfg: PipelineConfig) -> Tuple[int, int]:
+    """Shape of the built map, read from the height raster header so it is known before decoding."""
+    if cfg.resample.target_resolution is not None:
+        r = int(cfg.resample.target_resolution)
+        return r, r
+    return image_shape(height_raster_path(map_input_dir(cfg)))
 
-    for t in tiles:
-        ex = labels[t.ex0 : t.ex1, t.ez0 : t.ez1]
-        cleaned_ex, stats = cleanup_labels(
-            ex,
-            majority_radius=cfg.materials.majority_radius,
-            min_area=cfg.materials.island_min_area,
-        )
-        cx, cz = t.core_in_expanded
-        out[t.x0 : t.x1, t.z0 : t.z1] = cleaned_ex[cx, cz]
-        speckle_vals.append(float(stats["speckle_rate"]))
-
-    if np.any(out < 0):
-        raise RuntimeError("Missing tile regions detected after expanded cleanup")
-
-    avg_speckle = float(np.mean(speckle_vals)) if speckle_vals else 0.0
-    return out, avg_speckle
-
-
-def run_pipeline(cfg: PipelineConfig, allow_8bit_override: bool = False) -> Dict[str, object]:
-    warnings: List[str] = []
-
-    in_dir, height_raw, height_meta, weights_raw, masks_raw, colormap_raw, anchors, objects = _load_inputs(
-        cfg,
-        allow_8bit_override=allow_8bit_override,
-    )
 
-    shape = _target_shape(height_raw, cfg)
-    height = resample_height(height_raw, shape)
-    weights = resample_weights(weights_raw, shape)
-    masks = resample_masks(masks_raw, shape)
-    colormap = resample_colormap(colormap_raw, shape) if colormap_raw is not None else None
-
-    y, fit_stats = fit_height_to_budget(
-        height,
-        total_height=cfg.height.total_height,
-        margin_bottom=cfg.height.margin_bottom,
-        margin_top=cfg.height.margin_top,
-        p_low=cfg.height.percentile_low,
-        p_high=cfg.height.percentile_high,
-        gamma=cfg.height.gamma,
-    )
+def _load_placements(cfg: PipelineConfig) -> PlacementTable:
+    """Placements in the built map's grid (positions are stored in heightmap pixels)."""
+    in_dir = map_input_dir(cfg)
+    table = load_placement_table(in_dir)
+    if not len(table) or cfg.resample.target_resolution is None:
+        return table
+    return table.to_grid(image_shape(height_raster_path(in_dir)), _output_shape(cfg))
 
-    if np.min(y) < 0:
-        raise RuntimeError("Negative heights detected after fit")
 
-    hydro = {}
-    if cfg.hydrology.enabled:
-        river_mask = masks.get(cfg.hydrology.river_mask_name)
-        y, hydro = apply_hydrology(
-            y,
-            fill_sinks=cfg.hydrology.fill_sinks,
-            river_threshold_percentile=cfg.hydrology.river_threshold_percentile,
-            carve_depth=cfg.hydrology.carve_depth,
-            river_mask=river_mask,
-        )
-        masks["river"] = hydro["river_mask"]
+def _map_tiles(cfg: PipelineConfig, shape: Tuple[int, int]) -> List[TileSpec]:
+    return build_tiles(shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
 
-    noise_delta = np.zeros_like(y, dtype=np.float32)
-    if cfg.noise.enabled:
-        water_mask = masks.get("river", None)
-        road_mask = masks.get(cfg.noise.road_mask_name, None)
-        y, noise_delta = apply_multiscale_noise(
-            y,
-            macro_amp=cfg.noise.macro_amplitude,
-            macro_wavelength=cfg.noise.macro_wavelength,
-            micro_amp=cfg.noise.micro_amplitude,
-            micro_wavelength=cfg.noise.micro_wavelength,
-            seed=cfg.noise.seed,
-            water_mask=water_mask,
-            road_mask=road_mask,
-            suppress_radius=cfg.noise.suppress_near_water_radius,
-        )
 
-    if np.min(y) < 0:
-        raise RuntimeError("Negative heights detected after hydrology/noise")
-
-    geom = compute_geom_fields(y)
-    labels, _material_masks, de_stats = assign_material_labels(
-        y_int=y,
-        slope=geom["slope_smooth"],
-        weights=weights,
-        masks=masks,
-        layer_names=cfg.materials.layers,
-        default_layer=cfg.materials.default_layer,
-        sea_level_y=cfg.height.sea_level_y,
-        snowline_y=cfg.materials.snowline_y,
-        beach_band_dy=cfg.materials.beach_band_dy,
-        cliff_slope_high=cfg.materials.cliff_slope_high,
-        cliff_slope_low=cfg.materials.cliff_slope_low,
-        colormap=colormap,
-        palette_match_enabled=cfg.materials.palette_match.enabled,
-    )
+def run_pipeline(
+    cfg: PipelineConfig,
+    allow_8bit_override: bool = False,
+    resume: bool = False,
+    post_build: Optional[Callable[[], object]] = None,
+    shard: Optional[Tuple[int, int]] = None,
+    tiles: Optional[Sequence[Tuple[int, int]]] = None,
+) -> Dict[str, object]:
+    """Run the full build. With ``resume``, tiles finished by an interrupted previous build are kept and
+    only missing or incomplete ones are exported (stage outputs come from the stage cache).
+
+    The build is a :class:`StageGraph`: independent stages (input resampling next to the height fit,
+    prefab voxelization, QA plots next to tile export, the runbook) share one executor sized by
+    ``runtime.tile_workers``. ``post_build`` runs as a final stage once ``summary.json`` and the tile
+    manifest are written. Per-stage start/wall times are returned under ``stage_graph``.
+
+    ``shard=(k, n)`` (1-based) or an explicit ``tiles`` list exports only that subset and returns the
+    shard report written to ``runbook/shards/<name>/shard.json``; :func:`merge_shards` then produces the
+    manifest, summary and seam QA once every shard is done.
+    """
+    if shard is not None and tiles is not None:
+        raise ValueError("Pass either shard or tiles, not both")
+    if shard is not None and not (1 <= int(shard[0]) <= int(shard[1])):
+        raise ValueError(f"Shard must be K/N with 1 <= K <= N, got {shard[0]}/{shard[1]}")
+    selection = None if tiles is None else {(int(i), int(j)) for i, j in tiles}
+    return _run_build_graph(cfg, allow_8bit_override, resume, post_build, shard, selection, merge=False)
+
+
+def merge_shards(
+    cfg: PipelineConfig,
+    allow_8bit_override: bool = False,
+    post_build: Optional[Callable[[], object]] = None,
+) -> Dict[str, object]:
+    """Combine the shard reports under ``runbook/shards/`` into ``tile_manifest.csv``, ``summary.json`` and
+    the seam QA, as a single-host build would write them. Global arrays come from the stage cache."""
+    return _run_build_graph(cfg, allow_8bit_override, False, post_build, None, None, merge=True)
 
-    labels, avg_speckle = _cleanup_labels_in_expanded_tiles(cfg, labels)
 
+def _run_build_graph(
+    cfg: PipelineConfig,
+    allow_8bit_override: bool,
+    resume: bool,
+    post_build: Optional[Callable[[], object]],
+    shard: Optional[Tuple[int, int]],
+    selection: Optional[Set[Tuple[int, int]]],
+    merge: bool,
+) -> Dict[str, object]:
+    sharded = shard is not None or selection is not None
+    in_dir = map_input_dir(cfg)
     out_root = map_output_dir(cfg)
     out_tiles = ensure_dir(out_root / "tiles")
     out_runbook = ensure_dir(out_root / "runbook")
     out_qa = ensure_dir(out_root / "qa")
+    shards_root = out_runbook / "shards"
+    grids_dir = out_runbook / "tile_grids"
 
-    manifest_rows, tile_vertex_grids = _export_tiles(cfg, y, labels, out_tiles, warnings)
-
-    tiles = build_tiles(y.shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
-    seam_map, seam_max = seam_diff_report(y, tiles, tile_vertex_grids=tile_vertex_grids)
-
-    if cfg.qa.write_plots:
-        save_height_histogram(y, out_qa / "height_hist.png")
-        save_seam_heatmap(seam_map, out_qa / "seam_diff_heatmap.png")
-
-    hstats = height_stats(y)
-    assert_height_range(y, cfg.qa.assert_height_range[0], cfg.qa.assert_height_range[1])
-    assert_seam_threshold(seam_max, cfg.qa.assert_max_seam_diff)
-
-    coverage = material_coverage(labels, cfg.materials.layers)
-
-    summary = {
-        "map_name": cfg.project.map_name,
-        "input_dir": str(in_dir),
-        "output_dir": str(out_root),
-        "height_input": height_meta,
-        "height_fit": fit_stats,
-        "height_stats": hstats,
-        "qa": {
-            "seam_max_diff": int(seam_max),
-            "speckle_rate": avg_speckle,
-            "material_coverage": coverage,
-        },
-        "hydrology": {
-            "enabled": cfg.hydrology.enabled,
-            "river_pixels": int(np.sum(masks.get("river", np.zeros_like(y, dtype=bool)))),
-        },
-        "noise": {
-            "enabled": cfg.noise.enabled,
-            "delta_min": float(np.min(noise_delta)),
-            "delta_max": float(np.max(noise_delta)),
-        },
-        "palette_match": de_stats,
-        "anchors_loaded": 0 if anchors is None else len(anchors),
-        "objects": objects,
-        "warnings": warnings,
-    }
-
-    write_json(out_qa / "summary.json", summary)
-
-    write_tile_manifest(out_runbook / "tile_manifest.csv", manifest_rows)
-    write_generated_hytale_runbook(
-        out_runbook / "hytale_import_runbook.md",
-        map_name=cfg.project.map_name,
-        import_height=cfg.hytale.default_import_height,
-        base_fill_item_id=cfg.hytale.base_fill_item_id,
-        material_item_ids=cfg.hytale.material_item_ids,
+    cache = StageCache(
+        out_root / "cache" / "stages",
+        max_bytes=int(cfg.runtime.stage_cache_max_mb) * 1024 * 1024,
+        enabled=cfg.runtime.stage_cache,
+    )
+    inputs = PipelineInputs(cfg, allow_8bit_override)
+    chain = stage_chain(cfg, cache, inputs)
+    materials_at = [s.name for s in chain].index("materials")
+    # Shards merge only with others exported from the same global arrays and exporter settings.
+    shard_key = cache.key(chain[-1].key, config_digest(cfg.outputs, cfg.mesh, cfg.hytale, cfg.tiling))
+
+    # Without a cached cleanup entry, cleanup runs inside tile export so tiles start before the map is clean.
+    stream_cleanup = bool(
+        cfg.runtime.stream_cleanup and not merge and not sharded and not cache.has(chain[-1].name, chain[-1].key)
     )
 
-    return summary
+    def terrain() -> StageState:
+        state = cache.run_chain(chain[:-1] if stream_cleanup else chain)
+        cache.evict()
+        return state
+
+    def prefabs(placements: PlacementTable, placement_index: PlacementIndex):
+        warnings: List[str] = []
+        if not (cfg.outputs.export_prefabs and len(placements)):
+            return None, warnings
+        lib = build_prefab_library(
+            placements,
+            placement_index.order,
+            models_dir=in_dir / "models",
+            out_dir=out_root / "prefabs",
+            rotation_step=cfg.outputs.prefab_rotation_step,
+            block_id=int(cfg.outputs.minecraft_block_ids.get("default", 1)),
+            write_bo2=cfg.outputs.export_bo2,
+        )
+        if lib.stats["missing_models"]:
+            _warn(f"{lib.stats['missing_models']} placed models have no OBJ under {in_dir / 'models'}", warnings)
+        return lib, warnings
+
+    def export_tiles(terrain: StageState, placements: PlacementTable, placement_index: PlacementIndex, prefabs):
+        arrays, meta = terrain
+        y, labels = arrays["y"], arrays["labels"]
+        run_dir = out_runbook
+        selected = selection
+        if sharded:
+            if selected is None:
+                selected = shard_tiles(cfg, y, labels, shard)  # type: ignore[arg-type]
+            check_selection(cfg, y.shape, selected)
+            run_dir = ensure_dir(shards_root / shard_name(shard, selected))
+        warnings: List[str] = []
+        export_stats: Dict[str, object] = {}
+        cleanup = CleanupStream(cfg, y.shape, arrays.get("dithered")) if stream_cleanup else None
+        if resume:
+            # Interrupted writers leave hidden temp files, never truncated outputs; drop them.
+            # Other shard hosts write into tiles/ and tile_grids/ concurrently: sweep only this shard's tiles.
+            owned = None if selected is None else (lambda name: tile_of_file(name) in selected)
+            stale = remove_stale_temp_files(run_dir)
+            stale += sum(remove_stale_temp_files(d, owned) for d in (out_tiles, grids_dir))
+            export_stats["stale_temp_files"] = stale
+        manifest_rows, tile_vertex_grids = _export_tiles(
+            cfg,
+            y,
+            labels,
+            out_tiles,
+            warnings,
+            placements=placements,
+            placement_index=placement_index,
+            prefabs=prefabs[0],
+            journal=_TileJournal(
+                run_dir / "tile_fingerprints.json",
+                manifest_path=run_dir / "tile_manifest.csv",
+                grids_dir=grids_dir,
+                resume=resume,
+            ),
+            export_stats=export_stats,
+            cost_log_path=run_dir / "tile_costs.csv",
+            tile_filter=selected,
+            cleanup=cleanup,
+        )
+        if cleanup is not None:
+            arrays = {k: v for k, v in arrays.items() if k != "dithered"}
+            terrain = {**arrays, "labels": cleanup.labels}, {**meta, "speckle": cleanup.stats()}
+            cache.record(chain[-1], terrain)
+            cache.evict()
+        lib, prefab_warnings = prefabs
+        out = {
+            "terrain": terrain,
+            "rows": manifest_rows,
+            "grids": tile_vertex_grids,
+            "stats": export_stats,
+            "warnings": prefab_warnings + warnings,
+            "prefabs": lib.stats if lib is not None else None,
+        }
+        if sharded:
+            out["report"] = write_shard_report(
+                run_dir, shard, shard_key, selected, export_stats, out["warnings"], out["prefabs"]  # type: ignore
+            )
+        return out
+
+    def merged_tiles(terrain: StageState):
+        y = terrain[0]["y"]
+        merged = merge_shard_reports(cfg, y.shape, shards_root, shard_key, out_runbook / "tile_manifest.csv", grids_dir)
+        return {"terrain": terrain, **merged}
+
+    def seam_qa(terrain: StageState, tiles):
+        y = terrain[0]["y"]
+        return seam_diff_report(y, _map_tiles(cfg, y.shape), tile_vertex_grids=tiles["grids"])
+
+    def summary(anchors, placements: PlacementTable, tiles, seam_qa, **_plots):
+        # The tiles stage hands on the cleaned terrain (cleanup may have been streamed into it).
+        arrays, stage_meta = tiles["terrain"]
+        y = arrays["y"]
+        _seam_map, seam_max = seam_qa
+        hstats = height_stats(y)
+        assert_height_range(y, cfg.qa.assert_height_range[0], cfg.qa.assert_height_range[1])
+        assert_seam_threshold(seam_max, cfg.qa.assert_max_seam_diff)
+
+        speckle_stats = stage_meta["speckle"]
+        noise_delta_range = stage_meta.get("noise_delta", [0.0, 0.0])
+        out = {
+            "map_name": cfg.project.map_name,
+            "input_dir": str(in_dir),
+            "output_dir": str(out_root),
+            "height_input": stage_meta["height_input"],
+            "input_decode": inputs.decode_stats,
+            "stage_cache": cache.summary(),
+            "height_fit": stage_meta["height_fit"],
+            "height_stats": hstats,
+            "qa": {
+                "seam_max_diff": int(seam_max),
+                "speckle_rate": speckle_stats["speckle_rate"],
+                "speckle_rate_max": speckle_stats["speckle_rate_max"],
+                "material_coverage": material_coverage(arrays["labels"], cfg.materials.layers),
+            },
+            "hydrology": {
+                "enabled": cfg.hydrology.enabled,
+                "river_pixels": stage_meta["river_pixels"],
+            },
+            "noise": {
+                "enabled": cfg.noise.enabled,
+                "delta_min": noise_delta_range[0],
+                "delta_max": noise_delta_range[1],
+            },
+            "palette_match": stage_meta["palette_match"],
+            "weights": stage_meta["weights"],
+            "anchors_loaded": 0 if anchors is None else len(anchors),
+            "objects": placements.summary(),
+            "prefabs": tiles["prefabs"],
+            "tile_export": tiles["stats"],
+            "warnings": tiles["warnings"],
+        }
+        # The tile manifest is already final: the export journal (or the shard merge) wrote it last.
+        write_json(out_qa / "summary.json", out)
+        return out
+
+    graph = StageGraph()
+    graph.add("placements", lambda: _load_placements(cfg))
+    if not any(cache.has(s.name, s.key) for s in chain[materials_at:]):
+        # Materials will be computed: resample its inputs while the height fit and hydrology run.
+        graph.add("resample_inputs", inputs.resample_aux)
+    graph.add("terrain", terrain)
+    if merge:
+        graph.add("tiles", merged_tiles, deps=("terrain",))
+    else:
+        graph.add(
+            "placement_index",
+            lambda placements: PlacementIndex.build(placements, _output_shape(cfg), cfg.tiling.tile_size),
+            deps=("placements",),
+        )
+        graph.add("prefabs", prefabs, deps=("placements", "placement_index"))
+        graph.add("tiles", export_tiles, deps=("terrain", "placements", "placement_index", "prefabs"))
+    if not sharded:
+        graph.add("anchors", lambda: read_optional_csv(in_dir / "anchors" / "landmarks.csv"))
+        graph.add(
+            "runbook",
+            lambda: write_generated_hytale_runbook(
+                out_runbook / "hytale_import_runbook.md",
+                map_name=cfg.project.map_name,
+                import_height=cfg.hytale.default_import_height,
+                base_fill_item_id=cfg.hytale.base_fill_item_id,
+                material_item_ids=cfg.hytale.material_item_ids,
+            ),
+        )
+        graph.add("seam_qa", seam_qa, deps=("terrain", "tiles"))
+        summary_deps: Tuple[str, ...] = ("anchors", "placements", "tiles", "seam_qa")
+        if cfg.qa.write_plots:
+            # pyplot keeps global state, so the two plots are chained rather than concurrent.
+            graph.add(
+                "height_plot",
+                lambda terrain: save_height_histogram(terrain[0]["y"], out_qa / "height_hist.png"),
+                deps=("terrain",),
+            )
+            graph.add(
+                "seam_plot",
+                lambda seam_qa, height_plot: save_seam_heatmap(seam_qa[0], out_qa / "seam_diff_heatmap.png"),
+                deps=("seam_qa", "height_plot"),
+            )
+            # The plots are what one looks at when the QA asserts in the summary fail, so they go first.
+            summary_deps += ("seam_plot",)
+        graph.add("summary", summary, deps=summary_deps)
+        if post_build is not None:
+            graph.add("post_build", lambda summary: post_build(), deps=("summary",))
+
+    results = graph.run(resolve_tile_workers(cfg, len(graph)))
+    out = dict(results["tiles"]["report"] if sharded else results["summary"])  # type: ignore[index]
+    out["stage_graph"] = dict(sorted(graph.timings.items()))
+    return out
+
+
+def preview_height_fit(cfg: PipelineConfig, allow_8bit_override: bool = False) -> Dict[str, object]:
+    """Fit stats and resulting Y distribution from the cached height histogram, without a full build.
+
+    Decodes the heightmap only when no matching histogram is cached yet (e.g. first run). Resampled heights
+    are fractional and have no exact histogram, so with ``resample.target_resolution`` the preview fits the
+    source heightmap's histogram instead (``resampled_approximation``): resampling barely moves the height
+    percentiles the fit is anchored to.
+    """
+    in_dir = map_input_dir(cfg)
+    height_path = height_raster_path(in_dir)
+    cache_path = height_histogram_cache_path(cfg)
+
+    shape = image_shape(height_path)
+    target = cfg.resample.target_resolution
+    resampled = target is not None and shape != (int(target), int(target))
+    hist = HeightHistogram.load(cache_path, height_histogram_key(height_path, shape))
+    cache_hit = hist is not None
+    if hist is None:
+        allow_8bit = bool(cfg.input.allow_8bit_height or allow_8bit_override)
+        height_raw, _meta = load_height_image(height_path, allow_8bit=allow_8bit)
+        nodata = height_nodata_mask(height_raw)
+        hist, cache_hit = cached_height_histogram(cfg, in_dir, height_raw, None if nodata is None else ~nodata)
+    if hist is None:
+        raise RuntimeError(f"Height fit preview needs an integer-valued heightmap: {height_path}")
+
+    lut, stats = height_fit_lut(hist, **fit_kwargs(cfg))
+    y_counts = np.bincount(lut.astype(np.int64), weights=hist.counts, minlength=cfg.height.total_height)
+    y_cum = np.cumsum(y_counts) / max(float(hist.total), 1.0)
+    return {
+        "height_fit": stats,
+        "histogram_cache_hit": cache_hit,
+        "y_p01": int(np.searchsorted(y_cum, 0.01)),
+        "y_p50": int(np.searchsorted(y_cum, 0.50)),
+        "y_p99": int(np.searchsorted(y_cum, 0.99)),
+        "sea_level_fraction": float(y_cum[min(int(cfg.height.sea_level_y), len(y_cum) - 1)]),
+        "resampled_approximation": resampled,
+    }
@@ -1,10 +1,145 @@
 from __future__ import annotations
 
-from typing import Dict, Tuple
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
 
 import numpy as np
 from scipy.ndimage import gaussian_filter
 
+from .utils import atomic_path
+
+# Exact-histogram fitting covers every 16-bit (and 8-bit) height sample value.
+HIST_BINS = 65536
+
+
+@dataclass
+class HeightHistogram:
+    """Per-value counts of an integer-valued heightmap; enough to re-fit without touching pixels."""
+
+    counts: np.ndarray
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @classmethod
+    def from_array(cls, height: np.ndarray, valid: Optional[np.ndarray] = None) -> Optional["HeightHistogram"]:
+        """Counts of the samples of ``height`` (only those where ``valid`` is True, when given)."""
+        raw = as_uint16_samples(height)
+        if raw is None:
+            return None
+        samples = raw.ravel() if valid is None else raw[valid]
+        return cls(counts=np.bincount(samples, minlength=HIST_BINS).astype(np.int64))
+
+    def percentile(self, p: float) -> float:
+        """Same value as ``np.percentile`` (linear method) on the underlying samples."""
+        cum = np.cumsum(self.counts)
+        n = int(cum[-1])
+        q = float(p) / 100.0
+        virtual = (n - 1) * q
+        lo = min(max(int(np.floor(virtual)), 0), n - 1)
+        hi = min(lo + 1, n - 1)
+        t = min(max(virtual - lo, 0.0), 1.0)
+        a = float(np.searchsorted(cum, lo, side="right"))
+        b = float(np.searchsorted(cum, hi, side="right"))
+        d = b - a
+        return b - d * (1.0 - t) if t >= 0.5 else a + d * t
+
+    def save(self, path: Path, key: str) -> None:
+        with atomic_path(path) as tmp, tmp.open("wb") as f:
+            np.savez_compressed(f, counts=self.counts, key=np.array(key))
+
+    @classmethod
+    def load(cls, path: Path, key: str) -> Optional["HeightHistogram"]:
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                if str(data["key"]) != key:
+                    return None
+                counts = data["counts"].astype(np.int64)
+        except Exception:
+            return None
+        if counts.shape != (HIST_BINS,):
+            return None
+        return cls(counts=counts)
+
+
+def as_uint16_samples(height: np.ndarray) -> Optional[np.ndarray]:
+    """Return ``height`` as uint16 when every sample is an integer in [0, 65535], else None."""
+    if height.dtype in (np.uint8, np.uint16):
+        return height.astype(np.uint16, copy=False)
+    if height.size == 0:
+        return None
+    lo = float(np.min(height))
+    hi = float(np.max(height))
+    if lo < 0.0 or hi > float(HIST_BINS - 1):
+        return None
+    if np.issubdtype(height.dtype, np.integer):
+        return height.astype(np.uint16)
+    raw = height.astype(np.uint16)
+    if not np.array_equal(raw, height):
+        return None
+    return raw
+
+
+def _fit_values(
+    h: np.ndarray,
+    h_min: float,
+    h_max: float,
+    total_height: int,
+    margin_bottom: int,
+    margin_top: int,
+    gamma: float,
+) -> np.ndarray:
+    h = np.clip(h, h_min, h_max)
+
+    eps = 1e-8
+    u = (h - h_min) / (h_max - h_min + eps)
+    u = np.clip(u, 0.0, 1.0)
+    u = np.power(u, gamma)
+
+    h_eff = total_height - margin_bottom - margin_top
+    y = margin_bottom + np.rint(u * h_eff)
+    return np.clip(y, 0, total_height - 1).astype(np.int16)
+
+
+def height_fit_lut(
+    hist: HeightHistogram,
+    total_height: int = 320,
+    margin_bottom: int = 12,
+    margin_top: int = 24,
+    p_low: float = 1.0,
+    p_high: float = 99.0,
+    gamma: float = 0.85,
+) -> Tuple[np.ndarray, Dict[str, float]]:
+    """uint16 -> int16 fit table and fit stats, computed from the histogram alone (milliseconds)."""
+    if total_height != 320:
+        raise ValueError("This pipeline assumes a fixed 320 block vertical budget")
+
+    h_min = hist.percentile(p_low)
+    h_max = hist.percentile(p_high)
+    lut = _fit_values(
+        np.arange(HIST_BINS, dtype=np.float32),
+        h_min,
+        h_max,
+        total_height,
+        margin_bottom,
+        margin_top,
+        gamma,
+    )
+
+    present = np.flatnonzero(hist.counts)
+    stats = {
+        "h_min_percentile": h_min,
+        "h_max_percentile": h_max,
+        "y_min": int(lut[present[0]]) if present.size else 0,
+        "y_max": int(lut[present[-1]]) if present.size else 0,
+        "h_eff": total_height - margin_bottom - margin_top,
+    }
+    return lut, stats
+
 
 def fit_height_to_budget(
     height: np.ndarray,
@@ -15,32 +150,44 @@ def fit_height_to_budget(
     p_high: float = 99.0,
     gamma: float = 0.85,
     smooth_sigma: float = 0.0,
+    histogram: Optional[HeightHistogram] = None,
+    valid: Optional[np.ndarray] = None,
 ) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Map ``height`` into the vertical budget; percentiles come from the ``valid`` pixels only, when given
+    (nodata pixels are still mapped, and clip to the bottom margin)."""
     if total_height != 320:
         raise ValueError("This pipeline assumes a fixed 320 block vertical budget")
 
+    if smooth_sigma <= 0:
+        # Integer-valued inputs: exact percentiles from the histogram and a table lookup per pixel.
+        raw = as_uint16_samples(height)
+        if raw is not None:
+            hist = histogram if histogram is not None else HeightHistogram.from_array(raw, valid)
+            lut, stats = height_fit_lut(
+                hist,
+                total_height=total_height,
+                margin_bottom=margin_bottom,
+                margin_top=margin_top,
+                p_low=p_low,
+                p_high=p_high,
+                gamma=gamma,
+            )
+            return lut[raw], stats
+
     h = height.astype(np.float32)
     if smooth_sigma > 0:
         h = gaussian_filter(h, sigma=smooth_sigma)
 
-    h_min = float(np.percentile(h, p_low))
-    h_max = float(np.percentile(h, p_high))
-    h = np.clip(h, h_min, h_max)
-
-    eps = 1e-8
-    u = (h - h_min) / (h_max - h_min + eps)
-    u = np.clip(u, 0.0, 1.0)
-    u = np.power(u, gamma)
-
-    h_eff = total_height - margin_bottom - margin_top
-    y = margin_bottom + np.rint(u * h_eff)
-    y = np.clip(y, 0, total_height - 1).astype(np.int16)
+    samples = h if valid is None else h[valid]
+    h_min = float(np.percentile(samples, p_low))
+    h_max = float(np.percentile(samples, p_high))
+    y = _fit_values(h, h_min, h_max, total_height, margin_bottom, margin_top, gamma)
 
     stats = {
         "h_min_percentile": h_min,
         "h_max_percentile": h_max,
         "y_min": int(y.min()),
         "y_max": int(y.max()),
-        "h_eff": h_eff,
+        "h_eff": total_height - margin_bottom - margin_top,
     }
     return y, stats
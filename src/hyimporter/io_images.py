@@ -1,13 +1,18 @@
 from __future__ import annotations
 
-import csv
-import json
+import time
+from collections import deque
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Callable, Dict, Iterator, Optional, Tuple
 
 import imageio.v3 as iio
 import numpy as np
 
+from .rasters import MOSAIC_INDEX, WINDOWED_SUFFIXES, MosaicRaster, list_rasters, open_raster
+from .resample import resample_weight_plane
+from .topk_weights import TopKWeights, add_layer, empty_topk
+
 
 def _to_float01(arr: np.ndarray) -> np.ndarray:
     arr = np.asarray(arr)
@@ -21,12 +26,65 @@ def _to_float01(arr: np.ndarray) -> np.ndarray:
     return np.clip(arr, 0.0, 1.0)
 
 
+class Float01Rows:
+    """Lazy [0, 1] float32 view of an integer or float raster; slicing promotes only the rows read."""
+
+    def __init__(self, raw, chunk_rows: int = 1024) -> None:
+        self.raw = raw
+        self.shape = tuple(int(s) for s in raw.shape)
+        dtype = np.dtype(raw.dtype)
+        if np.issubdtype(dtype, np.integer):
+            self.scale = float(np.iinfo(dtype).max)
+        else:
+            amax = 0.0
+            for r0 in range(0, self.shape[0], max(1, int(chunk_rows))):
+                band = np.asarray(raw[r0 : r0 + chunk_rows])
+                if band.size:
+                    amax = max(amax, float(np.max(band)))
+            self.scale = max(amax, 1e-6) if amax > 1.0 else 1.0
+
+    def __getitem__(self, key) -> np.ndarray:
+        arr = np.asarray(self.raw[key]).astype(np.float32)
+        if self.scale != 1.0:
+            arr /= self.scale
+        return np.clip(arr, 0.0, 1.0)
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        arr = self[:]
+        return arr if dtype is None else arr.astype(dtype)
+
+
+def image_shape(path: Path) -> Tuple[int, int]:
+    """(rows, cols) of an image read from its header only."""
+    if path.suffix.lower() in WINDOWED_SUFFIXES or path.name.lower() == MOSAIC_INDEX:
+        shape = open_raster(path).shape
+        return int(shape[0]), int(shape[1])
+
+    from PIL import Image
+
+    with Image.open(path) as im:
+        w, h = im.size
+    return int(h), int(w)
+
+
 def load_height_image(path: Path, allow_8bit: bool = False) -> Tuple[np.ndarray, Dict[str, object]]:
+    """Heightmap in its stored dtype; ``.npy``/``.r16``/TIFF inputs stay memory-mapped or windowed.
+
+    Promotion to float happens only where a stage needs it (resizing, smoothing, non-integer fits).
+    A mosaic with grid cells missing from its index is reported in ``meta["missing_tiles"]``; see
+    :func:`height_nodata_mask`.
+    """
     if not path.exists():
         raise FileNotFoundError(f"Height image not found: {path}")
-    arr = iio.imread(path)
+    arr = open_raster(path)
+    missing = arr.missing_cells if isinstance(arr, MosaicRaster) else []
+    if missing:
+        print(
+            f"WARN: {len(missing)} mosaic cell(s) missing from {path} (e.g. row={missing[0][0]} col={missing[0][1]}); "
+            "they read as height 0 and are left out of the height fit"
+        )
     if arr.ndim == 3:
-        arr = arr[..., 0]
+        arr = arr[:, :, 0]
     bit_depth: int
     if np.issubdtype(arr.dtype, np.integer):
         bit_depth = np.iinfo(arr.dtype).bits
@@ -49,119 +107,113 @@ def load_height_image(path: Path, allow_8bit: bool = False) -> Tuple[np.ndarray,
         "is_8bit": bool(is_8bit),
         "shape": [int(arr.shape[0]), int(arr.shape[1])],
     }
-    return arr.astype(np.float32), meta
+    if missing:
+        meta["missing_tiles"] = len(missing)
+    return arr, meta
 
 
-def load_weight_maps(weights_dir: Path) -> Dict[str, np.ndarray]:
-    if not weights_dir.exists():
-        return {}
+def height_nodata_mask(height) -> Optional[np.ndarray]:
+    """Pixels of a loaded heightmap that no source tile covers (None when there are none)."""
+    return height.nodata_mask() if isinstance(height, MosaicRaster) else None
+
 
-    out: Dict[str, np.ndarray] = {}
-    for p in sorted(weights_dir.glob("*.png")):
-        layer = p.stem.lower()
-        out[layer] = _to_float01(iio.imread(p))
+def _timed_decode(decode: Callable[[Path], object], path: Path, timings: Optional[Dict[str, float]]):
+    t0 = time.perf_counter()
+    out = decode(path)
+    if timings is not None:
+        timings[f"{path.parent.name}/{path.name}"] = round(time.perf_counter() - t0, 6)
     return out
 
 
-def load_masks(masks_dir: Path) -> Dict[str, np.ndarray]:
+def _iter_decoded(
+    paths: Dict[str, Path],
+    decode: Callable[[Path], object],
+    pool: Optional[Executor] = None,
+    timings: Optional[Dict[str, float]] = None,
+    ahead: Optional[int] = None,
+) -> Iterator[Tuple[str, object]]:
+    """Yield ``(name, decode(path))`` in ``paths`` order.
+
+    With a pool, decodes run concurrently, at most ``ahead`` of the consumer (all of them when None).
+    """
+    if pool is None:
+        for name, p in paths.items():
+            yield name, _timed_decode(decode, p, timings)
+        return
+
+    limit = len(paths) if ahead is None else max(1, int(ahead))
+    pending = deque()
+    for name, p in paths.items():
+        pending.append((name, pool.submit(_timed_decode, decode, p, timings)))
+        if len(pending) > limit:
+            done_name, fut = pending.popleft()
+            yield done_name, fut.result()
+    while pending:
+        done_name, fut = pending.popleft()
+        yield done_name, fut.result()
+
+
+def _decode_weight(path: Path) -> np.ndarray:
+    return _to_float01(np.asarray(open_raster(path)))
+
+
+def _decode_mask(path: Path) -> np.ndarray:
+    arr = open_raster(path)
+    if arr.ndim == 3:
+        arr = arr[:, :, 0]
+    return np.asarray(arr) > 0
+
+
+def load_weight_maps(
+    weights_dir: Path,
+    pool: Optional[Executor] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, np.ndarray]:
+    if not weights_dir.exists():
+        return {}
+    return dict(_iter_decoded(list_rasters(weights_dir), _decode_weight, pool, timings))
+
+
+def load_weight_maps_topk(
+    weights_dir: Path,
+    k: int = 4,
+    pool: Optional[Executor] = None,
+    timings: Optional[Dict[str, float]] = None,
+    prefetch: int = 2,
+) -> TopKWeights:
+    """Decode weight maps straight into a top-k table (no dense per-layer planes kept); layers whose size
+    differs from the first one are resampled to it.
+
+    With a pool, up to ``prefetch`` layers decode ahead of the one being folded in.
+    """
+    tk = empty_topk([], (0, 0), k)
+    for layer, raw in _iter_decoded(list_rasters(weights_dir), open_raster, pool, timings, ahead=prefetch):
+        plane = Float01Rows(raw)
+        if tk.shape == (0, 0):
+            tk = empty_topk([], plane.shape, k)
+        elif plane.shape != tk.shape:
+            # Layers of another size are resampled to the first layer's grid, band by band as they are folded in.
+            plane = resample_weight_plane(plane, tk.shape)
+        add_layer(tk, layer, plane)
+    return tk
+
+
+def load_masks(
+    masks_dir: Path,
+    pool: Optional[Executor] = None,
+    timings: Optional[Dict[str, float]] = None,
+) -> Dict[str, np.ndarray]:
     if not masks_dir.exists():
         return {}
-
-    out: Dict[str, np.ndarray] = {}
-    for p in sorted(masks_dir.glob("*.png")):
-        name = p.stem.lower()
-        arr = iio.imread(p)
-        if arr.ndim == 3:
-            arr = arr[..., 0]
-        out[name] = arr > 0
-    return out
+    return dict(_iter_decoded(list_rasters(masks_dir), _decode_mask, pool, timings))
 
 
-def load_colormap(color_path: Path) -> Optional[np.ndarray]:
+def load_colormap(color_path: Path, timings: Optional[Dict[str, float]] = None) -> Optional[np.ndarray]:
     if not color_path.exists():
         return None
-    arr = iio.imread(color_path)
+    arr = _timed_decode(iio.imread, color_path, timings)
     if arr.ndim == 2:
         arr = np.stack([arr, arr, arr], axis=-1)
     if arr.shape[-1] > 3:
         arr = arr[..., :3]
     return _to_float01(arr)
-
-
-def load_object_placements(map_dir: Path) -> Dict[str, int]:
-    """Best-effort ingestion of optional WMO/M2/object placement data."""
-
-    def count_json(path: Path) -> Dict[str, int]:
-        out = {"entries": 0, "wmo": 0, "m2": 0}
-        try:
-            payload = json.loads(path.read_text(encoding="utf-8"))
-        except Exception:
-            return out
-
-        if isinstance(payload, list):
-            out["entries"] = len(payload)
-            for row in payload:
-                if not isinstance(row, dict):
-                    continue
-                kind = str(row.get("type", row.get("kind", ""))).lower()
-                if kind == "wmo":
-                    out["wmo"] += 1
-                elif kind == "m2":
-                    out["m2"] += 1
-        elif isinstance(payload, dict):
-            # Common forms: { "objects": [...] } / { "wmo": [...], "m2": [...] }
-            if isinstance(payload.get("objects"), list):
-                out["entries"] += len(payload["objects"])
-            if isinstance(payload.get("wmo"), list):
-                out["wmo"] += len(payload["wmo"])
-                out["entries"] += len(payload["wmo"])
-            if isinstance(payload.get("m2"), list):
-                out["m2"] += len(payload["m2"])
-                out["entries"] += len(payload["m2"])
-        return out
-
-    def count_csv(path: Path) -> Dict[str, int]:
-        out = {"entries": 0, "wmo": 0, "m2": 0}
-        try:
-            with path.open("r", encoding="utf-8") as f:
-                rows = list(csv.DictReader(f))
-        except Exception:
-            return out
-        out["entries"] = len(rows)
-        for row in rows:
-            kind = str(row.get("type", row.get("kind", ""))).lower()
-            if kind == "wmo":
-                out["wmo"] += 1
-            elif kind == "m2":
-                out["m2"] += 1
-        return out
-
-    roots = [
-        map_dir / "objects",
-        map_dir / "placements",
-        map_dir / "wmo",
-        map_dir / "m2",
-    ]
-    json_files = []
-    csv_files = []
-    for r in roots:
-        if not r.exists():
-            continue
-        json_files.extend(sorted(r.glob("*.json")))
-        csv_files.extend(sorted(r.glob("*.csv")))
-
-    summary = {"source_files": 0, "entries": 0, "wmo": 0, "m2": 0}
-    for p in json_files:
-        c = count_json(p)
-        summary["source_files"] += 1
-        summary["entries"] += c["entries"]
-        summary["wmo"] += c["wmo"]
-        summary["m2"] += c["m2"]
-    for p in csv_files:
-        c = count_csv(p)
-        summary["source_files"] += 1
-        summary["entries"] += c["entries"]
-        summary["wmo"] += c["wmo"]
-        summary["m2"] += c["m2"]
-
-    return summary
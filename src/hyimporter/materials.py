@@ -1,11 +1,18 @@
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
-from scipy.ndimage import binary_dilation
+from scipy import ndimage
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from skimage import color
 
+from .topk_weights import TopKWeights
+
+WeightsInput = Union[Dict[str, np.ndarray], TopKWeights]
+
 
 DEFAULT_LAYER_RGB = {
     "grass": (0.33, 0.57, 0.28),
@@ -18,28 +25,95 @@ DEFAULT_LAYER_RGB = {
 }
 
 
-def _hysteresis_mask(slope: np.ndarray, s_high: float, s_low: float) -> np.ndarray:
-    strong = slope > float(s_high)
-    weak = slope > float(s_low)
-    out = strong.copy()
+def _label_weak_band(slope: np.ndarray, r0: int, r1: int, s_low: float) -> Tuple[np.ndarray, int]:
+    comps, n = ndimage.label(slope[r0:r1] > s_low)
+    return comps.astype(np.int32, copy=False), int(n)
+
 
-    # Binary hysteresis expansion: stable cliff mask without pepper noise.
-    while True:
-        grown = binary_dilation(out, iterations=1) & weak
-        if np.array_equal(grown, out):
-            break
-        out = grown
+def _hysteresis_mask(
+    slope: np.ndarray,
+    s_high: float,
+    s_low: float,
+    chunk_rows: int = 2048,
+) -> np.ndarray:
+    """Keep weak-slope components (4-connected) that touch a strong pixel.
+
+    Same semantics as ``skimage.filters.apply_hysteresis_threshold``. Maps taller than
+    ``chunk_rows`` are labelled band by band so only one band's label image is alive at once.
+    """
+    h = int(slope.shape[0])
+    s_high = float(s_high)
+    s_low = float(s_low)
+
+    if chunk_rows <= 0 or h <= chunk_rows:
+        comps, n = _label_weak_band(slope, 0, h, s_low)
+        keep = np.zeros(n + 1, dtype=bool)
+        keep[comps[slope > s_high]] = True
+        keep[0] = False
+        return keep[comps]
+
+    bands = [(r0, min(r0 + chunk_rows, h)) for r0 in range(0, h, chunk_rows)]
+    offsets: List[int] = []
+    strong_flags: List[np.ndarray] = [np.zeros(1, dtype=bool)]
+    seam_a: List[np.ndarray] = []
+    seam_b: List[np.ndarray] = []
+    n_total = 0
+    prev_last_row: Optional[np.ndarray] = None
+
+    # Pass 1: label each band, record which labels hold strong pixels and which touch across band seams.
+    for r0, r1 in bands:
+        comps, n = _label_weak_band(slope, r0, r1, s_low)
+        comps[comps > 0] += n_total
+        strong_ids = comps[slope[r0:r1] > s_high]
+        flags = np.zeros(n, dtype=bool)
+        flags[strong_ids[strong_ids > 0] - n_total - 1] = True
+        strong_flags.append(flags)
+        if prev_last_row is not None:
+            both = (prev_last_row > 0) & (comps[0] > 0)
+            seam_a.append(prev_last_row[both])
+            seam_b.append(comps[0][both])
+        prev_last_row = comps[-1].copy()
+        offsets.append(n_total)
+        n_total += n
+
+    a = np.concatenate(seam_a) if seam_a else np.zeros(0, dtype=np.int32)
+    b = np.concatenate(seam_b) if seam_b else np.zeros(0, dtype=np.int32)
+    graph = coo_matrix((np.ones(a.size, dtype=np.int8), (a, b)), shape=(n_total + 1, n_total + 1))
+    _n_merged, merged = connected_components(graph, directed=False)
+    strong = np.concatenate(strong_flags)
+    merged_strong = np.bincount(merged, weights=strong.astype(np.float64)) > 0
+    keep = merged_strong[merged]
+    keep[0] = False
+
+    # Pass 2: relabel deterministically and map through the merged keep table.
+    out = np.zeros(slope.shape, dtype=bool)
+    for (r0, r1), offset in zip(bands, offsets):
+        comps, _n = _label_weak_band(slope, r0, r1, s_low)
+        comps[comps > 0] += offset
+        out[r0:r1] = keep[comps]
     return out
 
 
-def _build_weight_stack(
+def _check_weight_shapes(weights: WeightsInput, layers: List[str], shape: Tuple[int, int]) -> None:
+    if isinstance(weights, TopKWeights):
+        if weights.layers and weights.shape != tuple(shape):
+            raise ValueError(f"Top-k weight shape mismatch: {weights.shape} vs {shape}")
+        return
+    for name in layers:
+        if name in weights and tuple(weights[name].shape) != tuple(shape):
+            raise ValueError(f"Weight shape mismatch for {name}: {weights[name].shape} vs {shape}")
+
+
+def _normalized_weight_rows(
     weights: Dict[str, np.ndarray],
     layers: List[str],
     default_layer: str,
-    shape: Tuple[int, int],
+    r0: int,
+    r1: int,
+    width: int,
 ) -> np.ndarray:
-    h, w = shape
-    stack = np.zeros((h, w, len(layers)), dtype=np.float32)
+    """Per-pixel normalized (rows, W, L) weight stack for rows ``r0:r1`` only."""
+    stack = np.zeros((r1 - r0, width, len(layers)), dtype=np.float32)
 
     if not weights:
         if default_layer in layers:
@@ -48,10 +122,7 @@ def _build_weight_stack(
 
     for i, name in enumerate(layers):
         if name in weights:
-            arr = np.asarray(weights[name], dtype=np.float32)
-            if arr.shape != shape:
-                raise ValueError(f"Weight shape mismatch for {name}: {arr.shape} vs {shape}")
-            stack[..., i] = np.clip(arr, 0.0, 1.0)
+            stack[..., i] = np.clip(np.asarray(weights[name][r0:r1], dtype=np.float32), 0.0, 1.0)
 
     sums = np.sum(stack, axis=-1, keepdims=True)
     missing = sums[..., 0] <= 1e-8
@@ -60,7 +131,90 @@ def _build_weight_stack(
         sums = np.sum(stack, axis=-1, keepdims=True)
 
     sums = np.where(sums <= 1e-8, 1.0, sums)
-    return stack / sums
+    stack /= sums
+    return stack
+
+
+def _topk_argmax_rows(
+    tk: TopKWeights,
+    layers: List[str],
+    default_layer: str,
+    r0: int,
+    r1: int,
+) -> np.ndarray:
+    """Argmax over configured layers straight from top-k slots; ties go to the lower layer index."""
+    lut = np.full(256, -1, dtype=np.int32)
+    for i, name in enumerate(tk.layers):
+        if name in layers:
+            lut[i] = layers.index(name)
+    cfg_idx = lut[tk.indices[r0:r1]]
+    vals = np.where(cfg_idx >= 0, tk.values[r0:r1], 0).astype(np.int32)
+    key = np.where(cfg_idx >= 0, vals * 256 + (255 - cfg_idx), -1)
+    best = np.argmax(key, axis=-1)[..., None]
+    out = np.take_along_axis(cfg_idx, best, axis=-1)[..., 0]
+
+    missing = np.max(vals, axis=-1) == 0
+    out[missing] = layers.index(default_layer) if default_layer in layers else 0
+    return out.astype(np.int16)
+
+
+# Bits per RGB channel for the palette lookup table (6 => 64^3 colour cells).
+PALETTE_LUT_BITS = 6
+
+
+def _layer_rgb(name: str) -> Tuple[float, float, float]:
+    return tuple(float(c) for c in DEFAULT_LAYER_RGB.get(name, (0.5, 0.5, 0.5)))  # type: ignore[return-value]
+
+
+@lru_cache(maxsize=8)
+def _palette_delta_e_lut(layer_rgb: Tuple[Tuple[float, float, float], ...], bits: int) -> np.ndarray:
+    """CIEDE2000 distance from every quantized RGB cell to every layer colour, shape (levels^3, L)."""
+    levels = 1 << bits
+    axis = np.arange(levels, dtype=np.float64) / float(levels - 1)
+    r, g, b = np.meshgrid(axis, axis, axis, indexing="ij")
+    grid = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=-1)
+    grid_lab = color.rgb2lab(grid[:, None, :])[:, 0, :]
+    layer_lab = color.rgb2lab(np.asarray(layer_rgb, dtype=np.float64)[None, :, :])[0]
+    de = color.deltaE_ciede2000(grid_lab[:, None, :], layer_lab[None, :, :])
+    return de.astype(np.float32)
+
+
+def _quantize_rgb(colormap: np.ndarray, bits: int) -> np.ndarray:
+    levels = 1 << bits
+    q = np.rint(np.clip(colormap, 0.0, 1.0) * float(levels - 1)).astype(np.int32)
+    return (q[..., 0] << (2 * bits)) | (q[..., 1] << bits) | q[..., 2]
+
+
+def _weighted_percentile(values: np.ndarray, counts: np.ndarray, p: float) -> float:
+    """``np.percentile`` (linear) over a multiset given as distinct values with repeat counts."""
+    order = np.argsort(values, kind="stable")
+    v = values[order]
+    cum = np.cumsum(counts[order])
+    pos = (float(p) / 100.0) * float(cum[-1] - 1)
+    lo = int(np.floor(pos))
+    hi = min(lo + 1, int(cum[-1] - 1))
+    v_lo = float(v[np.searchsorted(cum, lo, side="right")])
+    v_hi = float(v[np.searchsorted(cum, hi, side="right")])
+    return v_lo + (pos - lo) * (v_hi - v_lo)
+
+
+def _bayer_matrix(size: int) -> np.ndarray:
+    m = np.zeros((1, 1), dtype=np.int32)
+    while m.shape[0] < size:
+        m = np.block([[4 * m, 4 * m + 2], [4 * m + 3, 4 * m + 1]])
+    return m
+
+
+def ordered_dither_thresholds(
+    shape: Tuple[int, int],
+    origin: Tuple[int, int] = (0, 0),
+    size: int = 8,
+) -> np.ndarray:
+    """Bayer thresholds in (0, 1) anchored to world coordinates, so any tile window sees the same pattern."""
+    m = (_bayer_matrix(size).astype(np.float32) + 0.5) / float(size * size)
+    xs = (np.arange(shape[0]) + int(origin[0])) % size
+    zs = (np.arange(shape[1]) + int(origin[1])) % size
+    return m[xs[:, None], zs[None, :]]
 
 
 def _pick_by_palette_lab(
@@ -70,26 +224,45 @@ def _pick_by_palette_lab(
     cliff_mask: np.ndarray,
     snow_mask: np.ndarray,
     beach_mask: np.ndarray,
+    lut_bits: int = PALETTE_LUT_BITS,
+    dither: bool = False,
+    origin: Tuple[int, int] = (0, 0),
+    plain: Optional[np.ndarray] = None,
 ) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Closest layer colour per pixel within each gate; with ``dither``, ``plain`` (when given) receives
+    the undithered pick."""
     layer_to_idx = {n: i for i, n in enumerate(layer_names)}
-    layer_lab = {}
-    for name in layer_names:
-        rgb = np.array(DEFAULT_LAYER_RGB.get(name, (0.5, 0.5, 0.5)), dtype=np.float32)[None, None, :]
-        layer_lab[name] = color.rgb2lab(rgb)[0, 0, :]
-
-    img_lab = color.rgb2lab(np.clip(colormap.astype(np.float32), 0.0, 1.0))
+    de_lut = _palette_delta_e_lut(tuple(_layer_rgb(n) for n in layer_names), int(lut_bits))
+    qidx = _quantize_rgb(colormap, int(lut_bits))
     labels = base_labels.copy()
+    thresholds = ordered_dither_thresholds(base_labels.shape, origin=origin) if dither else None
 
     def choose(mask: np.ndarray, allowed: Iterable[str]) -> None:
         names = [n for n in allowed if n in layer_to_idx]
         if not names or not np.any(mask):
             return
         cand_idx = np.array([layer_to_idx[n] for n in names], dtype=np.int16)
-        cand_lab = np.stack([layer_lab[n] for n in names], axis=0)
+        # Colour-cell -> label table for this allowed set; only masked pixels are looked up.
+        cand_de = de_lut[:, cand_idx]
+        if thresholds is None or len(names) < 2:
+            best = cand_idx[np.argmin(cand_de, axis=1)]
+            labels[mask] = best[qidx[mask]]
+            if plain is not None:
+                plain[mask] = labels[mask]
+            return
 
-        de = color.deltaE_ciede2000(img_lab[..., None, :], cand_lab[None, None, :, :])
-        best = np.argmin(de, axis=-1)
-        labels[mask] = cand_idx[best[mask]]
+        # Ordered dither between the two closest layers: the runner-up wins where the
+        # threshold falls below its share d1^2 / (d1^2 + d2^2), which is 0.5 at an exact tie.
+        # Squaring keeps LUT quantization error near a layer colour from leaking speckle.
+        order = np.argsort(cand_de, axis=1, kind="stable")[:, :2]
+        d2 = np.square(np.take_along_axis(cand_de, order, axis=1))
+        share = d2[:, 0] / np.maximum(d2[:, 0] + d2[:, 1], 1e-6)
+        q = qidx[mask]
+        use_second = thresholds[mask] < share[q]
+        first = cand_idx[order[q, 0]]
+        labels[mask] = np.where(use_second, cand_idx[order[q, 1]], first)
+        if plain is not None:
+            plain[mask] = first
 
     choose(cliff_mask, ["rock", "snow"])
     choose(snow_mask & (~cliff_mask), ["snow", "rock"])
@@ -98,22 +271,27 @@ def _pick_by_palette_lab(
     normal = (~cliff_mask) & (~snow_mask) & (~beach_mask)
     choose(normal, layer_names)
 
-    de_all = color.deltaE_ciede2000(
-        img_lab,
-        np.stack([layer_lab[layer_names[int(i)]] for i in labels.ravel()], axis=0).reshape(img_lab.shape),
+    # deltaE only takes values from the LUT, so gather per-(cell, label) counts instead of per-pixel floats.
+    n_layers = len(layer_names)
+    counts = np.bincount(
+        (qidx.ravel().astype(np.int64) * n_layers + labels.ravel().astype(np.int64)),
+        minlength=de_lut.size,
     )
+    present = counts > 0
+    de_vals = de_lut.ravel()[present].astype(np.float64)
+    de_counts = counts[present]
 
     return labels, {
-        "deltaE_mean": float(np.mean(de_all)),
-        "deltaE_p95": float(np.percentile(de_all, 95)),
-        "deltaE_max": float(np.max(de_all)),
+        "deltaE_mean": float(np.sum(de_vals * de_counts) / float(np.sum(de_counts))),
+        "deltaE_p95": _weighted_percentile(de_vals, de_counts, 95),
+        "deltaE_max": float(np.max(de_vals)),
     }
 
 
 def assign_material_labels(
     y_int: np.ndarray,
     slope: np.ndarray,
-    weights: Dict[str, np.ndarray],
+    weights: WeightsInput,
     masks: Dict[str, np.ndarray],
     layer_names: List[str],
     default_layer: str,
@@ -124,38 +302,63 @@ def assign_material_labels(
     cliff_slope_low: float,
     colormap: Optional[np.ndarray] = None,
     palette_match_enabled: bool = False,
+    palette_dither: bool = False,
+    chunk_rows: int = 256,
+    defer_dither: bool = False,
 ) -> Tuple[np.ndarray, Dict[str, np.ndarray], Dict[str, float]]:
+    """Per-pixel material layer indices, the cliff/snow/beach gate masks and palette deltaE stats.
+
+    With ``defer_dither``, the returned labels are the undithered palette pick and the dithered ones come
+    back as ``masks["dithered"]``, so label cleanup can run before the dither pattern is applied.
+    """
     shape = y_int.shape
     layer_to_idx = {name: i for i, name in enumerate(layer_names)}
-    stack = _build_weight_stack(weights, layer_names, default_layer, shape)
-
-    labels = np.argmax(stack, axis=-1).astype(np.int16)
+    if isinstance(weights, TopKWeights) and not weights.layers:
+        weights = {}
+    _check_weight_shapes(weights, layer_names, shape)
 
     cliff_mask = _hysteresis_mask(slope, cliff_slope_high, cliff_slope_low)
     snow_mask = y_int >= int(snowline_y)
     beach_mask = np.abs(y_int.astype(np.int32) - int(sea_level_y)) <= int(beach_band_dy)
+    river_mask = masks["river"] if "river" in masks else None
 
     rock_idx = layer_to_idx.get("rock", 0)
     snow_idx = layer_to_idx.get("snow", rock_idx)
     sand_idx = layer_to_idx.get("sand", rock_idx)
     mud_idx = layer_to_idx.get("mud", sand_idx)
 
-    labels[cliff_mask] = rock_idx
-
-    # Snowline gate forces snow/rock palette.
-    labels[snow_mask & (~cliff_mask)] = snow_idx
-    labels[snow_mask & cliff_mask] = rock_idx
-
-    # Beach gate biases sand; river can bias mud if available.
-    beach_target = beach_mask & (~cliff_mask) & (~snow_mask)
-    labels[beach_target] = sand_idx
-
-    if "river" in masks:
-        river = masks["river"].astype(bool)
-        labels[river & (~cliff_mask) & (~snow_mask)] = mud_idx
+    # Fused normalize -> argmax -> overrides per row band; the full HxWxL stack is never allocated.
+    labels = np.empty(shape, dtype=np.int16)
+    rows = max(1, int(chunk_rows))
+    for r0 in range(0, int(shape[0]), rows):
+        r1 = min(int(shape[0]), r0 + rows)
+        band = labels[r0:r1]
+        if isinstance(weights, TopKWeights):
+            band[...] = _topk_argmax_rows(weights, layer_names, default_layer, r0, r1)
+        else:
+            stack = _normalized_weight_rows(weights, layer_names, default_layer, r0, r1, int(shape[1]))
+            band[...] = np.argmax(stack, axis=-1)
+            del stack
+
+        cliff = cliff_mask[r0:r1]
+        snow = snow_mask[r0:r1]
+        band[cliff] = rock_idx
+
+        # Snowline gate forces snow/rock palette.
+        band[snow & (~cliff)] = snow_idx
+        band[snow & cliff] = rock_idx
+
+        # Beach gate biases sand; river can bias mud if available.
+        band[beach_mask[r0:r1] & (~cliff) & (~snow)] = sand_idx
+
+        if river_mask is not None:
+            river = river_mask[r0:r1].astype(bool)
+            band[river & (~cliff) & (~snow)] = mud_idx
 
     de_stats: Dict[str, float] = {}
+    plain: Optional[np.ndarray] = None
     if palette_match_enabled and colormap is not None:
+        plain = labels.copy() if (palette_dither and defer_dither) else None
         labels, de_stats = _pick_by_palette_lab(
             labels,
             colormap,
@@ -163,6 +366,8 @@ def assign_material_labels(
             cliff_mask,
             snow_mask,
             beach_mask,
+            dither=palette_dither,
+            plain=plain,
         )
 
     masks_out = {
@@ -170,5 +375,8 @@ def assign_material_labels(
         "snow": snow_mask,
         "beach": beach_mask,
     }
+    if plain is not None:
+        masks_out["dithered"] = labels
+        labels = plain
 
     return labels, masks_out, de_stats
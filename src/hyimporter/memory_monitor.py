@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+_PROC = Path("/proc")
+
+
+def _proc_children() -> Dict[int, List[int]]:
+    children: Dict[int, List[int]] = {}
+    for entry in _PROC.iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+            # The command name may contain spaces; fields after it are fixed.
+            ppid = int(stat[stat.rindex(")") + 2 :].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(entry.name))
+    return children
+
+
+def _process_bytes(pid: int) -> int:
+    """Proportional set size (shared pages such as shared-memory tiles split between users), else RSS."""
+    try:
+        for line in (_PROC / str(pid) / "smaps_rollup").read_text().splitlines():
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return int((_PROC / str(pid) / "statm").read_text().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def process_tree_bytes(pid: Optional[int] = None) -> Optional[int]:
+    """Memory of a process and all its descendants (worker pools, forkserver); None without ``/proc``."""
+    if not (_PROC / "self" / "stat").exists():
+        return None
+    root = os.getpid() if pid is None else int(pid)
+    children = _proc_children()
+    total = 0
+    stack, seen = [root], set()
+    while stack:
+        p = stack.pop()
+        if p in seen:
+            continue
+        seen.add(p)
+        total += _process_bytes(p)
+        stack.extend(children.get(p, ()))
+    return total
+
+
+class PeakMemorySampler:
+    """Samples :func:`process_tree_bytes` on a background thread; ``peak`` / ``baseline`` are None
+    where the platform offers no ``/proc``."""
+
+    def __init__(self, interval_s: float = 0.2) -> None:
+        self.interval_s = float(interval_s)
+        self.baseline: Optional[int] = None
+        self.peak: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def sample(self) -> None:
+        now = process_tree_bytes()
+        if now is not None:
+            self.peak = now if self.peak is None else max(self.peak, now)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.sample()
+
+    def __enter__(self) -> "PeakMemorySampler":
+        self.baseline = process_tree_bytes()
+        self.peak = self.baseline
+        if self.baseline is not None:
+            self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
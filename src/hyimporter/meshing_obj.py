@@ -6,6 +6,8 @@ from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 
+from .utils import atomic_path
+
 
 @dataclass
 class MeshData:
@@ -165,8 +167,7 @@ def build_surface_shell_mesh(
 
 
 def write_obj(path: Path, mesh: MeshData) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
+    with atomic_path(path) as tmp, tmp.open("w", encoding="utf-8") as f:
         f.write("# Generated by hyimporter\n")
         for x, y, z in mesh.vertices:
             f.write(f"v {x:.6f} {y:.6f} {z:.6f}\n")
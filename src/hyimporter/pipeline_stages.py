@@ -0,0 +1,383 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .config import PipelineConfig, map_input_dir, map_output_dir
+from .geom_fields import compute_geom_fields
+from .height_fit import HeightHistogram, fit_height_to_budget
+from .hydrology import apply_hydrology
+from .io_images import (
+    height_nodata_mask,
+    load_colormap,
+    load_height_image,
+    load_masks,
+    load_weight_maps,
+    load_weight_maps_topk,
+)
+from .materials import assign_material_labels
+from .noise import apply_multiscale_noise
+from .rasters import find_raster, list_rasters, raster_source_files
+from .resample import resample_colormap, resample_height, resample_masks, resample_topk, resample_weights
+from .stage_cache import Stage, StageCache, StageState, code_digest, config_digest, file_digest
+from .tile_cleanup import cleanup_labels_in_expanded_tiles
+from .tile_scheduler import resolve_tile_workers
+from .topk_weights import TopKWeights
+
+
+def height_raster_path(in_dir: Path) -> Path:
+    return find_raster(in_dir / "height", "height")
+
+
+def height_histogram_cache_path(cfg: PipelineConfig) -> Path:
+    return map_output_dir(cfg) / "cache" / "height_histogram.npz"
+
+
+def height_histogram_key(height_path: Path, shape: Tuple[int, int]) -> str:
+    stats = [p.stat() for p in raster_source_files(height_path)]
+    size = sum(st.st_size for st in stats)
+    mtime = max(st.st_mtime_ns for st in stats)
+    return f"{height_path.resolve()}|{len(stats)}|{size}|{mtime}|{int(shape[0])}x{int(shape[1])}"
+
+
+def cached_height_histogram(
+    cfg: PipelineConfig,
+    in_dir: Path,
+    height: np.ndarray,
+    valid: Optional[np.ndarray] = None,
+) -> tuple[Optional[HeightHistogram], bool]:
+    """Histogram of the (resampled) height, reused across runs until the height file or shape changes.
+
+    Only ``valid`` pixels are counted, when given; the nodata mask follows from the files the key covers.
+    """
+    cache_path = height_histogram_cache_path(cfg)
+    key = height_histogram_key(height_raster_path(in_dir), height.shape)
+    cached = HeightHistogram.load(cache_path, key)
+    if cached is not None:
+        return cached, True
+    hist = HeightHistogram.from_array(height, valid)
+    if hist is not None:
+        hist.save(cache_path, key)
+    return hist, False
+
+
+def fit_kwargs(cfg: PipelineConfig) -> Dict[str, object]:
+    return {
+        "total_height": cfg.height.total_height,
+        "margin_bottom": cfg.height.margin_bottom,
+        "margin_top": cfg.height.margin_top,
+        "p_low": cfg.height.percentile_low,
+        "p_high": cfg.height.percentile_high,
+        "gamma": cfg.height.gamma,
+    }
+
+
+def _input_paths(cfg: PipelineConfig) -> Tuple[Path, Path, Path, Path, Path]:
+    """(map input dir, height raster, weights dir, masks dir, colormap) for ``cfg``."""
+    in_dir = map_input_dir(cfg)
+    weights_dir = in_dir / "weights"
+    if not weights_dir.exists():
+        weights_dir = in_dir / "weightmaps"
+    return in_dir, height_raster_path(in_dir), weights_dir, in_dir / "masks", in_dir / "color" / "colormap.png"
+
+
+def _load_inputs(cfg: PipelineConfig, allow_8bit_override: bool = False):
+    in_dir, height_path, weights_dir, masks_dir, color_path = _input_paths(cfg)
+    allow_8bit = bool(cfg.input.allow_8bit_height or allow_8bit_override)
+
+    timings: Dict[str, float] = {}
+
+    def load_height():
+        t0 = time.perf_counter()
+        out = load_height_image(height_path, allow_8bit=allow_8bit)
+        timings[f"{height_path.parent.name}/{height_path.name}"] = round(time.perf_counter() - t0, 6)
+        return out
+
+    def load_weights(pool):
+        if int(cfg.input.weight_top_k) > 0:
+            return load_weight_maps_topk(weights_dir, k=int(cfg.input.weight_top_k), pool=pool, timings=timings)
+        return load_weight_maps(weights_dir, pool=pool, timings=timings)
+
+    n_files = 2 + len(list_rasters(weights_dir)) + len(list_rasters(masks_dir))
+    workers = resolve_tile_workers(cfg, n_files)
+    wall0 = time.perf_counter()
+    if workers > 1:
+        # Threads: PNG inflate and zlib run outside the GIL, and decoded arrays need no pickling.
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            height_f = pool.submit(load_height)
+            colormap_f = pool.submit(load_colormap, color_path, timings)
+            # The masks task is the only one that waits inside the pool, so >= 2 workers cannot deadlock.
+            masks_f = pool.submit(load_masks, masks_dir, pool, timings)
+            height, height_meta = height_f.result()
+            weights = load_weights(pool)
+            masks = masks_f.result()
+            colormap = colormap_f.result()
+    else:
+        height, height_meta = load_height()
+        weights = load_weights(None)
+        masks = load_masks(masks_dir, timings=timings)
+        colormap = load_colormap(color_path, timings=timings)
+    decode_stats = {
+        "workers": int(workers),
+        "wall_s": round(time.perf_counter() - wall0, 6),
+        "files_s": dict(sorted(timings.items())),
+    }
+
+    return in_dir, height, height_meta, weights, masks, colormap, decode_stats
+
+
+def _target_shape(height: np.ndarray, cfg: PipelineConfig) -> tuple[int, int]:
+    if cfg.resample.target_resolution is None:
+        return int(height.shape[0]), int(height.shape[1])
+    r = int(cfg.resample.target_resolution)
+    return r, r
+
+
+def _weights_summary(weights) -> Dict[str, object]:
+    if isinstance(weights, TopKWeights):
+        return {"representation": "top_k", "k": weights.k, "layers": list(weights.layers), "bytes": weights.nbytes}
+    return {
+        "representation": "dense",
+        "layers": sorted(weights.keys()),
+        "bytes": int(sum(v.nbytes for v in weights.values())),
+    }
+
+
+class PipelineInputs:
+    """Decoded and resampled input rasters, produced on first use so fully cached runs never decode.
+
+    Each value is built once under its own lock, so graph stages may request them concurrently
+    (e.g. weights resampling on one thread while the height fit runs on another).
+    """
+
+    def __init__(self, cfg: PipelineConfig, allow_8bit_override: bool) -> None:
+        self.cfg = cfg
+        self.allow_8bit_override = allow_8bit_override
+        self._values: Dict[str, object] = {}
+        names = ("raw", "shape", "height", "height_nodata", "weights", "masks", "colormap")
+        self._locks = {name: threading.Lock() for name in names}
+
+    def _once(self, name: str, build):
+        with self._locks[name]:
+            if name not in self._values:
+                self._values[name] = build()
+            return self._values[name]
+
+    @property
+    def raw(self):
+        return self._once("raw", lambda: _load_inputs(self.cfg, allow_8bit_override=self.allow_8bit_override))
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self._once("shape", lambda: _target_shape(self.raw[1], self.cfg))
+
+    def _resample_height(self) -> np.ndarray:
+        shape = self.shape
+        return resample_height(self.raw[1], shape, workers=resolve_tile_workers(self.cfg, -(-shape[0] // 512)))
+
+    @property
+    def height(self) -> np.ndarray:
+        return self._once("height", self._resample_height)
+
+    @property
+    def height_nodata(self) -> Optional[np.ndarray]:
+        """Height pixels no source tile covers (missing mosaic cells), on the resampled grid."""
+
+        def build() -> Optional[np.ndarray]:
+            mask = height_nodata_mask(self.raw[1])
+            return None if mask is None else resample_masks({"nodata": mask}, self.shape)["nodata"]
+
+        return self._once("height_nodata", build)
+
+    def _resample_weights(self):
+        weights_raw = self.raw[3]
+        if isinstance(weights_raw, TopKWeights):
+            return resample_topk(weights_raw, self.shape)
+        # Material classification normalizes per row band, so skip the full-stack renormalization here.
+        return resample_weights(weights_raw, self.shape, renormalize=False)
+
+    @property
+    def weights(self):
+        return self._once("weights", self._resample_weights)
+
+    @property
+    def masks(self) -> Dict[str, np.ndarray]:
+        return self._once("masks", lambda: resample_masks(self.raw[4], self.shape))
+
+    @property
+    def colormap(self) -> Optional[np.ndarray]:
+        colormap_raw = self.raw[5]
+        return self._once(
+            "colormap", lambda: resample_colormap(colormap_raw, self.shape) if colormap_raw is not None else None
+        )
+
+    def resample_aux(self) -> None:
+        """Resample masks (hydrology needs them first), weights and colormap ahead of the materials stage."""
+        for name in ("masks", "weights", "colormap"):
+            getattr(self, name)
+
+    @property
+    def decode_stats(self) -> Optional[Dict[str, object]]:
+        raw = self._values.get("raw")
+        return raw[6] if raw is not None else None  # type: ignore[index]
+
+
+def _stage_masks(inputs: PipelineInputs, arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    masks = dict(inputs.masks)
+    if "river" in arrays:
+        masks["river"] = arrays["river"]
+    return masks
+
+
+def _stage_fit(cfg: PipelineConfig, inputs: PipelineInputs, _prev: Optional[StageState]) -> StageState:
+    # Missing mosaic cells read as 0; leaving them out keeps them from dragging the low percentile down.
+    valid = None if inputs.height_nodata is None else ~inputs.height_nodata
+    height_hist, height_hist_cached = cached_height_histogram(cfg, map_input_dir(cfg), inputs.height, valid)
+    y, fit_stats = fit_height_to_budget(inputs.height, histogram=height_hist, valid=valid, **fit_kwargs(cfg))
+    fit_stats["histogram_cache_hit"] = height_hist_cached
+
+    if np.min(y) < 0:
+        raise RuntimeError("Negative heights detected after fit")
+    return {"y": y}, {"height_input": inputs.raw[2], "height_fit": fit_stats}
+
+
+def _stage_hydrology(cfg: PipelineConfig, inputs: PipelineInputs, prev: Optional[StageState]) -> StageState:
+    arrays, meta = prev  # type: ignore[misc]
+    y, hydro = apply_hydrology(
+        arrays["y"],
+        fill_sinks=cfg.hydrology.fill_sinks,
+        river_threshold_percentile=cfg.hydrology.river_threshold_percentile,
+        carve_depth=cfg.hydrology.carve_depth,
+        river_mask=inputs.masks.get(cfg.hydrology.river_mask_name),
+    )
+    return {**arrays, "y": y, "river": hydro["river_mask"]}, dict(meta)
+
+
+def _stage_noise(cfg: PipelineConfig, inputs: PipelineInputs, prev: Optional[StageState]) -> StageState:
+    arrays, meta = prev  # type: ignore[misc]
+    masks = _stage_masks(inputs, arrays)
+    y, noise_delta = apply_multiscale_noise(
+        arrays["y"],
+        macro_amp=cfg.noise.macro_amplitude,
+        macro_wavelength=cfg.noise.macro_wavelength,
+        micro_amp=cfg.noise.micro_amplitude,
+        micro_wavelength=cfg.noise.micro_wavelength,
+        seed=cfg.noise.seed,
+        water_mask=masks.get("river", None),
+        road_mask=masks.get(cfg.noise.road_mask_name, None),
+        suppress_radius=cfg.noise.suppress_near_water_radius,
+    )
+    meta = {**meta, "noise_delta": [float(np.min(noise_delta)), float(np.max(noise_delta))]}
+    return {**arrays, "y": y}, meta
+
+
+def _stage_materials(cfg: PipelineConfig, inputs: PipelineInputs, prev: Optional[StageState]) -> StageState:
+    arrays, meta = prev  # type: ignore[misc]
+    y = arrays["y"]
+    if np.min(y) < 0:
+        raise RuntimeError("Negative heights detected after hydrology/noise")
+
+    masks = _stage_masks(inputs, arrays)
+    geom = compute_geom_fields(y)
+    labels, material_masks, de_stats = assign_material_labels(
+        y_int=y,
+        slope=geom["slope_smooth"],
+        weights=inputs.weights,
+        masks=masks,
+        layer_names=cfg.materials.layers,
+        default_layer=cfg.materials.default_layer,
+        sea_level_y=cfg.height.sea_level_y,
+        snowline_y=cfg.materials.snowline_y,
+        beach_band_dy=cfg.materials.beach_band_dy,
+        cliff_slope_high=cfg.materials.cliff_slope_high,
+        cliff_slope_low=cfg.materials.cliff_slope_low,
+        colormap=inputs.colormap,
+        palette_match_enabled=cfg.materials.palette_match.enabled,
+        palette_dither=cfg.materials.palette_match.dither,
+        defer_dither=True,
+    )
+    if "dithered" in material_masks:
+        arrays = {**arrays, "dithered": material_masks["dithered"]}
+    meta = {
+        **meta,
+        "palette_match": de_stats,
+        "weights": _weights_summary(inputs.weights),
+        "river_pixels": int(np.sum(masks.get("river", np.zeros_like(y, dtype=bool)))),
+    }
+    return {**arrays, "labels": labels}, meta
+
+
+def _stage_cleanup(cfg: PipelineConfig, _inputs: PipelineInputs, prev: Optional[StageState]) -> StageState:
+    arrays, meta = prev  # type: ignore[misc]
+    arrays = dict(arrays)
+    dithered = arrays.pop("dithered", None)
+    labels, speckle_stats = cleanup_labels_in_expanded_tiles(cfg, arrays["labels"], dithered)
+    return {**arrays, "labels": labels}, {**meta, "speckle": speckle_stats}
+
+
+def _raster_dir_files(directory: Path) -> List[Path]:
+    return [f for p in list_rasters(directory).values() for f in raster_source_files(p)]
+
+
+def stage_chain(cfg: PipelineConfig, cache: StageCache, inputs: PipelineInputs) -> List[Stage]:
+    """fit -> [hydrology] -> [noise] -> materials -> cleanup, each keyed on its predecessor's key.
+
+    Load and resample fold into ``fit`` and geom fields into ``materials``: their outputs feed only
+    that next step, so storing them separately would just duplicate full-map arrays on disk.
+    """
+    _in_dir, height_path, weights_dir, masks_dir, color_path = _input_paths(cfg)
+    masks_id = file_digest(_raster_dir_files(masks_dir))
+    # Cleanup's own knobs are left out of the materials key so tuning them resumes from that entry.
+    labeling_cfg = replace(cfg.materials, majority_radius=0, island_min_area=0)
+
+    def stage(name, fn, prev_key, *parts):
+        return Stage(name=name, key=cache.key(name, prev_key, *parts), compute=lambda prev: fn(cfg, inputs, prev))
+
+    stages = [
+        stage(
+            "fit",
+            _stage_fit,
+            file_digest(raster_source_files(height_path)),
+            config_digest(cfg.input, cfg.resample, cfg.height),
+            # The CLI override is not in cfg.input; a hit must not bypass the 8-bit check of a stricter run.
+            json.dumps({"allow_8bit": bool(cfg.input.allow_8bit_height or inputs.allow_8bit_override)}),
+            # Later keys include this one, so they change with the stage bodies and input loading too.
+            code_digest("pipeline_stages", "rasters", "io_images", "resample", "height_fit"),
+        )
+    ]
+    if cfg.hydrology.enabled:
+        hydro_cfg = config_digest(cfg.hydrology)
+        stages.append(
+            stage("hydrology", _stage_hydrology, stages[-1].key, masks_id, hydro_cfg, code_digest("hydrology"))
+        )
+    if cfg.noise.enabled:
+        noise_cfg = config_digest(cfg.noise)
+        stages.append(stage("noise", _stage_noise, stages[-1].key, masks_id, noise_cfg, code_digest("noise")))
+    stages.append(
+        stage(
+            "materials",
+            _stage_materials,
+            stages[-1].key,
+            masks_id,
+            file_digest(_raster_dir_files(weights_dir) + [color_path]),
+            config_digest(cfg.input, cfg.resample, cfg.height, labeling_cfg),
+            code_digest("rasters", "io_images", "resample", "topk_weights", "geom_fields", "materials"),
+        )
+    )
+    stages.append(
+        stage(
+            "cleanup",
+            _stage_cleanup,
+            stages[-1].key,
+            config_digest(cfg.materials, cfg.tiling),
+            code_digest("tiling", "cleanup", "tile_cleanup"),
+        )
+    )
+    return stages
@@ -0,0 +1,330 @@
+from __future__ import annotations
+
+import csv
+import json
+from array import array
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Placement kind codes stored in PlacementTable.kind.
+KIND_OTHER = 0
+KIND_WMO = 1
+KIND_M2 = 2
+_KIND_CODES = {"wmo": KIND_WMO, "m2": KIND_M2}
+
+# Directories under the map input folder that may hold placement JSON/CSV files.
+PLACEMENT_DIRS = ("objects", "placements", "wmo", "m2")
+# Top-level keys of a JSON object whose arrays hold placements; wmo/m2 also imply the kind.
+_JSON_LIST_KEYS = ("objects", "wmo", "m2")
+
+# Accepted spellings (lower-case, without "_"/spaces) for each placement column.
+_MODEL_KEYS = ("modelfile", "model", "modelpath", "file", "path", "name", "modelid", "filedataid", "id")
+_POS_KEYS = (("positionx", "posx", "x"), ("positiony", "posy", "y"), ("positionz", "posz", "z"))
+_ROT_KEYS = (("rotationx", "rotx"), ("rotationy", "roty"), ("rotationz", "rotz"))
+_SCALE_KEYS = ("scalefactor", "scale")
+
+
+@dataclass
+class PlacementTable:
+    """Array-backed WMO/M2 placements: one row per instance, model names interned in ``models``.
+
+    Positions are heightmap pixel coordinates (x = row, y = up, z = column); :meth:`to_grid` maps x/z onto
+    a resampled map's grid, the frame of the tile manifest. Rotations are Euler degrees.
+    """
+
+    models: List[str]
+    kind: np.ndarray
+    model: np.ndarray
+    position: np.ndarray
+    rotation: np.ndarray
+    scale: np.ndarray
+    source_files: int = 0
+
+    def __len__(self) -> int:
+        return int(self.kind.shape[0])
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.kind, self.model, self.position, self.rotation, self.scale)
+        return int(sum(a.nbytes for a in arrays))
+
+    def to_grid(self, source_shape: Tuple[int, int], grid_shape: Tuple[int, int]) -> "PlacementTable":
+        """Copy with x/z scaled from a ``source_shape`` heightmap onto a resampled ``grid_shape`` map."""
+        sx = float(grid_shape[0]) / float(source_shape[0])
+        sz = float(grid_shape[1]) / float(source_shape[1])
+        if sx == 1.0 and sz == 1.0:
+            return self
+        position = self.position.copy()
+        position[:, 0] *= sx
+        position[:, 2] *= sz
+        return replace(self, position=position)
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "source_files": int(self.source_files),
+            "entries": len(self),
+            "wmo": int(np.count_nonzero(self.kind == KIND_WMO)),
+            "m2": int(np.count_nonzero(self.kind == KIND_M2)),
+        }
+
+
+@dataclass
+class _TableBuilder:
+    models: List[str] = field(default_factory=list)
+    model_ids: Dict[str, int] = field(default_factory=dict)
+    kind: array = field(default_factory=lambda: array("B"))
+    model: array = field(default_factory=lambda: array("I"))
+    position: array = field(default_factory=lambda: array("f"))
+    rotation: array = field(default_factory=lambda: array("f"))
+    scale: array = field(default_factory=lambda: array("f"))
+
+    def add(self, row: Dict[str, object], default_kind: str = "") -> None:
+        norm = {str(k).lower().replace("_", "").replace(" ", ""): v for k, v in row.items()}
+        kind = str(norm.get("type", norm.get("kind", default_kind)) or default_kind).strip().lower()
+        self.kind.append(_KIND_CODES.get(kind, KIND_OTHER))
+
+        model = next((str(norm[k]).strip() for k in _MODEL_KEYS if norm.get(k) not in (None, "")), "")
+        mid = self.model_ids.get(model)
+        if mid is None:
+            mid = self.model_ids[model] = len(self.models)
+            self.models.append(model)
+        self.model.append(mid)
+
+        self.position.extend(_vec3(norm, "position", _POS_KEYS, 0.0))
+        self.rotation.extend(_vec3(norm, "rotation", _ROT_KEYS, 0.0))
+        self.scale.append(_num(next((norm[k] for k in _SCALE_KEYS if k in norm), 1.0), 1.0))
+
+    def build(self, source_files: int) -> PlacementTable:
+        n = len(self.kind)
+        return PlacementTable(
+            models=self.models,
+            kind=np.frombuffer(self.kind, dtype=np.uint8).copy(),
+            model=np.frombuffer(self.model, dtype=np.uint32).copy(),
+            position=np.frombuffer(self.position, dtype=np.float32).reshape(n, 3).copy(),
+            rotation=np.frombuffer(self.rotation, dtype=np.float32).reshape(n, 3).copy(),
+            scale=np.frombuffer(self.scale, dtype=np.float32).copy(),
+            source_files=source_files,
+        )
+
+
+def _num(v: object, default: float) -> float:
+    try:
+        return float(v)  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return default
+
+
+def _vec3(norm: Dict[str, object], name: str, keys: Tuple[Tuple[str, ...], ...], default: float) -> List[float]:
+    v = norm.get(name)
+    if isinstance(v, (list, tuple)) and len(v) >= 3:
+        return [_num(v[0], default), _num(v[1], default), _num(v[2], default)]
+    if isinstance(v, dict):
+        return [_num(v.get(a), default) for a in ("x", "y", "z")]
+    return [_num(next((norm[k] for k in axis if k in norm), default), default) for axis in keys]
+
+
+class _JsonStream:
+    """Incremental reader over a JSON file: decodes one value at a time from a sliding text buffer."""
+
+    def __init__(self, path: Path, chunk_size: int) -> None:
+        self.f = path.open("r", encoding="utf-8")
+        self.chunk_size = max(1, int(chunk_size))
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def close(self) -> None:
+        self.f.close()
+
+    def _fill(self, size: int = 0) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character ('' at end of file)."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r}")
+        self.pos += 1
+
+    def value(self) -> object:
+        self.peek()
+        # Each retry re-decodes the value from its start, so the read size doubles: a value spanning many
+        # chunks costs a constant number of decode passes over its length, not one per chunk.
+        read = self.chunk_size
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                read = max(read, len(self.buf) - self.pos)
+                if not self._fill(read):
+                    raise
+                read *= 2
+                continue
+            # A number (or literal) ending exactly at the buffer edge may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and not isinstance(obj, (dict, list, str)):
+                if self._fill(read):
+                    read *= 2
+                    continue
+            self.pos = end
+            return obj
+
+    def array_items(self) -> Iterator[object]:
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            ch = self.peek()
+            self.pos += 1
+            if ch == "]":
+                return
+            if ch != ",":
+                raise ValueError("malformed JSON array")
+
+
+def iter_json_placements(path: Path, chunk_size: int = 1 << 20) -> Iterator[Tuple[Dict[str, object], str]]:
+    """Stream ``(row, default_kind)`` from a JSON list, or from the objects/wmo/m2 lists of a JSON object.
+
+    Only one placement is decoded at a time, so multi-hundred-MB files never sit in memory as Python lists.
+    """
+    s = _JsonStream(path, chunk_size)
+    try:
+        first = s.peek()
+        if first == "[":
+            for row in s.array_items():
+                if isinstance(row, dict):
+                    yield row, ""
+        elif first == "{":
+            s.expect("{")
+            if s.peek() == "}":
+                return
+            while True:
+                key = s.value()
+                s.expect(":")
+                if key in _JSON_LIST_KEYS and s.peek() == "[":
+                    default_kind = key if key in _KIND_CODES else ""
+                    for row in s.array_items():
+                        if isinstance(row, dict):
+                            yield row, str(default_kind)
+                else:
+                    s.value()
+                ch = s.peek()
+                s.pos += 1
+                if ch == "}":
+                    return
+                if ch != ",":
+                    raise ValueError("malformed JSON object")
+    finally:
+        s.close()
+
+
+def iter_csv_placements(path: Path) -> Iterator[Tuple[Dict[str, object], str]]:
+    """Stream rows from a placement CSV; wow.export's ``;``-separated ModelPlacementInformation works too."""
+    with path.open("r", encoding="utf-8", newline="") as f:
+        header = f.readline()
+        delimiter = ";" if header.count(";") > header.count(",") else ","
+        f.seek(0)
+        for row in csv.DictReader(f, delimiter=delimiter):
+            yield row, ""
+
+
+def placement_files(map_dir: Path) -> List[Path]:
+    files: List[Path] = []
+    for name in PLACEMENT_DIRS:
+        r = map_dir / name
+        if not r.exists():
+            continue
+        files.extend(sorted(r.glob("*.json")))
+        files.extend(sorted(r.glob("*.csv")))
+    return files
+
+
+def load_placement_table(map_dir: Path) -> PlacementTable:
+    """Best-effort streaming ingestion of WMO/M2/object placements; unreadable files are skipped."""
+    builder = _TableBuilder()
+    files = placement_files(map_dir)
+    for p in files:
+        rows = iter_json_placements(p) if p.suffix.lower() == ".json" else iter_csv_placements(p)
+        n_before = len(builder.kind)
+        try:
+            for row, default_kind in rows:
+                builder.add(row, default_kind)
+        except Exception:
+            # Drop the partially read file entirely, as a malformed file contributes nothing.
+            del builder.kind[n_before:], builder.model[n_before:], builder.scale[n_before:]
+            del builder.position[3 * n_before :], builder.rotation[3 * n_before :]
+    return builder.build(source_files=len(files))
+
+
+@dataclass
+class PlacementIndex:
+    """CSR bucket of placement rows per tile: ``lookup(i, j)`` is a slice, no scanning."""
+
+    tile_size: int
+    n_i: int
+    n_j: int
+    offsets: np.ndarray
+    order: np.ndarray
+    outside: int = 0
+
+    @classmethod
+    def build(cls, table: PlacementTable, shape: Tuple[int, int], tile_size: int) -> "PlacementIndex":
+        size = int(tile_size)
+        n_i = -(-int(shape[0]) // size)
+        n_j = -(-int(shape[1]) // size)
+        x = np.floor(table.position[:, 0]).astype(np.int64)
+        z = np.floor(table.position[:, 2]).astype(np.int64)
+        inside = (x >= 0) & (x < int(shape[0])) & (z >= 0) & (z < int(shape[1]))
+        rows = np.flatnonzero(inside)
+        keys = (x[rows] // size) * n_j + (z[rows] // size)
+        sort = np.argsort(keys, kind="stable")
+        counts = np.bincount(keys, minlength=n_i * n_j)
+        offsets = np.zeros(n_i * n_j + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        return cls(
+            tile_size=size,
+            n_i=n_i,
+            n_j=n_j,
+            offsets=offsets,
+            order=rows[sort].astype(np.int64),
+            outside=int(len(table) - rows.size),
+        )
+
+    def lookup(self, i: int, j: int) -> np.ndarray:
+        """Placement table rows whose position falls in tile (i, j), in file order."""
+        if not (0 <= i < self.n_i and 0 <= j < self.n_j):
+            return self.order[:0]
+        k = i * self.n_j + j
+        return self.order[self.offsets[k] : self.offsets[k + 1]]
+
+
+def tile_placement_summary(table: Optional[PlacementTable], rows: np.ndarray) -> Dict[str, int]:
+    if table is None or rows.size == 0:
+        return {"count": 0, "wmo": 0, "m2": 0}
+    kinds = table.kind[rows]
+    return {
+        "count": int(rows.size),
+        "wmo": int(np.count_nonzero(kinds == KIND_WMO)),
+        "m2": int(np.count_nonzero(kinds == KIND_M2)),
+    }
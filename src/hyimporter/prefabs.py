@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .placements import PlacementTable
+from .schematic import write_mcedit_schematic
+from .utils import atomic_path
+from .voxelize import (
+    mesh_origin_voxel,
+    occupancy_from_mesh,
+    parse_obj,
+    to_block_arrays,
+    transform_vertices,
+    write_bo2_points,
+)
+
+# Bump when voxelization output changes so cached prefab files are rebuilt.
+PREFAB_VERSION = 1
+
+
+@dataclass(frozen=True)
+class PrefabKey:
+    """One voxelization: a model at a quantized rotation and scale."""
+
+    model: str
+    rotation: Tuple[float, float, float]
+    scale: float
+
+
+@dataclass
+class Prefab:
+    name: str
+    origin: Tuple[int, int, int]
+    size: Tuple[int, int, int]
+    voxels: int
+
+
+@dataclass
+class PrefabLibrary:
+    """Voxelized prefabs plus, per placement table row, the prefab it pastes (-1 when none)."""
+
+    prefabs: List[Prefab]
+    instance_prefab: np.ndarray
+    stats: Dict[str, int]
+
+
+def quantize_rotation(rotation: np.ndarray, step_deg: float) -> Tuple[float, float, float]:
+    step = float(step_deg)
+    if step <= 0:
+        return tuple(float(a) % 360.0 for a in rotation)  # type: ignore[return-value]
+    return tuple(float((np.rint(float(a) / step) * step) % 360.0) for a in rotation)  # type: ignore[return-value]
+
+
+def resolve_model_obj(models_dir: Path, model: str) -> Optional[Path]:
+    """OBJ exported for ``model`` (e.g. ``world/wmo/castle.wmo``) under ``models_dir``, by path then by name."""
+    if not model:
+        return None
+    rel = Path(model.replace("\\", "/").lower())
+    for candidate in (models_dir / rel.with_suffix(".obj"), models_dir / f"{rel.stem}.obj"):
+        if candidate.exists():
+            return candidate
+    return None
+
+
+def _prefab_name(key: PrefabKey, source: Path, block_id: int, write_bo2: bool) -> str:
+    st = source.stat()
+    ident = f"{PREFAB_VERSION}|{key.model}|{key.rotation}|{key.scale}|{st.st_size}|{st.st_mtime_ns}"
+    ident += f"|{int(block_id)}|{bool(write_bo2)}"
+    return "prefab_" + hashlib.sha1(ident.encode("utf-8")).hexdigest()[:16]
+
+
+def _load_cached(out_dir: Path, name: str, write_bo2: bool) -> Optional[Prefab]:
+    meta_path = out_dir / f"{name}.json"
+    if not meta_path.exists() or not (out_dir / f"{name}.schematic").exists():
+        return None
+    if write_bo2 and not (out_dir / f"{name}.bo2").exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        return Prefab(
+            name=name,
+            origin=tuple(int(v) for v in meta["origin"]),  # type: ignore[arg-type]
+            size=tuple(int(v) for v in meta["size"]),  # type: ignore[arg-type]
+            voxels=int(meta["voxels"]),
+        )
+    except Exception:
+        return None
+
+
+def build_prefab_library(
+    table: PlacementTable,
+    rows: np.ndarray,
+    models_dir: Path,
+    out_dir: Path,
+    rotation_step: float = 90.0,
+    block_id: int = 1,
+    write_bo2: bool = False,
+) -> PrefabLibrary:
+    """Voxelize each unique (model, rotation, scale) among ``rows`` once; files persist across runs in ``out_dir``."""
+    instance_prefab = np.full(len(table), -1, dtype=np.int32)
+    prefabs: List[Prefab] = []
+    by_key: Dict[PrefabKey, int] = {}
+    meshes: Dict[str, Tuple[np.ndarray, List[List[int]]]] = {}
+    stats = {"instances": 0, "unique": 0, "voxelized": 0, "cached": 0, "missing_models": 0}
+    missing: set[str] = set()
+
+    for r in np.asarray(rows, dtype=np.int64):
+        model = table.models[int(table.model[r])]
+        source = resolve_model_obj(models_dir, model)
+        if source is None:
+            missing.add(model)
+            continue
+        key = PrefabKey(
+            model=model,
+            rotation=quantize_rotation(table.rotation[r], rotation_step),
+            scale=round(float(table.scale[r]), 3),
+        )
+        pid = by_key.get(key)
+        if pid is None:
+            name = _prefab_name(key, source, block_id, write_bo2)
+            prefab = _load_cached(out_dir, name, write_bo2)
+            if prefab is None:
+                if model not in meshes:
+                    meshes[model] = parse_obj(source)
+                verts, faces = meshes[model]
+                verts = transform_vertices(verts, key.rotation, key.scale)
+                points = occupancy_from_mesh(verts, faces, padding=0)
+                width, height, length, blocks, data = to_block_arrays(points, block_id=block_id)
+                write_mcedit_schematic(out_dir / f"{name}.schematic", width, height, length, blocks, data)
+                if write_bo2:
+                    write_bo2_points(out_dir / f"{name}.bo2", points, block_id=block_id)
+                origin = mesh_origin_voxel(verts, padding=0)
+                prefab = Prefab(
+                    name=name,
+                    origin=(int(origin[0]), int(origin[1]), int(origin[2])),
+                    size=(width, height, length),
+                    voxels=int(points.shape[0]),
+                )
+                meta = {"model": model, "rotation": list(key.rotation), "scale": key.scale, **asdict(prefab)}
+                with atomic_path(out_dir / f"{name}.json") as tmp:
+                    tmp.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+                stats["voxelized"] += 1
+            else:
+                stats["cached"] += 1
+            pid = by_key[key] = len(prefabs)
+            prefabs.append(prefab)
+        instance_prefab[r] = pid
+        stats["instances"] += 1
+
+    stats["unique"] = len(prefabs)
+    stats["missing_models"] = len(missing)
+    return PrefabLibrary(prefabs=prefabs, instance_prefab=instance_prefab, stats=stats)
+
+
+def write_tile_placement_list(
+    path: Path,
+    library: PrefabLibrary,
+    table: PlacementTable,
+    rows: np.ndarray,
+    tile_origin: Tuple[int, int],
+    y: np.ndarray,
+) -> int:
+    """Per-tile ``prefab,x,y,z`` paste corners (x/z relative to the tile origin); returns the row count.
+
+    ``y`` is the fitted full-map height grid. Each model's origin voxel lands on the terrain surface block
+    at its (x, z): the placement's own Y is in source world units, which the height fit does not map.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    rows = rows[library.instance_prefab[rows] >= 0]
+    if rows.size == 0:
+        return 0
+    with atomic_path(path) as tmp, tmp.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["prefab", "x", "y", "z", "model"])
+        for r in rows:
+            prefab = library.prefabs[int(library.instance_prefab[r])]
+            pos = np.rint(table.position[r]).astype(np.int64)
+            gx = min(max(int(np.floor(table.position[r, 0])), 0), y.shape[0] - 1)
+            gz = min(max(int(np.floor(table.position[r, 2])), 0), y.shape[1] - 1)
+            w.writerow(
+                [
+                    prefab.name,
+                    int(pos[0]) - prefab.origin[0] - int(tile_origin[0]),
+                    int(y[gx, gz]) - prefab.origin[1],
+                    int(pos[2]) - prefab.origin[2] - int(tile_origin[1]),
+                    table.models[int(table.model[r])],
+                ]
+            )
+    return int(rows.size)
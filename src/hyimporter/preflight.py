@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+from dataclasses import asdict
+from math import ceil
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from .config import PipelineConfig, map_input_dir
+from .rasters import find_raster, list_rasters, raster_header, raster_source_files
+
+# Rough bytes per cell of one OBJ tile: top+bottom vertex rows (~36 B each) and 4 triangles (~23 B each).
+_OBJ_BYTES_PER_CELL = 2 * 36 + 4 * 23
+# A surface shell adds one vertex row and 2 triangles per cell.
+_SHELL_BYTES_PER_CELL = 36 + 2 * 23
+
+
+def _header_entry(path: Path, errors: List[str]) -> Optional[Dict[str, object]]:
+    missing = [str(p) for p in raster_source_files(path) if not p.exists()]
+    if missing:
+        errors.append(f"{path}: missing files {missing[:5]}{' ...' if len(missing) > 5 else ''}")
+        return None
+    try:
+        hdr = raster_header(path)
+    except Exception as exc:
+        errors.append(f"{path}: unreadable header ({exc})")
+        return None
+    entry = asdict(hdr)
+    entry["shape"] = [int(hdr.shape[0]), int(hdr.shape[1])]
+    entry["path"] = str(path)
+    return entry
+
+
+def _scan_dir(directory: Path, errors: List[str]) -> Dict[str, Dict[str, object]]:
+    out: Dict[str, Dict[str, object]] = {}
+    for name, p in list_rasters(directory).items():
+        entry = _header_entry(p, errors)
+        if entry is not None:
+            out[name] = entry
+    return out
+
+
+def estimate_ram_bytes(
+    cfg: PipelineConfig,
+    shape: Tuple[int, int],
+    height_itemsize: int,
+    n_layers: int,
+    n_masks: int,
+    has_colormap: bool,
+) -> Dict[str, int]:
+    """Bytes of the full-map arrays the pipeline holds at once (per-tile scratch not included)."""
+    n = int(shape[0]) * int(shape[1])
+    k = int(cfg.input.weight_top_k)
+    parts = {
+        "height": n * (4 if cfg.resample.target_resolution is not None else height_itemsize),
+        "fit_y": n * 2,
+        "geom_fields": n * 4 * 5,
+        "noise_delta": n * 4 if cfg.noise.enabled else 0,
+        "weights": n * 2 * k if k > 0 else n * 4 * n_layers,
+        "masks": n * n_masks,
+        "colormap": n * 4 * 3 if has_colormap else 0,
+        "labels": n * 2 * 2,
+    }
+    parts["total"] = int(sum(parts.values()))
+    return parts
+
+
+def estimate_output_bytes(cfg: PipelineConfig, shape: Tuple[int, int]) -> Dict[str, int]:
+    size = int(cfg.tiling.tile_size)
+    ni, nj = int(ceil(shape[0] / float(size))), int(ceil(shape[1] / float(size)))
+    cells = int(shape[0]) * int(shape[1])
+    out = {"tiles": ni * nj, "obj": 0, "schematic_max": 0}
+    if cfg.outputs.export_obj:
+        per_cell = (_OBJ_BYTES_PER_CELL if cfg.mesh.export_base else 0) + (
+            _SHELL_BYTES_PER_CELL if cfg.mesh.export_shells else 0
+        )
+        out["obj"] = cells * per_cell
+    if cfg.outputs.export_schematic:
+        # Uncompressed Blocks+Data upper bound; the gzip'd files are far smaller for surface-only tiles.
+        out["schematic_max"] = cells * int(cfg.height.total_height) * 2
+    return out
+
+
+def run_preflight(cfg: PipelineConfig, allow_8bit_override: bool = False) -> Dict[str, object]:
+    """Check the input package from directory listings and image headers only; nothing is decoded."""
+    errors: List[str] = []
+    warnings: List[str] = []
+    in_dir = map_input_dir(cfg)
+    allow_8bit = bool(cfg.input.allow_8bit_height or allow_8bit_override)
+
+    height_path = find_raster(in_dir / "height", "height")
+    height: Optional[Dict[str, object]] = None
+    if not height_path.exists():
+        errors.append(f"Height image not found: {height_path}")
+    else:
+        height = _header_entry(height_path, errors)
+    if height is not None:
+        if int(height["bit_depth"]) <= 8:
+            if allow_8bit:
+                warnings.append(f"8-bit heightmap allowed by override at {height_path}")
+            else:
+                errors.append(f"8-bit heightmap detected at {height_path} (use --allow-8bit-height to accept)")
+        if int(height["channels"]) > 1:
+            warnings.append(f"Height image has {height['channels']} channels; only the first is used")
+
+    weights_dir = in_dir / "weights"
+    if not weights_dir.exists():
+        weights_dir = in_dir / "weightmaps"
+    weights = _scan_dir(weights_dir, errors)
+    masks = _scan_dir(in_dir / "masks", errors)
+    color_path = in_dir / "color" / "colormap.png"
+    colormap = _header_entry(color_path, errors) if color_path.exists() else None
+
+    if not weights:
+        warnings.append(f"No weight maps under {weights_dir}; materials come from rules only")
+    weight_shapes = sorted({tuple(v["shape"]) for v in weights.values()})
+    if len(weight_shapes) > 1:
+        warnings.append(f"Weight maps have different shapes (resampled to match): {[list(s) for s in weight_shapes]}")
+    unused = sorted(set(weights) - set(cfg.materials.layers))
+    if unused:
+        warnings.append(f"Weight layers not in materials.layers are ignored: {unused}")
+    if cfg.materials.palette_match.enabled and colormap is None:
+        warnings.append(f"materials.palette_match is enabled but {color_path} is missing")
+
+    report: Dict[str, object] = {
+        "input_dir": str(in_dir),
+        "height": height,
+        "weights": weights,
+        "masks": masks,
+        "colormap": colormap,
+    }
+    if height is not None:
+        if cfg.resample.target_resolution is not None:
+            r = int(cfg.resample.target_resolution)
+            shape = (r, r)
+        else:
+            shape = (int(height["shape"][0]), int(height["shape"][1]))
+        report["target_shape"] = [shape[0], shape[1]]
+        report["estimated_ram_bytes"] = estimate_ram_bytes(
+            cfg,
+            shape,
+            height_itemsize=max(1, int(height["bit_depth"]) // 8),
+            n_layers=len(weights),
+            n_masks=len(masks),
+            has_colormap=colormap is not None,
+        )
+        report["estimated_output_bytes"] = estimate_output_bytes(cfg, shape)
+    report["errors"] = errors
+    report["warnings"] = warnings
+    report["ok"] = not errors
+    return report
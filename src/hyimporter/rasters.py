@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import csv
+import json
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from math import isqrt
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Input rasters that can be memory-mapped or read by window instead of decoded whole.
+WINDOWED_SUFFIXES = (".npy", ".r16", ".tif", ".tiff")
+RASTER_SUFFIXES = (".png",) + WINDOWED_SUFFIXES
+# A directory holding this file (plus the per-ADT tiles it lists) reads as one virtual raster.
+MOSAIC_INDEX = "index.csv"
+
+
+def _get_tifffile():
+    try:
+        import tifffile  # type: ignore
+    except Exception:
+        return None
+    return tifffile
+
+
+def _r16_shape(path: Path) -> Tuple[int, int]:
+    sidecar = path.with_suffix(".json")
+    if sidecar.exists():
+        shape = json.loads(sidecar.read_text(encoding="utf-8")).get("shape")
+        if isinstance(shape, list) and len(shape) == 2:
+            return int(shape[0]), int(shape[1])
+    n = path.stat().st_size // 2
+    side = isqrt(n)
+    if side * side != n:
+        raise ValueError(f"{path}: raw .r16 is not square; add {sidecar.name} with {{\"shape\": [rows, cols]}}")
+    return side, side
+
+
+class _WindowedRaster:
+    """Array-like over a raster that is only read window by window (subclasses implement read_window)."""
+
+    shape: Tuple[int, ...]
+    dtype: np.dtype
+
+    @property
+    def ndim(self) -> int:
+        return len(self.shape)
+
+    def read_window(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows = key[0] if len(key) > 0 else slice(None)
+        cols = key[1] if len(key) > 1 else slice(None)
+        if not (isinstance(rows, slice) and isinstance(cols, slice)):
+            return np.asarray(self)[key]
+        r0, r1, rs = rows.indices(self.shape[0])
+        c0, c1, cs = cols.indices(self.shape[1])
+        win = self.read_window(r0, max(r0, r1), c0, max(c0, c1))
+        return win[::rs, ::cs][(slice(None), slice(None)) + key[2:]]
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        arr = self.read_window(0, self.shape[0], 0, self.shape[1])
+        return arr if dtype is None else arr.astype(dtype)
+
+
+class TiledTiffRaster(_WindowedRaster):
+    """Window reader for tiled, compressed TIFFs: decodes only the tiles a slice touches."""
+
+    def __init__(self, path: Path) -> None:
+        tifffile = _get_tifffile()
+        if tifffile is None:
+            raise RuntimeError(f"tifffile is required to read {path}")
+        self.path = path
+        with tifffile.TiffFile(path) as tf:
+            page = tf.pages[0]
+            if not page.is_tiled:
+                raise ValueError(f"{path}: TIFF is neither memory-mappable nor tiled")
+            self.shape = tuple(int(s) for s in page.shape)
+            self.dtype = np.dtype(page.dtype)
+            self.tile_shape = (int(page.tilelength), int(page.tilewidth))
+            self._offsets = list(page.dataoffsets)
+            self._bytecounts = list(page.databytecounts)
+        self._tiles_across = -(-self.shape[1] // self.tile_shape[1])
+
+    def _read_tile(self, tf, page, ti: int, tj: int) -> np.ndarray:
+        k = ti * self._tiles_across + tj
+        fh = tf.filehandle
+        fh.seek(self._offsets[k])
+        seg, _idx, _shape = page.decode(fh.read(self._bytecounts[k]), k)
+        seg = np.asarray(seg)[0]
+        return seg[..., 0] if seg.shape[-1] == 1 else seg
+
+    def read_window(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        tifffile = _get_tifffile()
+        th, tw = self.tile_shape
+        out = np.zeros((r1 - r0, c1 - c0) + tuple(self.shape[2:]), dtype=self.dtype)
+        with tifffile.TiffFile(self.path) as tf:
+            page = tf.pages[0]
+            for ti in range(r0 // th, -(-r1 // th)):
+                for tj in range(c0 // tw, -(-c1 // tw)):
+                    tile = self._read_tile(tf, page, ti, tj)
+                    _paste(out, tile, r0, c0, ti * th, tj * tw)
+        return out
+
+
+def _paste(out: np.ndarray, tile: np.ndarray, r0: int, c0: int, tr0: int, tc0: int) -> None:
+    """Copy the part of ``tile`` (placed at tr0, tc0) that overlaps the window ``out`` (placed at r0, c0)."""
+    a0, a1 = max(r0, tr0), min(r0 + out.shape[0], tr0 + tile.shape[0])
+    b0, b1 = max(c0, tc0), min(c0 + out.shape[1], tc0 + tile.shape[1])
+    if a1 > a0 and b1 > b0:
+        out[a0 - r0 : a1 - r0, b0 - c0 : b1 - c0] = tile[a0 - tr0 : a1 - tr0, b0 - tc0 : b1 - tc0]
+
+
+class MosaicRaster(_WindowedRaster):
+    """One virtual raster over a grid of equally sized per-ADT tiles listed in an ``index.csv``.
+
+    Tiles are decoded on first touch and kept in a small LRU cache; grid cells without a tile read as 0 and
+    are flagged by :meth:`nodata_mask`.
+    """
+
+    def __init__(self, tiles: Dict[Tuple[int, int], Path], cache_tiles: int = 16) -> None:
+        if not tiles:
+            raise ValueError("Mosaic index lists no tiles")
+        self.cache_tiles = max(1, int(cache_tiles))
+        self._cache: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.decoded = 0
+
+        row0 = min(r for r, _c in tiles)
+        col0 = min(c for _r, c in tiles)
+        self.tiles = {(r - row0, c - col0): p for (r, c), p in tiles.items()}
+        first = self._tile(min(self.tiles))
+        self.tile_shape = (int(first.shape[0]), int(first.shape[1]))
+        self.dtype = first.dtype
+        n_rows = max(r for r, _c in self.tiles) + 1
+        n_cols = max(c for _r, c in self.tiles) + 1
+        self.shape = (n_rows * self.tile_shape[0], n_cols * self.tile_shape[1]) + tuple(first.shape[2:])
+
+    @classmethod
+    def from_index(cls, index_path: Path, cache_tiles: int = 16) -> "MosaicRaster":
+        """Read ``row,col,file`` rows (ADT grid position, tile path relative to the index)."""
+        return cls(_read_index(index_path), cache_tiles=cache_tiles)
+
+    @property
+    def source_files(self) -> List[Path]:
+        return [self.tiles[k] for k in sorted(self.tiles)]
+
+    @property
+    def missing_cells(self) -> List[Tuple[int, int]]:
+        """Grid cells inside the mosaic's bounding box that the index lists no tile for."""
+        n_rows, n_cols = self.shape[0] // self.tile_shape[0], self.shape[1] // self.tile_shape[1]
+        return [(r, c) for r in range(n_rows) for c in range(n_cols) if (r, c) not in self.tiles]
+
+    def nodata_mask(self) -> Optional[np.ndarray]:
+        """True over the pixels of missing grid cells; None when every cell has a tile."""
+        missing = self.missing_cells
+        if not missing:
+            return None
+        th, tw = self.tile_shape
+        mask = np.zeros(self.shape[:2], dtype=bool)
+        for r, c in missing:
+            mask[r * th : (r + 1) * th, c * tw : (c + 1) * tw] = True
+        return mask
+
+    def _tile(self, key: Tuple[int, int]) -> np.ndarray:
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+        tile = np.asarray(open_raster(self.tiles[key]))
+        if hasattr(self, "tile_shape") and tile.shape[:2] != self.tile_shape:
+            raise ValueError(f"{self.tiles[key]}: tile shape {tile.shape[:2]} differs from {self.tile_shape}")
+        with self._lock:
+            self.decoded += 1
+            self._cache[key] = tile
+            while len(self._cache) > self.cache_tiles:
+                self._cache.popitem(last=False)
+        return tile
+
+    def read_window(self, r0: int, r1: int, c0: int, c1: int) -> np.ndarray:
+        th, tw = self.tile_shape
+        out = np.zeros((r1 - r0, c1 - c0) + tuple(self.shape[2:]), dtype=self.dtype)
+        for ti in range(r0 // th, -(-r1 // th)):
+            for tj in range(c0 // tw, -(-c1 // tw)):
+                if (ti, tj) in self.tiles:
+                    _paste(out, self._tile((ti, tj)), r0, c0, ti * th, tj * tw)
+        return out
+
+
+def open_raster(path: Path):
+    """Open an input raster without promoting it to float.
+
+    ``.npy``, ``.r16`` and uncompressed TIFFs come back as read-only memmaps, tiled compressed
+    TIFFs as a :class:`TiledTiffRaster`, a mosaic ``index.csv`` as a :class:`MosaicRaster`; striped
+    compressed TIFFs and anything else are decoded whole.
+    """
+    if path.name.lower() == MOSAIC_INDEX:
+        return MosaicRaster.from_index(path)
+    suffix = path.suffix.lower()
+    if suffix == ".npy":
+        return np.load(path, mmap_mode="r")
+    if suffix == ".r16":
+        return np.memmap(path, dtype="<u2", mode="r", shape=_r16_shape(path))
+    if suffix in (".tif", ".tiff"):
+        tifffile = _get_tifffile()
+        if tifffile is not None:
+            try:
+                return tifffile.memmap(path, mode="r")
+            except ValueError:
+                pass
+            with tifffile.TiffFile(path) as tf:
+                tiled = tf.pages[0].is_tiled
+            # Striped compressed TIFFs (tifffile's default layout) have no cheap window read; decode them whole.
+            return TiledTiffRaster(path) if tiled else tifffile.imread(path)
+
+    import imageio.v3 as iio
+
+    return iio.imread(path)
+
+
+@dataclass(frozen=True)
+class RasterHeader:
+    shape: Tuple[int, int]
+    dtype: str
+    bit_depth: int
+    channels: int
+    tiles: int = 1
+
+
+# PIL mode -> (numpy dtype as imageio decodes it, bits per sample, channels).
+_PIL_MODES = {
+    "1": ("bool", 1, 1),
+    "L": ("uint8", 8, 1),
+    "P": ("uint8", 8, 1),
+    "LA": ("uint8", 8, 2),
+    "RGB": ("uint8", 8, 3),
+    "RGBA": ("uint8", 8, 4),
+    "I;16": ("uint16", 16, 1),
+    "I;16B": ("uint16", 16, 1),
+    "I;16L": ("uint16", 16, 1),
+    "I": ("int32", 32, 1),
+    "F": ("float32", 32, 1),
+}
+
+
+# PNG IHDR colour type -> channels.
+_PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+def _png_header(path: Path) -> Optional[RasterHeader]:
+    # PIL reports 16-bit greyscale as 32-bit mode "I", so PNG bit depth comes straight from IHDR.
+    with path.open("rb") as f:
+        head = f.read(26)
+    if len(head) < 26 or head[:8] != b"\x89PNG\r\n\x1a\n" or head[12:16] != b"IHDR":
+        return None
+    w, h = struct.unpack(">II", head[16:24])
+    bits, color_type = head[24], head[25]
+    dtype = "uint16" if bits == 16 else "uint8"
+    return RasterHeader((int(h), int(w)), dtype, int(bits), _PNG_CHANNELS.get(color_type, 1))
+
+
+def _read_index(index_path: Path) -> Dict[Tuple[int, int], Path]:
+    tiles: Dict[Tuple[int, int], Path] = {}
+    with index_path.open("r", encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            key = (int(row["row"]), int(row["col"]))
+            if key in tiles:
+                raise ValueError(f"{index_path}: duplicate tile at row={key[0]} col={key[1]}")
+            tiles[key] = index_path.parent / str(row["file"]).strip()
+    return tiles
+
+
+def raster_header(path: Path) -> RasterHeader:
+    """Shape, dtype and bit depth from file headers only (nothing is decoded)."""
+    if path.name.lower() == MOSAIC_INDEX:
+        tiles = _read_index(path)
+        if not tiles:
+            raise ValueError(f"{path}: mosaic index lists no tiles")
+        first = raster_header(tiles[min(tiles)])
+        rows = max(r for r, _c in tiles) - min(r for r, _c in tiles) + 1
+        cols = max(c for _r, c in tiles) - min(c for _r, c in tiles) + 1
+        shape = (rows * first.shape[0], cols * first.shape[1])
+        return RasterHeader(shape, first.dtype, first.bit_depth, first.channels, tiles=len(tiles))
+
+    suffix = path.suffix.lower()
+    if suffix == ".npy":
+        arr = np.load(path, mmap_mode="r")
+        dtype = np.dtype(arr.dtype)
+        shape, channels = (int(arr.shape[0]), int(arr.shape[1])), int(arr.shape[2]) if arr.ndim == 3 else 1
+    elif suffix == ".r16":
+        dtype, shape, channels = np.dtype("<u2"), _r16_shape(path), 1
+    elif suffix in (".tif", ".tiff") and _get_tifffile() is not None:
+        with _get_tifffile().TiffFile(path) as tf:
+            page = tf.pages[0]
+            dtype = np.dtype(page.dtype)
+            shape = (int(page.shape[0]), int(page.shape[1]))
+            channels = int(page.shape[2]) if len(page.shape) == 3 else 1
+    else:
+        png = _png_header(path)
+        if png is not None:
+            return png
+
+        from PIL import Image
+
+        with Image.open(path) as im:
+            w, h = im.size
+            mode = im.mode
+        if mode not in _PIL_MODES:
+            raise ValueError(f"{path}: unsupported image mode {mode}")
+        name, bits, channels = _PIL_MODES[mode]
+        return RasterHeader((int(h), int(w)), name, bits, channels)
+
+    bits = 8 * dtype.itemsize if dtype != np.bool_ else 1
+    return RasterHeader(shape, dtype.name, bits, channels)
+
+
+def raster_source_files(path: Path) -> List[Path]:
+    """Files whose contents make up the raster at ``path`` (the index plus its tiles for a mosaic)."""
+    if path.name.lower() != MOSAIC_INDEX:
+        return [path]
+    return [path] + sorted(_read_index(path).values())
+
+
+def find_raster(directory: Path, stem: str) -> Path:
+    """First ``<stem><suffix>`` in ``directory``, else a ``tiles/index.csv`` mosaic; the PNG path if neither exists."""
+    for suffix in RASTER_SUFFIXES:
+        p = directory / f"{stem}{suffix}"
+        if p.exists():
+            return p
+    index = directory / "tiles" / MOSAIC_INDEX
+    if index.exists():
+        return index
+    return directory / f"{stem}.png"
+
+
+def list_rasters(directory: Path) -> Dict[str, Path]:
+    """Rasters in ``directory`` keyed by lower-case name (PNG wins over other formats).
+
+    A subdirectory with an ``index.csv`` is a per-ADT mosaic named after the subdirectory.
+    """
+    out: Dict[str, Path] = {}
+    if not directory.exists():
+        return out
+    for sub in sorted(directory.iterdir()):
+        if sub.is_dir() and (sub / MOSAIC_INDEX).exists():
+            out[sub.name.lower()] = sub / MOSAIC_INDEX
+    for suffix in reversed(RASTER_SUFFIXES):
+        for p in sorted(directory.glob(f"*{suffix}")):
+            out[p.stem.lower()] = p
+    return dict(sorted(out.items()))
@@ -1,60 +1,265 @@
 from __future__ import annotations
 
-from typing import Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Tuple
 
 import numpy as np
+from scipy import ndimage, sparse
 from skimage.transform import resize, resize_local_mean
 
+from .topk_weights import EMPTY_SLOT, TopKWeights, empty_topk, fold_layer_rows
 
-def resample_height(height: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarray:
-    if height.shape == target_shape:
-        return height.astype(np.float32)
-    out = resize(
-        height,
-        output_shape=target_shape,
+
+# Source rows of cubic-spline prefilter context kept beyond the Gaussian halo on each side of a band.
+# The prefilter's recursive pole (~0.268) decays below float64 resolution well within this distance,
+# so a band's coefficients equal the whole-map ones and output matches the global resize bit for bit.
+_SPLINE_HALO = 32
+
+
+def _resize_float_type(dtype: np.dtype) -> type:
+    # skimage's resize(preserve_range=True) works in float32 for float16/32 input, float64 otherwise.
+    return np.float32 if np.dtype(dtype) in (np.dtype(np.float16), np.dtype(np.float32)) else np.float64
+
+
+def _height_band(
+    height: np.ndarray,
+    o0: int,
+    o1: int,
+    target_shape: Tuple[int, int],
+    halo: int,
+    value_range: Tuple[float, float],
+) -> np.ndarray:
+    """Output rows ``[o0, o1)`` of the anti-aliased bicubic resize, computed from a haloed source row window."""
+    factors = np.divide(height.shape, target_shape)
+    sigma = np.maximum(0.0, (factors - 1.0) / 2.0)
+    n_rows = int(height.shape[0])
+    a = max(0, int(np.floor((o0 + 0.5) * factors[0] - 0.5)) - halo)
+    b = min(n_rows, int(np.floor((o1 - 0.5) * factors[0] - 0.5)) + 1 + halo)
+
+    win = np.asarray(height[a:b]).astype(_resize_float_type(height.dtype))
+    if np.any(sigma > 0):
+        win = ndimage.gaussian_filter(win, sigma, mode="mirror")
+    coeffs = ndimage.spline_filter(win, order=3, output=np.float64, mode="mirror")
+    del win
+    band = ndimage.affine_transform(
+        coeffs,
+        np.diag(factors),
+        offset=((o0 + 0.5) * factors[0] - 0.5 - a, 0.5 * factors[1] - 0.5),
+        output_shape=(o1 - o0, int(target_shape[1])),
         order=3,
-        mode="reflect",
-        anti_aliasing=True,
-        preserve_range=True,
+        mode="mirror",
+        prefilter=False,
     )
-    return out.astype(np.float32)
+    np.clip(band, value_range[0], value_range[1], out=band)
+    return band.astype(np.float32)
 
 
-def resample_weights(weights: Dict[str, np.ndarray], target_shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
-    out: Dict[str, np.ndarray] = {}
-    for k, v in weights.items():
-        if v.shape != target_shape:
-            if target_shape[0] <= v.shape[0] and target_shape[1] <= v.shape[1]:
-                # Area-style downsampling to preserve fractional coverage.
-                v2 = resize_local_mean(v, output_shape=target_shape)
-            else:
-                v2 = resize(
-                    v,
-                    output_shape=target_shape,
-                    order=1,
-                    mode="reflect",
-                    anti_aliasing=True,
-                    preserve_range=True,
-                )
+def resample_height(
+    height: np.ndarray,
+    target_shape: Tuple[int, int],
+    workers: int = 1,
+    chunk_rows: int = 512,
+) -> np.ndarray:
+    """Resize to ``target_shape``; at native resolution the input comes back in its own dtype (no float copy).
+
+    Equivalent to ``skimage.transform.resize(order=3, mode="reflect", anti_aliasing=True,
+    preserve_range=True)`` cast to float32, but computed in bands of ``chunk_rows`` target rows, each from
+    its own source window plus halo, on up to ``workers`` threads. Only the bands in flight hold float64
+    intermediates.
+    """
+    if tuple(height.shape) == tuple(target_shape):
+        return np.asarray(height)
+    target = (int(target_shape[0]), int(target_shape[1]))
+    factors = np.divide(height.shape, target)
+    sigma0 = max(0.0, (float(factors[0]) - 1.0) / 2.0)
+    # gaussian_filter's kernel radius (truncate=4) + spline prefilter context + cubic support.
+    halo = int(4.0 * sigma0 + 0.5) + _SPLINE_HALO + 3
+    value_range = (np.min(height), np.max(height))
+
+    rows = max(1, int(chunk_rows))
+    bands = [(o0, min(target[0], o0 + rows)) for o0 in range(0, target[0], rows)]
+    out = np.empty(target, dtype=np.float32)
+
+    def run(band: Tuple[int, int]) -> None:
+        out[band[0] : band[1]] = _height_band(height, band[0], band[1], target, halo, value_range)
+
+    n_workers = max(1, min(int(workers), len(bands)))
+    if n_workers == 1:
+        for band in bands:
+            run(band)
+    else:
+        # ndimage releases the GIL inside its filters, so threads share the source without copies.
+        with ThreadPoolExecutor(max_workers=n_workers) as pool:
+            list(pool.map(run, bands))
+    return out
+
+
+def _resample_weight_stack(stack: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarray:
+    """Resample an (H, W, L) stack of weight planes in one call; layers never mix (channel axis)."""
+    h, w = int(target_shape[0]), int(target_shape[1])
+    if stack.shape[:2] != (h, w):
+        if h <= stack.shape[0] and w <= stack.shape[1]:
+            # Area-style downsampling to preserve fractional coverage.
+            stack = resize_local_mean(stack, output_shape=(h, w), channel_axis=-1)
         else:
-            v2 = v
-        out[k] = np.clip(v2.astype(np.float32), 0.0, 1.0)
-    return renormalize_weights(out)
+            stack = resize(
+                stack,
+                output_shape=(h, w, stack.shape[2]),
+                order=1,
+                mode="reflect",
+                anti_aliasing=True,
+                preserve_range=True,
+            )
+    return np.clip(stack.astype(np.float32, copy=False), 0.0, 1.0)
+
+
+@lru_cache(maxsize=64)
+def _axis_weights(n_in: int, n_out: int) -> sparse.csr_matrix:
+    """(n_out, n_in) weight resampling matrix along one axis, as :func:`_resample_weight_stack` resamples:
+    area-weighted means when shrinking, linear interpolation (edges mirrored, like skimage's "reflect")
+    when growing. Only a map shrunk along one axis and grown along the other comes out slightly different
+    (no anti-aliasing blur on the shrunk axis)."""
+    out_idx = np.arange(n_out)
+    if n_out <= n_in:
+        f = n_in / n_out
+        lo, hi = out_idx * f, (out_idx + 1) * f
+        j0 = np.floor(lo).astype(np.intp)
+        rows, cols, vals = [], [], []
+        for d in range(int(np.ceil(f)) + 1):
+            j = j0 + d
+            w = (np.minimum(j + 1, hi) - np.maximum(j, lo)) / f
+            keep = (j < n_in) & (w > 0)
+            rows.append(out_idx[keep])
+            cols.append(j[keep])
+            vals.append(w[keep])
+        rows_a, cols_a, vals_a = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+    else:
+        x = np.abs((out_idx + 0.5) * (n_in / n_out) - 0.5)
+        x = np.clip(np.where(x > n_in - 1, 2.0 * (n_in - 1) - x, x), 0.0, n_in - 1)
+        j0 = np.floor(x).astype(np.intp)
+        t = x - j0
+        rows_a = np.concatenate([out_idx, out_idx])
+        cols_a = np.concatenate([j0, np.minimum(j0 + 1, n_in - 1)])
+        vals_a = np.concatenate([1.0 - t, t])
+    m = sparse.csr_matrix((vals_a.astype(np.float32), (rows_a, cols_a)), shape=(n_out, n_in))
+    m.sum_duplicates()
+    return m
+
+
+def _weight_band(row_w: sparse.csr_matrix, col_w: sparse.csr_matrix, o0: int, o1: int):
+    """(source row window start, end, band resampler) for target rows ``[o0, o1)``."""
+    sub = row_w[o0:o1]
+    a, b = int(sub.indices.min()), int(sub.indices.max()) + 1
+    sub = sub[:, a:b]
+
+    def apply(window: np.ndarray) -> np.ndarray:
+        band = (col_w @ (sub @ np.asarray(window, dtype=np.float32)).T).T
+        return np.clip(band.astype(np.float32, copy=False), 0.0, 1.0)
+
+    return a, b, apply
+
+
+class ResampledWeightRows:
+    """Lazy resampled view of one weight plane: slicing target rows resamples just those rows, from just
+    the source rows they cover, so no full-size float plane is built."""
+
+    def __init__(self, plane, target_shape: Tuple[int, int]) -> None:
+        self.plane = plane
+        self.shape = (int(target_shape[0]), int(target_shape[1]))
+        self._rows = _axis_weights(int(plane.shape[0]), self.shape[0])
+        self._cols = _axis_weights(int(plane.shape[1]), self.shape[1])
+
+    def __getitem__(self, key) -> np.ndarray:
+        if not isinstance(key, slice):
+            return np.asarray(self)[key]
+        o0, o1, step = key.indices(self.shape[0])
+        if o1 <= o0:
+            return np.zeros((0, self.shape[1]), dtype=np.float32)
+        a, b, apply = _weight_band(self._rows, self._cols, o0, o1)
+        return apply(self.plane[a:b])[::step]
+
+    def __array__(self, dtype=None) -> np.ndarray:
+        arr = self[:]
+        return arr if dtype is None else arr.astype(dtype)
+
+
+def resample_weight_plane(plane, target_shape: Tuple[int, int]) -> ResampledWeightRows:
+    """Resample one [0, 1] weight plane (anything with ``shape`` and row slicing) to ``target_shape``,
+    lazily: rows are computed when sliced, e.g. band by band by :func:`.topk_weights.add_layer`."""
+    return ResampledWeightRows(plane, target_shape)
+
+
+def resample_weights(
+    weights: Dict[str, np.ndarray],
+    target_shape: Tuple[int, int],
+    renormalize: bool = True,
+) -> Dict[str, np.ndarray]:
+    """Resample all layers of a shape together (one resize per distinct source shape, not per layer)."""
+    by_shape: Dict[Tuple[int, ...], List[str]] = {}
+    for k, v in weights.items():
+        by_shape.setdefault(tuple(v.shape), []).append(k)
+
+    out: Dict[str, np.ndarray] = {}
+    for names in by_shape.values():
+        stack = _resample_weight_stack(np.stack([weights[k] for k in names], axis=-1), target_shape)
+        for i, k in enumerate(names):
+            out[k] = stack[..., i]
+    out = {k: out[k] for k in weights}
+    return renormalize_weights(out) if renormalize else out
+
+
+def resample_topk(tk: TopKWeights, target_shape: Tuple[int, int], chunk_rows: int = 256) -> TopKWeights:
+    """Resample a top-k weight table band by band, straight from its slots.
+
+    Each band of ``chunk_rows`` target rows is resampled from the source rows it covers, for the layers
+    present there only, and the top k re-selected; no full-size dense plane is ever built.
+    """
+    if tk.shape == tuple(target_shape):
+        return renormalize_topk(tk)
+    target = (int(target_shape[0]), int(target_shape[1]))
+    out = empty_topk(list(tk.layers), target, tk.k)
+    if not tk.layers:
+        return out
+    row_w = _axis_weights(tk.shape[0], target[0])
+    col_w = _axis_weights(tk.shape[1], target[1])
+    rows = max(1, int(chunk_rows))
+    for o0 in range(0, target[0], rows):
+        a, b, apply = _weight_band(row_w, col_w, o0, min(target[0], o0 + rows))
+        idx, val = tk.indices[a:b], tk.values[a:b]
+        # Ascending layer order keeps add_layer's tie-break (earlier layers first).
+        for li in np.unique(idx[idx != EMPTY_SLOT]):
+            window = np.sum(np.where(idx == li, val, np.uint8(0)), axis=-1, dtype=np.int32).astype(np.float32) / 255.0
+            fold_layer_rows(out, int(li), o0, apply(window))
+    return renormalize_topk(out, chunk_rows=rows)
+
+
+@lru_cache(maxsize=64)
+def _nearest_index(n_in: int, n_out: int) -> np.ndarray:
+    """Source index per target index, as order-0 ``resize`` picks it (pixel-centre grid, edge clamp)."""
+    idx = np.floor((np.arange(n_out, dtype=np.float64) + 0.5) * (n_in / n_out)).astype(np.intp)
+    idx = np.clip(idx, 0, n_in - 1)
+    idx.setflags(write=False)
+    return idx
+
+
+def nearest_gather(arr: np.ndarray, target_shape: Tuple[int, int]) -> np.ndarray:
+    """Nearest-neighbour resample by integer gather in the input dtype (bool/uint8 stay as they are).
+
+    The index plans are cached per (source, target) length, so every mask and every run of the same
+    shape reuses them.
+    """
+    ri = _nearest_index(int(arr.shape[0]), int(target_shape[0]))
+    ci = _nearest_index(int(arr.shape[1]), int(target_shape[1]))
+    return np.asarray(arr)[ri[:, None], ci[None, :]]
 
 
 def resample_masks(masks: Dict[str, np.ndarray], target_shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
     out: Dict[str, np.ndarray] = {}
     for k, v in masks.items():
         if v.shape != target_shape:
-            v2 = resize(
-                v.astype(np.float32),
-                output_shape=target_shape,
-                order=0,
-                mode="edge",
-                anti_aliasing=False,
-                preserve_range=True,
-            )
-            out[k] = v2 > 0.5
+            g = nearest_gather(v, target_shape)
+            out[k] = g if g.dtype == np.bool_ else g > 0.5
         else:
             out[k] = v.astype(bool)
     return out
@@ -85,3 +290,15 @@ def renormalize_weights(weights: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]
     denom = np.where(denom <= 1e-8, 1.0, denom)
     stack = stack / denom
     return {k: stack[..., i] for i, k in enumerate(layers)}
+
+
+def renormalize_topk(tk: TopKWeights, chunk_rows: int = 512) -> TopKWeights:
+    """Rescale kept slots in place so each covered pixel's quantized weights sum to ~255."""
+    rows = max(1, int(chunk_rows))
+    for r0 in range(0, tk.shape[0], rows):
+        r1 = min(tk.shape[0], r0 + rows)
+        vals = tk.values[r0:r1].astype(np.float32)
+        denom = np.sum(vals, axis=-1, keepdims=True)
+        denom = np.where(denom <= 0.0, 255.0, denom)
+        tk.values[r0:r1] = np.clip(np.rint(vals * (255.0 / denom)), 0, 255).astype(np.uint8)
+    return tk
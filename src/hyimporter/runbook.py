@@ -5,6 +5,7 @@ from pathlib import Path
 from typing import Dict, Iterable, List
 
 from .tiling import TileSpec
+from .utils import atomic_path
 
 
 def write_tile_manifest(manifest_path: Path, rows: Iterable[Dict[str, object]]) -> None:
@@ -14,7 +15,7 @@ def write_tile_manifest(manifest_path: Path, rows: Iterable[Dict[str, object]])
         return
 
     fieldnames = list(rows[0].keys())
-    with manifest_path.open("w", encoding="utf-8", newline="") as f:
+    with atomic_path(manifest_path) as tmp, tmp.open("w", encoding="utf-8", newline="") as f:
         w = csv.DictWriter(f, fieldnames=fieldnames)
         w.writeheader()
         for row in rows:
@@ -7,6 +7,8 @@ from typing import Dict, List
 
 import numpy as np
 
+from .utils import atomic_path
+
 
 def _w_u8(buf: bytearray, v: int) -> None:
     buf.extend(struct.pack(">B", int(v) & 0xFF))
@@ -88,9 +90,10 @@ def write_mcedit_schematic(
     # End root compound
     _w_u8(buf, 0)
 
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with gzip.open(path, "wb") as f:
-        f.write(buf)
+    # The gzip header records the final file name, not the temp one.
+    with atomic_path(path) as tmp, tmp.open("wb") as raw:
+        with gzip.GzipFile(filename=str(path), mode="wb", fileobj=raw) as f:
+            f.write(buf)
 
 
 def _block_id_for_label(label_name: str, block_ids: Dict[str, int]) -> int:
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .config import PipelineConfig
+from .runbook import write_tile_manifest
+from .tile_costs import TileCostModel, assign_shards, estimate_part_cost, tile_cost_features
+from .tile_scheduler import tile_parts
+from .tiling import TileSpec, build_tiles
+from .utils import write_json
+
+
+def _tile_cost(cfg: PipelineConfig, t: TileSpec, y: np.ndarray, labels: np.ndarray) -> float:
+    f = tile_cost_features(cfg, t, y, labels)
+    return sum(estimate_part_cost(TileCostModel(), cfg, f, p) for p in tile_parts(cfg, t, labels))
+
+
+def _tile_keys(cfg: PipelineConfig, shape: Tuple[int, int]) -> Set[Tuple[int, int]]:
+    return {(t.i, t.j) for t in build_tiles(shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)}
+
+
+def shard_tiles(
+    cfg: PipelineConfig, y: np.ndarray, labels: np.ndarray, shard: Tuple[int, int]
+) -> Set[Tuple[int, int]]:
+    """Tiles of shard ``k`` of ``n`` (1-based), balanced by estimated export cost."""
+    k, n = shard
+    tiles = build_tiles(y.shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
+    return set(assign_shards({(t.i, t.j): _tile_cost(cfg, t, y, labels) for t in tiles}, n)[k - 1])
+
+
+def check_selection(cfg: PipelineConfig, shape: Tuple[int, int], selected: Set[Tuple[int, int]]) -> None:
+    unknown = sorted(selected - _tile_keys(cfg, shape))
+    if unknown:
+        raise ValueError(f"Tiles not in this map's grid: {unknown[:5]}")
+
+
+def shard_name(shard: Optional[Tuple[int, int]], tiles: Set[Tuple[int, int]]) -> str:
+    if shard is not None:
+        return f"{shard[0]}_of_{shard[1]}"
+    ident = ",".join(f"{i}_{j}" for i, j in sorted(tiles))
+    return "tiles_" + hashlib.sha1(ident.encode("utf-8")).hexdigest()[:10]
+
+
+def tile_of_file(name: str) -> Optional[Tuple[int, int]]:
+    """``(i, j)`` of a per-tile output (``tile_<i>_<j>.obj``, ``tile_<i>_<j>__<layer>.obj``, ...)."""
+    m = re.match(r"tile_(\d+)_(\d+)[._]", name)
+    return None if m is None else (int(m.group(1)), int(m.group(2)))
+
+
+def _read_csv_rows(path: Path) -> List[Dict[str, object]]:
+    with path.open("r", encoding="utf-8", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def write_shard_report(
+    shard_dir: Path,
+    shard: Optional[Tuple[int, int]],
+    key: str,
+    tiles: Set[Tuple[int, int]],
+    tile_export: Dict[str, object],
+    warnings: List[str],
+    prefabs: Optional[Dict[str, object]],
+) -> Dict[str, object]:
+    """Write ``shard.json``; ``key`` identifies the global arrays and exporter settings the shard used."""
+    report = {
+        "shard": None if shard is None else f"{shard[0]}/{shard[1]}",
+        "key": key,
+        "tiles": [[i, j] for i, j in sorted(tiles)],
+        "tile_export": tile_export,
+        "warnings": warnings,
+        "prefabs": prefabs,
+        "shard_dir": str(shard_dir),
+    }
+    write_json(shard_dir / "shard.json", report)
+    return report
+
+
+def merge_shard_reports(
+    cfg: PipelineConfig,
+    shape: Tuple[int, int],
+    shards_root: Path,
+    key: str,
+    manifest_path: Path,
+    grids_dir: Path,
+) -> Dict[str, object]:
+    """Combine the shard reports under ``shards_root`` exported with ``key``: writes the tile manifest and
+    returns its rows, the tile vertex grids, export stats, warnings and prefab stats."""
+    paths = sorted(shards_root.glob("*/shard.json"), key=lambda p: (p.stat().st_mtime_ns, str(p)))
+    if not paths:
+        raise RuntimeError(f"No shard reports under {shards_root}")
+    warnings: List[str] = []
+    reports = []
+    for p in paths:
+        report = json.loads(p.read_text(encoding="utf-8"))
+        if report.get("key") == key:
+            reports.append((p.parent, report))
+        else:
+            msg = f"Ignoring shard {p.parent.name}: exported from other inputs or settings (delete {p.parent})"
+            warnings.append(msg)
+            print(f"WARN: {msg}")
+    # Reports with the current key wrote identical tiles, so leftovers from another shard count or --tiles
+    # run may overlap; each tile is taken from the newest report that exported it.
+    expected = _tile_keys(cfg, shape)
+    owner: Dict[Tuple[int, int], Path] = {}
+    for shard_dir, report in reports:
+        for i, j in report["tiles"]:
+            owner[(i, j)] = shard_dir
+    missing = sorted(expected - set(owner))
+    if missing:
+        raise RuntimeError(
+            f"{len(missing)} tiles were not exported by any shard of the current inputs and settings, "
+            f"e.g. {missing[:5]}; export them (--tiles) and merge again"
+        )
+    used = [(d, r) for d, r in reports if d in set(owner.values())]
+
+    rows = [
+        row
+        for shard_dir, _r in used
+        for row in _read_csv_rows(shard_dir / "tile_manifest.csv")
+        if owner.get((int(row["tile_i"]), int(row["tile_j"]))) == shard_dir
+    ]
+    rows.sort(key=lambda r: (int(r["tile_i"]), int(r["tile_j"])))  # type: ignore[arg-type]
+    write_tile_manifest(manifest_path, rows)
+    grids = {(i, j): np.load(grids_dir / f"tile_{i}_{j}.npy") for i, j in sorted(expected)}
+    stats = {
+        "tiles": len(expected),
+        "exported": sum(int(r["tile_export"].get("exported", 0)) for _d, r in used),
+        "reused": sum(int(r["tile_export"].get("reused", 0)) for _d, r in used),
+        "shards": len(used),
+    }
+    # Map-wide warnings (tile count, prefabs) are repeated by every shard.
+    warnings = list(dict.fromkeys([w for _d, r in used for w in r["warnings"]] + warnings))
+    return {"rows": rows, "grids": grids, "stats": stats, "warnings": warnings, "prefabs": used[0][1]["prefabs"]}
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class SharedArraySpec:
+    """Picklable handle that lets worker processes attach to a shared ndarray."""
+
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _close_quietly(shm: shared_memory.SharedMemory) -> None:
+    # Views that outlive the block keep the mapping alive; it is released once they are collected.
+    try:
+        shm.close()
+    except BufferError:
+        pass
+
+
+@contextmanager
+def shared_ndarray(
+    src: Optional[np.ndarray] = None,
+    shape: Optional[Tuple[int, ...]] = None,
+    dtype: object = None,
+    fill: Optional[object] = None,
+) -> Iterator[Tuple[SharedArraySpec, np.ndarray]]:
+    """Allocate a shared-memory ndarray (copied from ``src`` or shaped/filled) for the block's lifetime."""
+    if src is not None:
+        src = np.ascontiguousarray(src)
+        shape = tuple(src.shape)
+        dtype = src.dtype
+    if shape is None or dtype is None:
+        raise ValueError("shared_ndarray needs either src or shape+dtype")
+
+    dt = np.dtype(dtype)
+    nbytes = max(1, int(np.prod(shape, dtype=np.int64)) * dt.itemsize)
+    shm = shared_memory.SharedMemory(create=True, size=nbytes)
+    arr = np.ndarray(shape, dtype=dt, buffer=shm.buf)
+    try:
+        if src is not None:
+            arr[...] = src
+        elif fill is not None:
+            arr.fill(fill)
+        yield SharedArraySpec(name=shm.name, shape=tuple(int(s) for s in shape), dtype=dt.str), arr
+    finally:
+        del arr
+        _close_quietly(shm)
+        shm.unlink()
+
+
+@contextmanager
+def attach_ndarray(spec: SharedArraySpec) -> Iterator[np.ndarray]:
+    """Zero-copy view of a shared ndarray created by :func:`shared_ndarray` in another process."""
+    shm = shared_memory.SharedMemory(name=spec.name)
+    arr = np.ndarray(spec.shape, dtype=np.dtype(spec.dtype), buffer=shm.buf)
+    try:
+        yield arr
+    finally:
+        del arr
+        _close_quietly(shm)
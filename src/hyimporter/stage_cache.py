@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .utils import atomic_path
+
+# Bump when the entry layout changes so older cache files are ignored.
+CACHE_FORMAT = 1
+
+# A stage's output: named arrays plus JSON-serializable stats, carried forward through the chain.
+StageState = Tuple[Dict[str, np.ndarray], Dict[str, object]]
+
+
+def _digest(*parts: str) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(p.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def config_digest(*sections: object) -> str:
+    """Digest of config dataclass sections (e.g. ``cfg.height``)."""
+    return _digest(*(json.dumps(asdict(s), sort_keys=True, default=str) for s in sections))  # type: ignore
+
+
+@lru_cache(maxsize=None)
+def _module_digest(name: str) -> str:
+    module = importlib.import_module(f".{name}", __package__)
+    path = getattr(module, "__file__", None)
+    return _digest(name, hashlib.sha256(Path(path).read_bytes()).hexdigest() if path else "")
+
+
+def code_digest(*modules: str) -> str:
+    """Digest of the package modules (by name) implementing a stage, so code edits invalidate its entries."""
+    return _digest(*(_module_digest(m) for m in modules))
+
+
+def file_digest(paths: Iterable[Path]) -> str:
+    """Identity of input files by resolved path, size and mtime (as the height histogram cache keys them)."""
+    parts: List[str] = []
+    for p in sorted(Path(p) for p in paths):
+        try:
+            st = p.stat()
+        except OSError:
+            parts.append(f"{p}|missing")
+            continue
+        parts.append(f"{p.resolve()}|{st.st_size}|{st.st_mtime_ns}")
+    return _digest(*parts)
+
+
+@dataclass
+class Stage:
+    """One cacheable pipeline step; ``compute`` maps the previous stage's state (None for the first)."""
+
+    name: str
+    key: str
+    compute: Callable[[Optional[StageState]], StageState]
+
+
+class StageCache:
+    """On-disk stage outputs keyed by digests of their inputs, config and code; LRU-evicted to ``max_bytes``.
+
+    Each entry is one uncompressed ``.npz`` holding the stage arrays, its key and its stats as JSON.
+    ``max_bytes <= 0`` means no size bound.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.enabled = bool(enabled)
+        self.status: Dict[str, str] = {}
+        self.evicted = 0
+        self._used: Set[Path] = set()
+
+    def key(self, *parts: str) -> str:
+        return _digest(str(CACHE_FORMAT), *parts)
+
+    def _path(self, name: str, key: str) -> Path:
+        return self.root / f"{name}-{key[:32]}.npz"
+
+    def has(self, name: str, key: str) -> bool:
+        """Whether an entry exists (cheap; ``load`` may still reject it)."""
+        return self.enabled and self._path(name, key).exists()
+
+    def load(self, name: str, key: str) -> Optional[StageState]:
+        path = self._path(name, key)
+        if not self.enabled or not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["__key__"]) != key:
+                    return None
+                meta = json.loads(str(data["__meta__"]))
+                arrays = {k: data[k] for k in data.files if not k.startswith("__")}
+        except Exception:
+            return None
+        os.utime(path)
+        self._used.add(path)
+        return arrays, meta
+
+    def save(self, name: str, key: str, state: StageState) -> None:
+        if not self.enabled:
+            return
+        arrays, meta = state
+        path = self._path(name, key)
+        with atomic_path(path) as tmp, tmp.open("wb") as f:
+            np.savez(f, __key__=np.array(key), __meta__=np.array(json.dumps(meta, sort_keys=True)), **arrays)
+        self._used.add(path)
+
+    def run_chain(self, stages: List[Stage]) -> StageState:
+        """Resume from the latest stage with a cached entry and compute (and store) the ones after it."""
+        state: Optional[StageState] = None
+        start = 0
+        for i in range(len(stages) - 1, -1, -1):
+            state = self.load(stages[i].name, stages[i].key)
+            if state is not None:
+                start = i + 1
+                for s in stages[:i]:
+                    self.status[s.name] = "skipped"
+                self.status[stages[i].name] = "hit"
+                break
+        for s in stages[start:]:
+            state = s.compute(state)
+            self.record(s, state)
+        if state is None:
+            raise ValueError("run_chain needs at least one stage")
+        return state
+
+    def record(self, stage: Stage, state: StageState) -> None:
+        """Store a freshly computed stage output (also for stages computed outside :meth:`run_chain`)."""
+        self.save(stage.name, stage.key, state)
+        self.status[stage.name] = "miss"
+
+    def evict(self) -> int:
+        """Drop least recently used entries (never ones this run touched) until the cache fits ``max_bytes``."""
+        if not self.enabled or self.max_bytes <= 0 or not self.root.exists():
+            return 0
+        entries = [(p.stat().st_mtime_ns, p.stat().st_size, p) for p in self.root.glob("*.npz")]
+        total = sum(size for _mtime, size, _p in entries)
+        removed = 0
+        for _mtime, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if p in self._used:
+                continue
+            p.unlink()
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    def bytes_on_disk(self) -> int:
+        if not self.root.exists():
+            return 0
+        return int(sum(p.stat().st_size for p in self.root.glob("*.npz")))
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "stages": dict(self.status),
+            "hits": sorted(k for k, v in self.status.items() if v == "hit"),
+            "bytes": self.bytes_on_disk(),
+            "max_bytes": self.max_bytes,
+            "evicted": self.evicted,
+        }
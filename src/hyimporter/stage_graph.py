@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+@dataclass
+class GraphStage:
+    name: str
+    fn: Callable[..., object]
+    deps: Tuple[str, ...] = ()
+
+
+class StageGraph:
+    """Named pipeline stages with declared dependencies, run on one shared thread pool.
+
+    A stage starts as soon as every stage it depends on has finished and is called with their results as
+    keyword arguments. Dependencies must be added first, so insertion order is a valid serial order and the
+    graph cannot contain cycles. With one worker the stages run inline in that order.
+    """
+
+    def __init__(self) -> None:
+        self.stages: Dict[str, GraphStage] = {}
+        self.timings: Dict[str, Dict[str, float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def add(self, name: str, fn: Callable[..., object], deps: Sequence[str] = ()) -> None:
+        if name in self.stages:
+            raise ValueError(f"Duplicate stage: {name}")
+        missing = [d for d in deps if d not in self.stages]
+        if missing:
+            raise ValueError(f"Stage {name} depends on unknown stages: {missing}")
+        self.stages[name] = GraphStage(name=name, fn=fn, deps=tuple(deps))
+
+    def _call(self, stage: GraphStage, results: Dict[str, object], t0: float) -> object:
+        start = time.perf_counter()
+        try:
+            return stage.fn(**{d: results[d] for d in stage.deps})
+        finally:
+            end = time.perf_counter()
+            self.timings[stage.name] = {"start_s": round(start - t0, 6), "wall_s": round(end - start, 6)}
+
+    def run(self, workers: int = 1) -> Dict[str, object]:
+        """Run every stage and return their results by name; the first stage error is re-raised
+        after stages already running have finished (stages not yet started are dropped)."""
+        results: Dict[str, object] = {}
+        t0 = time.perf_counter()
+        if int(workers) <= 1:
+            for stage in self.stages.values():
+                results[stage.name] = self._call(stage, results, t0)
+            return results
+
+        pending: List[GraphStage] = list(self.stages.values())
+        running: Dict[Future, str] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(max_workers=int(workers), thread_name_prefix="stage") as pool:
+            while pending or running:
+                if error is None:
+                    ready = [s for s in pending if all(d in results for d in s.deps)]
+                    for stage in ready:
+                        pending.remove(stage)
+                        running[pool.submit(self._call, stage, dict(results), t0)] = stage.name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    exc = fut.exception()
+                    if exc is not None:
+                        error = error or exc
+                    else:
+                        results[name] = fut.result()
+        if error is not None:
+            raise error
+        return results
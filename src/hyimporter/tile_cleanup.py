@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .cleanup import cleanup_labels
+from .config import PipelineConfig
+from .shared_arrays import SharedArraySpec, attach_ndarray, shared_ndarray
+from .tile_costs import TileMemoryModel
+from .tile_scheduler import process_context, resolve_tile_workers
+from .tiling import TileSpec, build_tiles
+
+
+def cleanup_tile_into(
+    src: np.ndarray,
+    dst: np.ndarray,
+    t: TileSpec,
+    majority_radius: int,
+    min_area: int,
+    dithered: Optional[np.ndarray] = None,
+) -> float:
+    """Clean ``t``'s expanded window of ``src`` and write its core into ``dst``; returns the speckle rate."""
+    ex = src[t.ex0 : t.ex1, t.ez0 : t.ez1]
+    cleaned_ex, stats = cleanup_labels(ex, majority_radius=majority_radius, min_area=min_area)
+    cx, cz = t.core_in_expanded
+    core = cleaned_ex[cx, cz]
+    if dithered is not None:
+        # The palette dither goes on after cleanup (which would erase most of it), wherever cleanup kept
+        # the undithered pick.
+        core = np.where(core == src[t.x0 : t.x1, t.z0 : t.z1], dithered[t.x0 : t.x1, t.z0 : t.z1], core)
+    dst[t.x0 : t.x1, t.z0 : t.z1] = core
+    return float(stats["speckle_rate"])
+
+
+def cleanup_tile_keyed(
+    src: np.ndarray,
+    dst: np.ndarray,
+    t: TileSpec,
+    majority_radius: int,
+    min_area: int,
+    dithered: Optional[np.ndarray] = None,
+) -> tuple[Tuple[int, int], float]:
+    return (t.i, t.j), cleanup_tile_into(src, dst, t, majority_radius, min_area, dithered)
+
+
+def cleanup_tile_shared(
+    src_spec: SharedArraySpec,
+    dst_spec: SharedArraySpec,
+    t: TileSpec,
+    majority_radius: int,
+    min_area: int,
+    dithered_spec: Optional[SharedArraySpec] = None,
+) -> tuple[Tuple[int, int], float]:
+    # Worker-process entry point: reads the expanded window, writes only this tile's core.
+    with ExitStack() as stack:
+        src = stack.enter_context(attach_ndarray(src_spec))
+        dst = stack.enter_context(attach_ndarray(dst_spec))
+        dithered = None if dithered_spec is None else stack.enter_context(attach_ndarray(dithered_spec))
+        return cleanup_tile_keyed(src, dst, t, majority_radius, min_area, dithered)
+
+
+def _speckle_stats(speckle_by_tile: Dict[Tuple[int, int], float]) -> Dict[str, float]:
+    # Aggregate in tile order so the float result does not depend on completion order.
+    speckle_vals = [speckle_by_tile[key] for key in sorted(speckle_by_tile)]
+    return {
+        "speckle_rate": float(np.mean(speckle_vals)) if speckle_vals else 0.0,
+        "speckle_rate_max": float(np.max(speckle_vals)) if speckle_vals else 0.0,
+    }
+
+
+class CleanupStream:
+    """Expanded-tile label cleanup run on the tile export workers (see ``export._export_tiles``).
+
+    Tiles are cleaned in row-major order. A tile is released for export once every tile whose core
+    overlaps its expanded window is clean, since the exporters and the tile fingerprint read that window.
+    """
+
+    def __init__(self, cfg: PipelineConfig, shape: Tuple[int, int], dithered: Optional[np.ndarray] = None) -> None:
+        self.majority_radius = int(cfg.materials.majority_radius)
+        self.min_area = int(cfg.materials.island_min_area)
+        self.dithered = dithered
+        tiles = build_tiles(shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
+        self.pending: Deque[TileSpec] = deque(tiles)
+        self.speckle: Dict[Tuple[int, int], float] = {}
+        self.labels: Optional[np.ndarray] = None
+        self._tiles = {(t.i, t.j): t for t in tiles}
+        self._waiting: Dict[Tuple[int, int], Set[Tuple[int, int]]] = {}
+        self._dependents: Dict[Tuple[int, int], List[Tuple[int, int]]] = {key: [] for key in self._tiles}
+        reach = max(1, -(-int(cfg.tiling.overlap) // int(cfg.tiling.tile_size)))
+        for t in tiles:
+            needs: Set[Tuple[int, int]] = set()
+            for di in range(-reach, reach + 1):
+                for dj in range(-reach, reach + 1):
+                    u = self._tiles.get((t.i + di, t.j + dj))
+                    if u is not None and u.x0 < t.ex1 and t.ex0 < u.x1 and u.z0 < t.ez1 and t.ez0 < u.z1:
+                        needs.add((u.i, u.j))
+                        self._dependents[(u.i, u.j)].append((t.i, t.j))
+            self._waiting[(t.i, t.j)] = needs
+
+    def memory(self, model: TileMemoryModel, t: TileSpec) -> int:
+        return int((t.ex1 - t.ex0) * (t.ez1 - t.ez0) * model.cleanup_cell)
+
+    def done(self, key: Tuple[int, int], speckle_rate: float) -> List[TileSpec]:
+        """Record a cleaned tile and return the tiles whose expanded windows it completed."""
+        self.speckle[key] = speckle_rate
+        released = []
+        for dependent in self._dependents[key]:
+            waiting = self._waiting[dependent]
+            waiting.discard(key)
+            if not waiting:
+                released.append(self._tiles[dependent])
+        return released
+
+    def clean(self, src: np.ndarray, dst: np.ndarray, t: TileSpec) -> float:
+        """Clean one tile on the calling thread."""
+        return cleanup_tile_into(src, dst, t, self.majority_radius, self.min_area, self.dithered)
+
+    def finish(self, labels: np.ndarray) -> None:
+        if self.pending or np.any(labels < 0):
+            raise RuntimeError("Missing tile regions detected after expanded cleanup")
+        self.labels = np.array(labels, dtype=np.int16)
+
+    def stats(self) -> Dict[str, float]:
+        return _speckle_stats(self.speckle)
+
+
+def cleanup_labels_in_expanded_tiles(
+    cfg: PipelineConfig, labels: np.ndarray, dithered: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, Dict[str, float]]:
+    """Clean labels tile by tile over expanded windows; ``dithered`` (deferred palette dither, see
+    ``assign_material_labels``) replaces every pixel cleanup left unchanged."""
+    tiles = build_tiles(labels.shape, tile_size=cfg.tiling.tile_size, overlap=cfg.tiling.overlap)
+    majority_radius = int(cfg.materials.majority_radius)
+    min_area = int(cfg.materials.island_min_area)
+    workers = resolve_tile_workers(cfg, len(tiles))
+    speckle_by_tile: Dict[Tuple[int, int], float] = {}
+
+    if cfg.runtime.async_tile_export and len(tiles) > 1 and workers > 1:
+        # Labels are shared with workers instead of pickled; cores are disjoint so writes never race.
+        src_labels = labels.astype(np.int16, copy=False)
+        with ExitStack() as stack:
+            src_spec, _src = stack.enter_context(shared_ndarray(src_labels))
+            dst_spec, dst = stack.enter_context(shared_ndarray(shape=labels.shape, dtype=np.int16, fill=-1))
+            dithered_spec = None if dithered is None else stack.enter_context(shared_ndarray(dithered))[0]
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_context([__name__])) as pool:
+                futures = [
+                    pool.submit(cleanup_tile_shared, src_spec, dst_spec, t, majority_radius, min_area, dithered_spec)
+                    for t in tiles
+                ]
+                for future in as_completed(futures):
+                    key, rate = future.result()
+                    speckle_by_tile[key] = rate
+            out = dst.copy()
+    else:
+        out = np.full_like(labels, -1, dtype=np.int16)
+        for t in tiles:
+            speckle_by_tile[(t.i, t.j)] = cleanup_tile_into(labels, out, t, majority_radius, min_area, dithered)
+
+    if np.any(out < 0):
+        raise RuntimeError("Missing tile regions detected after expanded cleanup")
+    return out, _speckle_stats(speckle_by_tile)
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import csv
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from .config import PipelineConfig
+from .tiling import TileSpec
+from .utils import atomic_path
+
+
+@dataclass(frozen=True)
+class TileCostModel:
+    """Seconds per unit of work for each tile exporter, measured on a 512x512 core with one worker.
+
+    Only relative sizes matter for scheduling; recalibrate against the estimated/actual columns of
+    ``runbook/tile_costs.csv``.
+    """
+
+    grid_cell: float = 8.4e-6  # vertex grid, built for every tile (seam QA)
+    base_cell: float = 1.2e-5  # base volume OBJ
+    shell_cell: float = 1.8e-5  # shell OBJ, per cell of its layer
+    shell_layer: float = 0.05  # shell OBJ, fixed per layer (mask, bbox stabilization)
+    schematic_cell: float = 6.8e-6  # schematic column fill
+    schematic_voxel: float = 1.3e-8  # schematic box (cells x height) allocation and gzip
+    bo2_line: float = 1.5e-6  # one BO2 block line
+
+
+@dataclass(frozen=True)
+class TileMemoryModel:
+    """Peak bytes each tile exporter allocates (tracemalloc on 512x512 cores); used for memory admission."""
+
+    grid_cell: float = 760.0  # vertex grid plus base mesh lists
+    shell_cell: float = 640.0  # per tile cell: shells build full-tile vertex grids whatever the layer coverage
+    schematic_voxel: float = 4.8  # Blocks/Data arrays and intermediates over the schematic box
+    bo2_line: float = 92.0  # one formatted BO2 line held until the file is written
+    cleanup_cell: float = 24.0  # streamed label cleanup, per expanded-window cell (majority filter, components)
+
+
+@dataclass
+class TileCostFeatures:
+    cells: int
+    relief: int
+    box_height: int
+    layer_cells: Dict[int, int] = field(default_factory=dict)
+    bo2_lines: int = 0
+
+
+def tile_cost_features(cfg: PipelineConfig, t: TileSpec, y: np.ndarray, labels: np.ndarray) -> TileCostFeatures:
+    core_y = y[t.x0 : t.x1, t.z0 : t.z1]
+    core_labels = labels[t.x0 : t.x1, t.z0 : t.z1]
+    counts = np.bincount(core_labels.ravel().astype(np.int64) + 1, minlength=len(cfg.materials.layers) + 1)[1:]
+    bo2_lines = int(core_y.size)
+    if cfg.outputs.bo2_include_subsurface:
+        top = np.clip(core_y.astype(np.int64), 0, 319)
+        bo2_lines += int(np.maximum(top - int(cfg.height.bottom_y), 0).sum())
+    return TileCostFeatures(
+        cells=int(core_y.size),
+        relief=int(np.max(core_y)) - int(np.min(core_y)),
+        box_height=min(320, max(1, int(np.max(core_y)) + 1)),
+        layer_cells={li: int(n) for li, n in enumerate(counts[: len(cfg.materials.layers)]) if n},
+        bo2_lines=bo2_lines,
+    )
+
+
+def estimate_part_cost(model: TileCostModel, cfg: PipelineConfig, f: TileCostFeatures, part: str) -> float:
+    """Estimated seconds for one exporter part (see ``tile_scheduler.tile_parts``)."""
+    if part == "grid":
+        base = cfg.outputs.export_obj and cfg.mesh.export_base
+        return f.cells * (model.grid_cell + (model.base_cell if base else 0.0))
+    if part.startswith("shell:"):
+        return model.shell_layer + f.layer_cells.get(int(part.split(":", 1)[1]), 0) * model.shell_cell
+    if part == "schematic":
+        return f.cells * model.schematic_cell + f.cells * f.box_height * model.schematic_voxel
+    if part == "bo2":
+        return f.bo2_lines * model.bo2_line
+    raise ValueError(f"Unknown tile export part: {part}")
+
+
+def estimate_part_memory(model: TileMemoryModel, f: TileCostFeatures, part: str) -> int:
+    """Estimated peak bytes of one exporter part."""
+    if part == "grid":
+        return int(f.cells * model.grid_cell)
+    if part.startswith("shell:"):
+        return int(f.cells * model.shell_cell)
+    if part == "schematic":
+        return int(f.cells * f.box_height * model.schematic_voxel)
+    if part == "bo2":
+        return int(f.bo2_lines * model.bo2_line)
+    raise ValueError(f"Unknown tile export part: {part}")
+
+
+def write_tile_cost_log(path: Path, rows: Iterable[Dict[str, object]]) -> None:
+    """CSV of per-tile cost features with estimated and measured seconds."""
+    rows = list(rows)
+    if not rows:
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_path(path) as tmp, tmp.open("w", encoding="utf-8", newline="") as fh:
+        w = csv.DictWriter(fh, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        w.writerows(rows)
+
+
+def tile_cost_row(
+    t: TileSpec, f: TileCostFeatures, parts: List[str], estimated_s: float, actual_s: float, estimated_mb: float
+) -> Dict[str, object]:
+    return {
+        "tile_i": t.i,
+        "tile_j": t.j,
+        "cells": f.cells,
+        "relief": f.relief,
+        "box_height": f.box_height,
+        "layers_present": len(f.layer_cells),
+        "shell_cells": sum(f.layer_cells.values()),
+        "bo2_lines": f.bo2_lines,
+        "parts": ";".join(parts),
+        "estimated_s": round(float(estimated_s), 4),
+        "actual_s": round(float(actual_s), 4),
+        "estimated_peak_mb": round(float(estimated_mb), 1),
+    }
+
+
+def assign_shards(costs: Dict[Tuple[int, int], float], n: int) -> List[List[Tuple[int, int]]]:
+    """Split tiles into ``n`` shards of similar total estimated cost (longest first onto the lightest shard).
+
+    Deterministic for the same costs, so independent hosts agree on the split; each shard is sorted.
+    """
+    if n < 1:
+        raise ValueError("shard count must be >= 1")
+    loads = [0.0] * n
+    shards: List[List[Tuple[int, int]]] = [[] for _ in range(n)]
+    for key in sorted(costs, key=lambda k: (-costs[k], k)):
+        s = min(range(n), key=lambda i: (loads[i], i))
+        shards[s].append(key)
+        loads[s] += costs[key]
+    return [sorted(s) for s in shards]
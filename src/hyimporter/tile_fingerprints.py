@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .tiling import TileSpec
+from .utils import atomic_path
+
+# Bump when the fingerprint inputs change so every tile is re-exported once.
+FINGERPRINT_VERSION = 1
+
+
+def tile_fingerprint(base: str, t: TileSpec, y: np.ndarray, labels: np.ndarray, extra: Iterable[bytes] = ()) -> str:
+    """Digest of everything a tile export reads: its expanded-window y and labels, plus ``base`` and ``extra``."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{FINGERPRINT_VERSION}|{base}|{asdict(t)}".encode("utf-8"))
+    for arr in (y[t.ex0 : t.ex1, t.ez0 : t.ez1], labels[t.ex0 : t.ex1, t.ez0 : t.ez1]):
+        h.update(f"{arr.dtype.str}{arr.shape}".encode("utf-8"))
+        h.update(np.ascontiguousarray(arr).tobytes())
+    for chunk in extra:
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def file_stats(paths: Iterable[Path]) -> Dict[str, List[int]]:
+    """``name -> [size, mtime_ns]`` for existing output files."""
+    out: Dict[str, List[int]] = {}
+    for p in paths:
+        try:
+            st = p.stat()
+        except OSError:
+            continue
+        out[p.name] = [int(st.st_size), int(st.st_mtime_ns)]
+    return out
+
+
+@dataclass
+class TileRecord:
+    fingerprint: str
+    files: Dict[str, List[int]]
+    manifest_row: Dict[str, object]
+    warnings: List[str] = field(default_factory=list)
+
+
+class TileFingerprints:
+    """Per-tile fingerprints and output file stats from the previous export, kept next to the tile manifest.
+
+    Core vertex grids (used by the seam QA) are stored per tile under ``grids_dir`` (default ``tile_grids/``
+    beside the JSON). The file is also the export journal: it is saved as tiles finish, with ``complete``
+    set only at the end.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        tiles: Optional[Dict[str, TileRecord]] = None,
+        complete: bool = True,
+        grids_dir: Optional[Path] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.grids_dir = Path(grids_dir) if grids_dir is not None else self.path.parent / "tile_grids"
+        self.tiles: Dict[str, TileRecord] = dict(tiles or {})
+        self.complete = bool(complete)
+
+    @classmethod
+    def load(cls, path: Path, grids_dir: Optional[Path] = None) -> "TileFingerprints":
+        try:
+            raw = json.loads(Path(path).read_text(encoding="utf-8"))
+            if int(raw.get("version", -1)) != FINGERPRINT_VERSION:
+                return cls(path, grids_dir=grids_dir)
+            tiles = {name: TileRecord(**rec) for name, rec in raw["tiles"].items()}
+            return cls(path, tiles, complete=bool(raw.get("complete", True)), grids_dir=grids_dir)
+        except (OSError, ValueError, KeyError, TypeError):
+            return cls(path, grids_dir=grids_dir)
+
+    def save(self) -> None:
+        payload = {
+            "version": FINGERPRINT_VERSION,
+            "complete": self.complete,
+            "tiles": {name: asdict(rec) for name, rec in sorted(self.tiles.items())},
+        }
+        with atomic_path(self.path) as tmp:
+            tmp.write_text(json.dumps(payload, indent=1, sort_keys=True), encoding="utf-8")
+
+    def save_grid(self, name: str, grid: np.ndarray) -> None:
+        with atomic_path(self.grids_dir / f"{name}.npy") as tmp, tmp.open("wb") as f:
+            np.save(f, grid)
+
+    def current(self, name: str, fingerprint: str, out_dir: Path) -> Optional[Tuple[TileRecord, np.ndarray]]:
+        """The stored record and vertex grid when ``fingerprint`` matches and every output file is untouched."""
+        rec = self.tiles.get(name)
+        if rec is None or rec.fingerprint != fingerprint or not rec.files:
+            return None
+        if file_stats(out_dir / f for f in rec.files) != rec.files:
+            return None
+        try:
+            grid = np.load(self.grids_dir / f"{name}.npy")
+        except (OSError, ValueError):
+            return None
+        return rec, grid
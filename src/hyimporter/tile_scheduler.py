@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .config import PipelineConfig
+from .tile_costs import (
+    TileCostFeatures,
+    TileCostModel,
+    TileMemoryModel,
+    estimate_part_cost,
+    estimate_part_memory,
+    tile_cost_features,
+    tile_cost_row,
+)
+from .tiling import TileSpec
+
+# A whole tile (part None) or one exporter part of it.
+TileJob = Tuple[TileSpec, Optional[str]]
+
+
+def resolve_tile_workers(cfg: PipelineConfig, n_tiles: int) -> int:
+    requested_workers = int(cfg.runtime.tile_workers)
+    if requested_workers < 0:
+        raise ValueError("runtime.tile_workers must be >= 0")
+
+    if requested_workers == 0:
+        return max(1, min(n_tiles, os.cpu_count() or 1))
+    return max(1, min(n_tiles, requested_workers))
+
+
+def process_context(preload: Sequence[str]):
+    """Start method for worker pools. Pipeline stages run on threads, and forking a threaded process copies
+    locks other threads may hold, so POSIX workers come from a forkserver preloaded with ``preload``."""
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload(list(preload))
+    return ctx
+
+
+def tile_parts(cfg: PipelineConfig, t: TileSpec, labels: np.ndarray) -> List[str]:
+    """Independent exporter tasks for a tile, in output order: the vertex grid (plus base OBJ),
+    one ``shell:<layer index>`` per layer present in the core, then schematic and BO2."""
+    parts = ["grid"]
+    if cfg.outputs.export_obj and cfg.mesh.export_shells:
+        present = np.unique(labels[t.x0 : t.x1, t.z0 : t.z1])
+        parts.extend(f"shell:{li}" for li in range(len(cfg.materials.layers)) if li in present)
+    if cfg.outputs.export_schematic:
+        parts.append("schematic")
+    if cfg.outputs.export_bo2:
+        parts.append("bo2")
+    return parts
+
+
+class TilePlan:
+    """Exporter parts of the tiles queued for export, with the estimated seconds and peak bytes of each.
+
+    With ``split``, every part is its own job and :meth:`collect` gathers a tile's finished parts.
+    """
+
+    def __init__(self, cfg: PipelineConfig, y: np.ndarray, split: bool) -> None:
+        self.cfg = cfg
+        self.y = y
+        self.split = split
+        self.tiles: List[TileSpec] = []
+        self.parts: Dict[Tuple[int, int], List[str]] = {}
+        self.features: Dict[Tuple[int, int], TileCostFeatures] = {}
+        self.cost_model = TileCostModel()
+        self.memory_model = TileMemoryModel()
+        self._cost: Dict[Tuple[int, int, str], float] = {}
+        self._memory: Dict[Tuple[int, int, str], int] = {}
+        self._done: Dict[Tuple[int, int], Dict[str, object]] = {}
+
+    def add(self, t: TileSpec, labels: np.ndarray) -> List[TileJob]:
+        """Plan a tile (its core labels must be final) and return its jobs."""
+        key = (t.i, t.j)
+        self.tiles.append(t)
+        self.parts[key] = tile_parts(self.cfg, t, labels)
+        self.features[key] = tile_cost_features(self.cfg, t, self.y, labels)
+        for part in self.parts[key]:
+            self._cost[(t.i, t.j, part)] = estimate_part_cost(self.cost_model, self.cfg, self.features[key], part)
+            self._memory[(t.i, t.j, part)] = estimate_part_memory(self.memory_model, self.features[key], part)
+        return [(t, part) for part in self.parts[key]] if self.split else [(t, None)]
+
+    def cost(self, job: TileJob) -> float:
+        t, part = job
+        parts = self.parts[(t.i, t.j)] if part is None else [part]
+        return sum(self._cost[(t.i, t.j, p)] for p in parts)
+
+    def memory(self, job: TileJob) -> int:
+        # A tile job runs its parts one after another, so its peak is the largest part's.
+        t, part = job
+        parts = self.parts[(t.i, t.j)] if part is None else [part]
+        return max(self._memory[(t.i, t.j, p)] for p in parts)
+
+    def estimate_memory(self, tiles: Sequence[TileSpec], labels: np.ndarray) -> List[int]:
+        """Job peaks of tiles not planned yet, estimated from ``labels`` (e.g. before cleanup)."""
+        out: List[int] = []
+        for t in tiles:
+            features = tile_cost_features(self.cfg, t, self.y, labels)
+            peaks = [estimate_part_memory(self.memory_model, features, p) for p in tile_parts(self.cfg, t, labels)]
+            out.extend(peaks if self.split else [max(peaks)])
+        return out
+
+    def collect(self, t: TileSpec, part: object) -> Optional[List[object]]:
+        """Record a finished part (anything with a ``name``); all of the tile's parts in plan order once
+        the last one is in, else None."""
+        key = (t.i, t.j)
+        got = self._done.setdefault(key, {})
+        got[part.name] = part  # type: ignore[attr-defined]
+        if len(got) < len(self.parts[key]):
+            return None
+        del self._done[key]
+        return [got[name] for name in self.parts[key]]
+
+    def cost_rows(self, seconds: Dict[Tuple[int, int], float]) -> List[Dict[str, object]]:
+        """Cost log rows (see :func:`.tile_costs.write_tile_cost_log`) of every planned tile, in tile order."""
+        return [
+            tile_cost_row(
+                t,
+                self.features[(t.i, t.j)],
+                self.parts[(t.i, t.j)],
+                self.cost((t, None)),
+                seconds[(t.i, t.j)],
+                self.memory((t, None)) / (1024.0 * 1024.0),
+            )
+            for t in sorted(self.tiles, key=lambda t: (t.i, t.j))
+        ]
+
+
+class TileScheduler:
+    """Runs planned tile jobs, and the streamed cleanup jobs that release them, on an executor.
+
+    Workers are capped so the smallest ``planned`` job peaks fit ``runtime.memory_budget_mb``; cleanup jobs
+    pause while ``runtime.tile_queue_depth`` released tiles are waiting for a worker.
+    """
+
+    def __init__(self, cfg: PipelineConfig, plan: TilePlan, planned: Sequence[int], cleanup=None) -> None:
+        self.plan = plan
+        self.cleanup = cleanup
+        self.jobs: List[TileJob] = []
+        self.n_jobs = len(planned) if cleanup is None else len(cleanup.pending)
+        self.workers = resolve_tile_workers(cfg, self.n_jobs)
+        self.budget = int(cfg.runtime.memory_budget_mb) * 1024 * 1024
+        if self.budget and planned:
+            # No more workers than the smallest jobs could keep busy inside the budget.
+            self.workers = min(self.workers, max(1, self.budget // max(1, min(planned))))
+        self.peak = max(planned, default=0)
+        self.queue_depth = int(cfg.runtime.tile_queue_depth) or 2 * self.workers
+        self.max_queued = 0
+        self.first_release_s: Optional[float] = None
+        self._t_start = time.perf_counter()
+
+    def add(self, jobs: Sequence[TileJob]) -> None:
+        # Longest estimated job first, so expensive (cliff-heavy, many-layer) tiles don't end the run alone.
+        self.jobs.extend(jobs)
+        self.jobs.sort(key=self.plan.cost, reverse=True)
+
+    def queued_tiles(self) -> int:
+        return len({(t.i, t.j) for t, _part in self.jobs})
+
+    def run(
+        self,
+        submit: Callable[[TileSpec, Optional[str]], Future],
+        collect: Callable[[TileSpec, object], None],
+        submit_cleanup: Optional[Callable[[TileSpec], Future]] = None,
+        release: Optional[Callable[[TileSpec], None]] = None,
+    ) -> None:
+        """Start jobs in cost order while the estimated peaks of running jobs fit the budget, backfilling
+        smaller jobs past one that does not fit; a job always starts when nothing else is running.
+
+        Cleanup jobs fill the remaining workers while fewer than ``queue_depth`` released tiles wait; each
+        tile their results complete goes to ``release``."""
+        cleanup = self.cleanup
+        running: Dict[Future, Tuple[Optional[TileSpec], int]] = {}
+        in_use = 0
+        while self.jobs or running or (cleanup is not None and cleanup.pending):
+            for job in list(self.jobs):
+                if len(running) >= self.workers:
+                    break
+                need = self.plan.memory(job)
+                if self.budget and running and in_use + need > self.budget:
+                    continue
+                self.jobs.remove(job)
+                running[submit(*job)] = (job[0], need)
+                in_use += need
+                self.peak = max(self.peak, in_use)
+            while cleanup is not None and cleanup.pending and len(running) < self.workers:
+                need = cleanup.memory(self.plan.memory_model, cleanup.pending[0])
+                if self.queued_tiles() >= self.queue_depth or (self.budget and running and in_use + need > self.budget):
+                    break
+                running[submit_cleanup(cleanup.pending.popleft())] = (None, need)  # type: ignore[misc]
+                in_use += need
+                self.peak = max(self.peak, in_use)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                t, need = running.pop(future)
+                in_use -= need
+                if t is None:
+                    self._cleaned(*future.result(), release)  # type: ignore[arg-type]
+                    self.max_queued = max(self.max_queued, self.queued_tiles())
+                else:
+                    collect(t, future.result())
+
+    def run_inline(
+        self,
+        export: Callable[[TileSpec], None],
+        cleanup_tile: Optional[Callable[[TileSpec], float]] = None,
+        release: Optional[Callable[[TileSpec], None]] = None,
+    ) -> None:
+        """Run every job on the calling thread, in tile order, cleaning the next tile once none are left."""
+        cleanup = self.cleanup
+        while True:
+            queued = {(t.i, t.j): t for t, _part in self.jobs}
+            self.jobs.clear()
+            for key in sorted(queued):
+                export(queued[key])
+            if cleanup is None or not cleanup.pending:
+                break
+            t = cleanup.pending.popleft()
+            self._cleaned((t.i, t.j), cleanup_tile(t), release)  # type: ignore[misc, arg-type]
+
+    def _cleaned(self, key: Tuple[int, int], speckle_rate: float, release: Callable[[TileSpec], None]) -> None:
+        for ready in self.cleanup.done(key, speckle_rate):
+            if self.first_release_s is None:
+                self.first_release_s = round(time.perf_counter() - self._t_start, 3)
+            release(ready)
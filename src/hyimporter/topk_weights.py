@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Slot marker for "no layer"; layer indices therefore stay below 255.
+EMPTY_SLOT = 255
+
+
+@dataclass
+class TopKWeights:
+    """Sparse splat weights: per pixel, k layer indices (uint8) and k quantized weights (uint8, 0..255).
+
+    Slots are ordered by descending weight. Mirrors wow.export's at-most-4-layers-per-chunk splats.
+    """
+
+    layers: List[str]
+    indices: np.ndarray
+    values: np.ndarray
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return int(self.indices.shape[0]), int(self.indices.shape[1])
+
+    @property
+    def k(self) -> int:
+        return int(self.indices.shape[2])
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.indices.nbytes + self.values.nbytes)
+
+    def plane(self, name: str) -> np.ndarray:
+        """Dense float32 [0, 1] weight plane for one layer (zero where it is not in the top k)."""
+        out = np.zeros(self.shape, dtype=np.float32)
+        if name not in self.layers:
+            return out
+        li = self.layers.index(name)
+        hit = self.indices == li
+        out[...] = np.sum(np.where(hit, self.values, 0), axis=-1, dtype=np.int32) / 255.0
+        return out
+
+    def to_dense(self) -> Dict[str, np.ndarray]:
+        return {name: self.plane(name) for name in self.layers}
+
+
+def empty_topk(layers: List[str], shape: Tuple[int, int], k: int = 4) -> TopKWeights:
+    if k <= 0:
+        raise ValueError("top-k weights need k >= 1")
+    h, w = int(shape[0]), int(shape[1])
+    return TopKWeights(
+        layers=list(layers),
+        indices=np.full((h, w, k), EMPTY_SLOT, dtype=np.uint8),
+        values=np.zeros((h, w, k), dtype=np.uint8),
+    )
+
+
+def quantize_weight(plane: np.ndarray) -> np.ndarray:
+    return np.rint(np.clip(np.asarray(plane, dtype=np.float32), 0.0, 1.0) * 255.0).astype(np.uint8)
+
+
+def fold_layer_rows(tk: TopKWeights, li: int, r0: int, rows: np.ndarray) -> None:
+    """Fold [0, 1] weights of layer index ``li`` for rows ``r0:r0 + len(rows)`` into the top-k slots."""
+    r1 = r0 + int(rows.shape[0])
+    q = quantize_weight(rows)
+    idx = np.concatenate([tk.indices[r0:r1], np.full(q.shape + (1,), li, dtype=np.uint8)], axis=-1)
+    val = np.concatenate([tk.values[r0:r1], q[..., None]], axis=-1)
+    # Stable sort keeps earlier layers first on equal weights.
+    order = np.argsort(-val.astype(np.int16), axis=-1, kind="stable")[..., : tk.k]
+    val = np.take_along_axis(val, order, axis=-1)
+    idx = np.take_along_axis(idx, order, axis=-1)
+    idx[val == 0] = EMPTY_SLOT
+    tk.indices[r0:r1] = idx
+    tk.values[r0:r1] = val
+
+
+def add_layer(tk: TopKWeights, name: str, plane: np.ndarray, chunk_rows: int = 512) -> None:
+    """Fold one [0, 1] layer plane into the top-k slots in place, row band by row band.
+
+    ``plane`` only needs a ``shape`` and row slicing, so lazy row views are read one band at a time.
+    """
+    if tuple(plane.shape) != tk.shape:
+        raise ValueError(f"Weight shape mismatch for {name}: {plane.shape} vs {tk.shape}")
+    if name not in tk.layers:
+        tk.layers.append(name)
+    li = tk.layers.index(name)
+    if li >= EMPTY_SLOT:
+        raise ValueError(f"Top-k weights support at most {EMPTY_SLOT} layers")
+
+    rows = max(1, int(chunk_rows))
+    for r0 in range(0, tk.shape[0], rows):
+        fold_layer_rows(tk, li, r0, np.asarray(plane[r0 : min(tk.shape[0], r0 + rows)]))
+
+
+def topk_from_dense(weights: Dict[str, np.ndarray], k: int = 4, chunk_rows: int = 512) -> TopKWeights:
+    layers = sorted(weights.keys())
+    if not layers:
+        return empty_topk([], (0, 0), k)
+    tk = empty_topk([], weights[layers[0]].shape, k)
+    for name in layers:
+        add_layer(tk, name, weights[name], chunk_rows=chunk_rows)
+    return tk
@@ -1,8 +1,14 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+# Suffix of in-progress output files; a killed writer leaves one of these, never a truncated target.
+TEMP_SUFFIX = ".partial"
 
 
 def ensure_dir(path: Path) -> Path:
@@ -10,9 +16,58 @@ def ensure_dir(path: Path) -> Path:
     return path
 
 
-def write_json(path: Path, payload: Dict[str, Any]) -> None:
+def _fsync_dir(directory: Path) -> None:
+    # Makes a rename durable on POSIX; Windows cannot open directories and flushes renames with the file.
+    if os.name == "nt":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """Yield a sibling temp path to write; it replaces ``path`` only if the block completes.
+
+    The temp file is fsynced before the rename (and the directory after it), so neither a killed process
+    nor a power loss leaves a truncated or empty ``path``.
+    """
     ensure_dir(path.parent)
-    with path.open("w", encoding="utf-8") as f:
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}{TEMP_SUFFIX}")
+    try:
+        yield tmp
+        with tmp.open("r+b") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        _fsync_dir(path.parent)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def temp_target_name(tmp: Path) -> str:
+    """Name of the file an :func:`atomic_path` temp file was going to replace."""
+    return tmp.name[1 : -len(TEMP_SUFFIX)].rsplit(".", 2)[0]
+
+
+def remove_stale_temp_files(directory: Path, owned: Optional[Callable[[str], bool]] = None) -> int:
+    """Delete temp files left behind by interrupted :func:`atomic_path` writers; returns the count.
+
+    ``owned`` limits the sweep to temp files whose target name it accepts, for directories other
+    writers (e.g. other shard hosts) may be writing to right now.
+    """
+    if not directory.exists():
+        return 0
+    stale = [p for p in directory.glob(f".*{TEMP_SUFFIX}") if owned is None or owned(temp_target_name(p))]
+    for p in stale:
+        p.unlink()
+    return len(stale)
+
+
+def write_json(path: Path, payload: Dict[str, Any]) -> None:
+    with atomic_path(path) as tmp, tmp.open("w", encoding="utf-8") as f:
         json.dump(payload, f, indent=2, sort_keys=True)
 
 
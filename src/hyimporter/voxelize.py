@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .utils import atomic_path
+
+
+def parse_obj(path: Path) -> tuple[np.ndarray, List[List[int]]]:
+    verts: List[Tuple[float, float, float]] = []
+    faces: List[List[int]] = []
+
+    for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
+        if line.startswith("v "):
+            parts = line.split()
+            if len(parts) >= 4:
+                verts.append((float(parts[1]), float(parts[2]), float(parts[3])))
+        elif line.startswith("f "):
+            idxs: List[int] = []
+            for token in line.split()[1:]:
+                raw = token.split("/")[0]
+                if raw:
+                    idxs.append(int(raw) - 1)
+            if len(idxs) >= 3:
+                faces.append(idxs)
+
+    if not verts:
+        raise ValueError(f"No vertices in OBJ: {path}")
+
+    return np.asarray(verts, dtype=np.float32), faces
+
+
+def _face_edges(faces: Sequence[Sequence[int]]) -> np.ndarray:
+    """(E, 2) vertex index pairs for every polygon edge, closing each face."""
+    pairs: List[Tuple[int, int]] = []
+    for f in faces:
+        for i in range(len(f)):
+            pairs.append((f[i], f[(i + 1) % len(f)]))
+    return np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+
+def _sample_edges(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    # Integer-length edge sampling for deterministic wireframe voxels; t matches np.linspace per edge.
+    n = np.maximum(1.0, np.max(np.abs(b - a), axis=1)).astype(np.int64)
+    edge = np.repeat(np.arange(a.shape[0]), n + 1)
+    starts = np.cumsum(n + 1) - (n + 1)
+    k = np.arange(edge.size) - np.repeat(starts, n + 1)
+    t = k * (1.0 / n[edge])
+    t[k == n[edge]] = 1.0
+    t = t.astype(np.float32)[:, None]
+    p = (a[edge] * (np.float32(1.0) - t)) + (b[edge] * t)
+    return np.rint(p).astype(np.int32)
+
+
+def occupancy_from_mesh(verts: np.ndarray, faces: Sequence[Sequence[int]], padding: int) -> np.ndarray:
+    """Unique (N, 3) int32 voxels hit by the mesh vertices and edges, shifted so the minimum sits at ``padding``."""
+    verts = np.asarray(verts, dtype=np.float32)
+    vmin = np.min(verts, axis=0)
+    shifted = verts - vmin[None, :] + float(padding)
+    pts = [np.rint(shifted).astype(np.int32)]
+    edges = _face_edges(faces)
+    if edges.size:
+        pts.append(_sample_edges(shifted[edges[:, 0]], shifted[edges[:, 1]]))
+    return np.unique(np.concatenate(pts, axis=0), axis=0)
+
+
+def mesh_origin_voxel(verts: np.ndarray, padding: int) -> np.ndarray:
+    """Voxel coordinate of the model-space origin after :func:`occupancy_from_mesh`'s shift."""
+    vmin = np.min(np.asarray(verts, dtype=np.float32), axis=0)
+    return np.rint(-vmin + float(padding)).astype(np.int32)
+
+
+def to_block_arrays(points: np.ndarray, block_id: int) -> tuple[int, int, int, np.ndarray, np.ndarray]:
+    """MCEdit Blocks/Data arrays (x + z*W + y*W*L order) with every occupied voxel set to ``block_id``."""
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 3)
+    if points.shape[0] == 0:
+        raise ValueError("No occupied voxels to export")
+
+    width, height, length = (int(v) + 1 for v in points.max(axis=0))
+    blocks = np.zeros(width * height * length, dtype=np.uint8)
+    data = np.zeros_like(blocks)
+    inside = np.all(points >= 0, axis=1)
+    p = points[inside]
+    blocks[p[:, 0] + p[:, 2] * width + p[:, 1] * width * length] = int(max(0, min(255, block_id)))
+    return width, height, length, blocks, data
+
+
+def write_bo2_points(path: Path, points: np.ndarray, block_id: int, author: str = "hyimporter") -> None:
+    lines = [
+        "[META]",
+        f"author={author}",
+        "spawnOnBlockType=2",
+        "collisionPercentage=0",
+        "needsFoundation=false",
+        "randomRotation=false",
+        "doReplaceBlocks=true",
+        "",
+        "[DATA]",
+    ]
+    bid = int(max(0, min(255, block_id)))
+    points = np.asarray(points).reshape(-1, 3)
+    order = np.lexsort((points[:, 2], points[:, 1], points[:, 0]))
+    for x, y, z in points[order]:
+        lines.append(f"{int(x)},{int(y)},{int(z)},{bid}")
+    with atomic_path(path) as tmp:
+        tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def transform_vertices(
+    verts: np.ndarray,
+    rotation_deg: Optional[Sequence[float]] = None,
+    scale: float = 1.0,
+) -> np.ndarray:
+    """Scale then rotate (intrinsic XYZ Euler degrees) model-space vertices."""
+    out = np.asarray(verts, dtype=np.float64) * float(scale)
+    if rotation_deg is not None and any(float(a) != 0.0 for a in rotation_deg):
+        from scipy.spatial.transform import Rotation
+
+        out = Rotation.from_euler("XYZ", [float(a) for a in rotation_deg], degrees=True).apply(out)
+    return out.astype(np.float32)
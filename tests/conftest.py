@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Callable
+
+import imageio.v3 as iio
+import numpy as np
+import pytest
+
+from hyimporter.config import PipelineConfig
+
+TEST_MAP = "test_map"
+
+
+def _write_test_height(height_dir: Path) -> None:
+    height_dir.mkdir(parents=True, exist_ok=True)
+    x = np.linspace(0.0, 1.0, 200)[:, None]
+    z = np.linspace(0.0, 1.0, 180)[None, :]
+    iio.imwrite(height_dir / "height.png", ((np.sin(5 * x) * np.cos(4 * z) * 0.5 + 0.5) * 60000).astype(np.uint16))
+
+
+@pytest.fixture
+def map_cfg(tmp_path: Path) -> Callable[[str], PipelineConfig]:
+    """Config factory for full builds of a small 200x180 test map (12 tiles of 64, schematics only).
+
+    Every call shares the input map under ``tmp_path/input`` and writes to its own ``tmp_path/<out>``.
+    """
+    _write_test_height(tmp_path / "input" / TEST_MAP / "height")
+
+    def make(out: str = "out") -> PipelineConfig:
+        cfg = PipelineConfig()
+        cfg.project.map_name = TEST_MAP
+        cfg.paths.input_root = str(tmp_path / "input")
+        cfg.paths.output_root = str(tmp_path / out)
+        cfg.tiling.tile_size = 64
+        cfg.tiling.overlap = 8
+        cfg.outputs.export_obj = False
+        cfg.qa.write_plots = False
+        cfg.runtime.tile_workers = 1
+        return cfg
+
+    return make
+
+
+@pytest.fixture
+def export_cfg() -> PipelineConfig:
+    """Config for driving ``_export_tiles`` directly: every tile output format and mesh export off."""
+    cfg = PipelineConfig()
+    cfg.outputs.export_obj = False
+    cfg.outputs.export_schematic = False
+    cfg.outputs.export_bo2 = False
+    cfg.mesh.export_base = False
+    cfg.mesh.export_shells = False
+    return cfg
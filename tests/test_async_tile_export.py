@@ -1,21 +1,12 @@
+import gzip
+
 import numpy as np
 
-from hyimporter.config import PipelineConfig
 from hyimporter.export import _export_tiles
 
 
-def _minimal_test_config() -> PipelineConfig:
-    cfg = PipelineConfig()
-    cfg.outputs.export_obj = False
-    cfg.outputs.export_schematic = False
-    cfg.outputs.export_bo2 = False
-    cfg.mesh.export_base = False
-    cfg.mesh.export_shells = False
-    return cfg
-
-
-def test_async_tile_export_matches_sync(tmp_path):
-    cfg = _minimal_test_config()
+def test_async_tile_export_matches_sync(tmp_path, export_cfg):
+    cfg = export_cfg
 
     y = (np.arange(1030 * 1030, dtype=np.int32).reshape(1030, 1030) % 320).astype(np.int16)
     labels = np.zeros_like(y, dtype=np.int16)
@@ -39,8 +30,8 @@ def test_async_tile_export_matches_sync(tmp_path):
         np.testing.assert_array_equal(grids_async[key], grids_sync[key])
 
 
-def test_async_tile_manifest_order_is_stable(tmp_path):
-    cfg = _minimal_test_config()
+def test_async_tile_manifest_order_is_stable(tmp_path, export_cfg):
+    cfg = export_cfg
     cfg.runtime.async_tile_export = True
     cfg.runtime.tile_workers = 8
 
@@ -53,3 +44,62 @@ def test_async_tile_manifest_order_is_stable(tmp_path):
     rows, _grids = _export_tiles(cfg, y, labels, out_dir, warnings=[])
     tile_keys = [(int(r["tile_i"]), int(r["tile_j"])) for r in rows]
     assert tile_keys == sorted(tile_keys)
+
+
+def test_process_and_thread_executors_write_identical_tiles(tmp_path, export_cfg):
+    cfg = export_cfg
+    cfg.outputs.export_schematic = True
+    cfg.runtime.async_tile_export = True
+    cfg.runtime.tile_workers = 3
+
+    y = (np.arange(520 * 530, dtype=np.int32).reshape(520, 530) % 320).astype(np.int16)
+    labels = (np.arange(y.size, dtype=np.int32).reshape(y.shape) % 3).astype(np.int16)
+
+    outputs = {}
+    for executor in ("thread", "process"):
+        cfg.runtime.tile_executor = executor
+        out_dir = tmp_path / executor
+        rows, grids = _export_tiles(cfg, y, labels, out_dir, warnings=[])
+        metas = {p.name: p.read_text(encoding="utf-8") for p in sorted(out_dir.glob("*.meta.json"))}
+        outputs[executor] = ([(r["tile_i"], r["tile_j"], r["x0"], r["z0"]) for r in rows], grids, metas)
+
+    assert outputs["process"][0] == outputs["thread"][0]
+    assert outputs["process"][2] == outputs["thread"][2]
+    for key, grid in outputs["thread"][1].items():
+        np.testing.assert_array_equal(outputs["process"][1][key], grid)
+
+
+def test_few_tiles_split_into_exporter_jobs(tmp_path, export_cfg):
+    cfg = export_cfg
+    cfg.outputs.export_obj = True
+    cfg.outputs.export_schematic = True
+    cfg.outputs.export_bo2 = True
+    cfg.mesh.export_base = True
+    cfg.mesh.export_shells = True
+    cfg.materials.layers = ["grass", "rock", "sand"]
+
+    y = ((np.arange(300 * 300, dtype=np.int32).reshape(300, 300) // 300) % 40 + 10).astype(np.int16)
+    labels = (np.arange(y.size, dtype=np.int32).reshape(y.shape) // 7000 % 2).astype(np.int16)
+
+    outputs = {}
+    for mode, workers in (("sync", 1), ("split", 4)):
+        cfg.runtime.async_tile_export = workers > 1
+        cfg.runtime.tile_workers = workers
+        cfg.runtime.tile_executor = "thread"
+        out_dir = tmp_path / mode
+        stats = {}
+        rows, grids = _export_tiles(cfg, y, labels, out_dir, [], export_stats=stats)
+        # Schematics are compared decompressed: the gzip header carries the write time.
+        files = {
+            p.name: gzip.decompress(p.read_bytes()) if p.suffix == ".schematic" else p.read_bytes()
+            for p in sorted(out_dir.iterdir())
+        }
+        outputs[mode] = ([(r["tile_i"], r["tile_j"], r["tile_obj"] != "") for r in rows], grids, files, stats)
+
+    # One tile: grid/base OBJ, two present layers' shells, schematic and BO2.
+    assert outputs["split"][3]["part_jobs"] == 5
+    assert "part_jobs" not in outputs["sync"][3]
+    assert outputs["split"][0] == outputs["sync"][0]
+    assert outputs["split"][2] == outputs["sync"][2]
+    assert "tile_0_0__rock.obj" in outputs["split"][2] and "tile_0_0__sand.obj" not in outputs["split"][2]
+    np.testing.assert_array_equal(outputs["split"][1][(0, 0)], outputs["sync"][1][(0, 0)])
@@ -1,6 +1,6 @@
 import numpy as np
 
-from hyimporter.height_fit import fit_height_to_budget
+from hyimporter.height_fit import HeightHistogram, fit_height_to_budget, height_fit_lut
 
 
 def test_height_fit_range_and_shape():
@@ -27,3 +27,46 @@ def test_height_fit_monotonicity():
     src = np.array([[0.0, 10.0, 20.0, 30.0]], dtype=np.float32)
     y, _ = fit_height_to_budget(src, p_low=0.0, p_high=100.0)
     assert y[0, 0] <= y[0, 1] <= y[0, 2] <= y[0, 3]
+
+
+def test_height_fit_histogram_path_matches_float_path():
+    rng = np.random.default_rng(2)
+    raw = rng.integers(0, 65536, size=(97, 131)).astype(np.uint16)
+    raw[:20] = 40000
+
+    y_lut, stats_lut = fit_height_to_budget(raw, p_low=2.5, p_high=97.5, gamma=0.7)
+    h = raw.astype(np.float32)
+    assert stats_lut["h_min_percentile"] == float(np.percentile(h, 2.5))
+    assert stats_lut["h_max_percentile"] == float(np.percentile(h, 97.5))
+    assert y_lut.dtype == np.int16
+
+    hist = HeightHistogram.from_array(raw)
+    lut, stats_refit = height_fit_lut(hist, p_low=2.5, p_high=97.5, gamma=0.7)
+    np.testing.assert_array_equal(lut[raw], y_lut)
+    assert stats_refit == stats_lut
+    assert int(y_lut.min()) == stats_lut["y_min"] and int(y_lut.max()) == stats_lut["y_max"]
+
+
+def test_preview_with_target_resolution_fits_the_source_histogram(tmp_path):
+    import imageio.v3 as iio
+
+    from hyimporter.config import PipelineConfig
+    from hyimporter.export import preview_height_fit
+    from hyimporter.resample import resample_height
+
+    yy, xx = np.mgrid[0:120, 0:120]
+    raw = ((np.sin(xx / 11.0) + np.cos(yy / 8.0) + 2.0) * 15000.0).astype(np.uint16)
+    (tmp_path / "input" / "fit_map" / "height").mkdir(parents=True)
+    iio.imwrite(tmp_path / "input" / "fit_map" / "height" / "height.png", raw)
+    cfg = PipelineConfig()
+    cfg.project.map_name = "fit_map"
+    cfg.paths.input_root = str(tmp_path / "input")
+    cfg.paths.output_root = str(tmp_path / "out")
+    cfg.resample.target_resolution = 96
+
+    first = preview_height_fit(cfg)
+    again = preview_height_fit(cfg)
+    assert first["resampled_approximation"] and not first["histogram_cache_hit"] and again["histogram_cache_hit"]
+    _y, exact = fit_height_to_budget(resample_height(raw, (96, 96)))
+    for k in ("h_min_percentile", "h_max_percentile"):
+        assert abs(first["height_fit"][k] - exact[k]) < 0.02 * 65535
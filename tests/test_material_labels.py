@@ -0,0 +1,57 @@
+import numpy as np
+
+from hyimporter.materials import assign_material_labels
+
+LAYERS = ["grass", "dirt", "rock", "sand", "snow", "mud", "gravel"]
+
+
+def _inputs(h: int = 61, w: int = 47):
+    rng = np.random.default_rng(5)
+    y = rng.integers(60, 260, size=(h, w)).astype(np.int16)
+    slope = rng.random((h, w)).astype(np.float32) * 3.0
+    weights = {name: rng.random((h, w)).astype(np.float32) for name in ("grass", "dirt", "gravel")}
+    weights["grass"][:10] = 0.0
+    weights["dirt"][:10] = 0.0
+    weights["gravel"][:10] = 0.0
+    masks = {"river": rng.random((h, w)) < 0.05}
+    return y, slope, weights, masks
+
+
+def _classify(y, slope, weights, masks, chunk_rows):
+    return assign_material_labels(
+        y_int=y,
+        slope=slope,
+        weights=weights,
+        masks=masks,
+        layer_names=LAYERS,
+        default_layer="dirt",
+        sea_level_y=96,
+        snowline_y=220,
+        beach_band_dy=6,
+        cliff_slope_high=2.8,
+        cliff_slope_low=2.6,
+        chunk_rows=chunk_rows,
+    )
+
+
+def test_chunked_classification_matches_single_band():
+    y, slope, weights, masks = _inputs()
+    full, masks_full, _ = _classify(y, slope, weights, masks, chunk_rows=10_000)
+    for chunk_rows in (1, 7, 32):
+        chunked, masks_chunked, _ = _classify(y, slope, weights, masks, chunk_rows=chunk_rows)
+        np.testing.assert_array_equal(chunked, full)
+        for k in masks_full:
+            np.testing.assert_array_equal(masks_chunked[k], masks_full[k])
+    assert full.dtype == np.int16
+
+
+def test_classification_overrides_and_default_layer():
+    y, slope, weights, masks = _inputs()
+    labels, out_masks, _ = _classify(y, slope, weights, masks, chunk_rows=8)
+    plain = ~out_masks["cliff"] & ~out_masks["snow"] & ~out_masks["beach"] & ~masks["river"]
+
+    assert np.all(labels[out_masks["cliff"]] == LAYERS.index("rock"))
+    assert np.all(labels[out_masks["snow"] & ~out_masks["cliff"]] == LAYERS.index("snow"))
+    assert np.all(labels[:10][plain[:10]] == LAYERS.index("dirt"))
+    stack = np.stack([weights.get(n, np.zeros_like(slope)) for n in LAYERS], axis=-1)
+    np.testing.assert_array_equal(labels[10:][plain[10:]], np.argmax(stack[10:], axis=-1)[plain[10:]])
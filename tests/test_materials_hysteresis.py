@@ -0,0 +1,29 @@
+import numpy as np
+from skimage.filters import apply_hysteresis_threshold
+
+from hyimporter.materials import _hysteresis_mask
+
+
+def _slope_field(h: int = 257, w: int = 193) -> np.ndarray:
+    rng = np.random.default_rng(11)
+    slope = rng.random((h, w)).astype(np.float32) * 2.0
+    # Long diagonal cliff band crossing many row chunks.
+    for x in range(h):
+        z = (x * w) // h
+        slope[x, max(0, z - 2) : z + 3] = 1.9
+    slope[h - 3, (w * (h - 3)) // h] = 3.0
+    return slope
+
+
+def test_hysteresis_matches_skimage():
+    slope = _slope_field()
+    expected = apply_hysteresis_threshold(slope, 1.6, 2.2)
+    np.testing.assert_array_equal(_hysteresis_mask(slope, 2.2, 1.6), expected)
+
+
+def test_hysteresis_chunked_matches_single_pass():
+    slope = _slope_field()
+    full = _hysteresis_mask(slope, 2.2, 1.6)
+    assert np.any(full[:8])  # band seeded near the bottom reaches the top rows
+    for chunk_rows in (1, 7, 64):
+        np.testing.assert_array_equal(_hysteresis_mask(slope, 2.2, 1.6, chunk_rows=chunk_rows), full)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import numpy as np
+
+import hyimporter.export as export
+from hyimporter.config import PipelineConfig
+from hyimporter.tile_cleanup import CleanupStream
+
+
+def _budgeted(cfg: PipelineConfig, budget_mb: int) -> PipelineConfig:
+    cfg.runtime.tile_executor = "thread"
+    cfg.runtime.tile_workers = 4
+    cfg.runtime.memory_budget_mb = budget_mb
+    return cfg
+
+
+def test_budget_admits_one_full_tile_at_a_time_and_reports_peak(tmp_path, monkeypatch, export_cfg):
+    # Two full 512x512 tiles (~200 MB estimated each) and four thin edge tiles.
+    y = (np.arange(1030 * 520, dtype=np.int32).reshape(1030, 520) % 50).astype(np.int16)
+    labels = np.zeros_like(y)
+    lock = threading.Lock()
+    running = {"full": 0, "max_full": 0, "max_all": 0, "all": 0}
+    real = export._export_single_tile
+
+    def tracked(cfg, t, *args, **kwargs):
+        full = (t.x1 - t.x0) * (t.z1 - t.z0) == 512 * 512
+        with lock:
+            running["all"] += 1
+            running["full"] += int(full)
+            running["max_full"] = max(running["max_full"], running["full"])
+            running["max_all"] = max(running["max_all"], running["all"])
+        time.sleep(0.2)
+        try:
+            return real(cfg, t, *args, **kwargs)
+        finally:
+            with lock:
+                running["all"] -= 1
+                running["full"] -= int(full)
+
+    monkeypatch.setattr(export, "_export_single_tile", tracked)
+    stats = {}
+    export._export_tiles(_budgeted(export_cfg, 300), y, labels, tmp_path / "tiles", [], export_stats=stats)
+
+    assert running["max_full"] == 1
+    # Small edge tiles still backfill next to the running full tile.
+    assert running["max_all"] > 1
+    mem = stats["memory"]
+    assert mem["budget_mb"] == 300 and mem["estimated_peak_mb"] <= 300
+    assert mem["observed_peak_mb"] is None or mem["observed_peak_mb"] >= mem["baseline_mb"]
+
+
+def test_streamed_cleanup_caps_workers_from_planned_tiles(tmp_path, export_cfg):
+    # Four full tiles: ~6 MB estimated to clean each, far more to export.
+    y = (np.arange(1024 * 1024, dtype=np.int32).reshape(1024, 1024) % 50).astype(np.int16)
+    labels = np.zeros_like(y)
+    cfg = _budgeted(export_cfg, 10)
+    cfg.tiling.overlap = 0
+    stats = {}
+    cleanup = CleanupStream(cfg, y.shape)
+    export._export_tiles(cfg, y, labels, tmp_path / "tiles", [], export_stats=stats, cleanup=cleanup)
+
+    # No tile is released when the cap is decided, yet the budget fits only one job at a time.
+    mem = stats["memory"]
+    assert mem["workers"] == 1
+    assert mem["estimated_peak_mb"] > 100
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import imageio.v3 as iio
+import numpy as np
+
+from hyimporter.io_images import load_height_image, load_weight_maps_topk
+from hyimporter.rasters import MosaicRaster, find_raster, open_raster
+
+
+def _write_mosaic(tile_dir, full, tile=32, skip=()):
+    tile_dir.mkdir(parents=True)
+    lines = ["row,col,file"]
+    for r in range(full.shape[0] // tile):
+        for c in range(full.shape[1] // tile):
+            if (r, c) in skip:
+                continue
+            name = f"map_{c + 30}_{r + 40}.png"
+            iio.imwrite(tile_dir / name, full[r * tile : (r + 1) * tile, c * tile : (c + 1) * tile])
+            lines.append(f"{r + 40},{c + 30},{name}")
+    (tile_dir / "index.csv").write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def test_mosaic_windows_decode_only_touched_tiles(tmp_path):
+    rng = np.random.default_rng(5)
+    full = rng.integers(0, 65535, (64, 96)).astype(np.uint16)
+    _write_mosaic(tmp_path / "height" / "tiles", full, skip={(1, 2)})
+    expected = full.copy()
+    expected[32:64, 64:96] = 0
+
+    path = find_raster(tmp_path / "height", "height")
+    m = open_raster(path)
+    assert isinstance(m, MosaicRaster)
+    assert m.shape == (64, 96)
+    assert m.dtype == np.uint16
+
+    np.testing.assert_array_equal(m[0:20, 0:20], expected[0:20, 0:20])
+    assert m.decoded == 1
+    np.testing.assert_array_equal(m[10:50, 20:70], expected[10:50, 20:70])
+    assert m.decoded == 5
+
+    small = MosaicRaster.from_index(path, cache_tiles=2)
+    np.testing.assert_array_equal(np.asarray(small), expected)
+    np.testing.assert_array_equal(small[0:8, 0:8], expected[0:8, 0:8])
+    assert small.decoded == 6
+
+    height, meta = load_height_image(path)
+    assert meta["shape"] == [64, 96]
+    np.testing.assert_array_equal(np.asarray(height), expected)
+
+
+def test_per_layer_weight_mosaics(tmp_path):
+    rng = np.random.default_rng(6)
+    grass = rng.integers(0, 256, (64, 64)).astype(np.uint8)
+    _write_mosaic(tmp_path / "weights" / "grass", grass)
+    iio.imwrite(tmp_path / "weights" / "rock.png", (255 - grass).astype(np.uint8))
+
+    tk = load_weight_maps_topk(tmp_path / "weights", k=2)
+    assert tk.layers == ["grass", "rock"]
+    np.testing.assert_allclose(tk.plane("grass"), grass / 255.0, atol=1e-6)
+
+
+def test_missing_mosaic_cells_are_left_out_of_the_height_fit(tmp_path, capsys):
+    from hyimporter.height_fit import fit_height_to_budget
+    from hyimporter.io_images import height_nodata_mask
+
+    rng = np.random.default_rng(7)
+    full = rng.integers(20000, 40000, (64, 96)).astype(np.uint16)
+    _write_mosaic(tmp_path / "height" / "tiles", full, skip={(1, 2)})
+
+    height, meta = load_height_image(find_raster(tmp_path / "height", "height"))
+    assert meta["missing_tiles"] == 1
+    assert "1 mosaic cell(s) missing" in capsys.readouterr().out
+    nodata = height_nodata_mask(height)
+    assert nodata.sum() == 32 * 32 and nodata[32:, 64:].all()
+
+    height = np.asarray(height)
+    _y, skewed = fit_height_to_budget(height, p_low=1.0)
+    y, stats = fit_height_to_budget(height, p_low=1.0, valid=~nodata)
+    _y_ref, ref = fit_height_to_budget(full[~nodata].reshape(-1, 64), p_low=1.0)
+    assert skewed["h_min_percentile"] == 0.0
+    assert stats["h_min_percentile"] == ref["h_min_percentile"] >= 20000
+    assert int(y[~nodata].min()) == stats["y_min"]
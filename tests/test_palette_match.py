@@ -0,0 +1,106 @@
+import numpy as np
+from skimage import color
+
+from hyimporter.materials import DEFAULT_LAYER_RGB, PALETTE_LUT_BITS, _pick_by_palette_lab
+
+LAYERS = ["grass", "dirt", "rock", "sand", "snow", "mud", "gravel"]
+
+
+def _brute_force_labels(colormap, cliff, snow, beach):
+    layer_lab = {n: color.rgb2lab(np.array(DEFAULT_LAYER_RGB[n])[None, None, :])[0, 0] for n in LAYERS}
+    img_lab = color.rgb2lab(colormap)
+    labels = np.zeros(colormap.shape[:2], dtype=np.int16)
+
+    def choose(mask, allowed):
+        idx = np.array([LAYERS.index(n) for n in allowed])
+        de = color.deltaE_ciede2000(img_lab[..., None, :], np.stack([layer_lab[n] for n in allowed])[None, None])
+        labels[mask] = idx[np.argmin(de, axis=-1)[mask]]
+
+    choose(cliff, ["rock", "snow"])
+    choose(snow & ~cliff, ["snow", "rock"])
+    choose(beach & ~cliff & ~snow, ["sand", "mud", "gravel"])
+    choose(~cliff & ~snow & ~beach, LAYERS)
+    de_all = color.deltaE_ciede2000(img_lab, np.stack([layer_lab[LAYERS[i]] for i in labels.ravel()]).reshape(img_lab.shape))
+    return labels, de_all
+
+
+def test_palette_lut_matches_brute_force_on_grid_colours():
+    rng = np.random.default_rng(3)
+    levels = (1 << PALETTE_LUT_BITS) - 1
+    colormap = rng.integers(0, levels + 1, size=(64, 48, 3)) / float(levels)
+    cliff = rng.random((64, 48)) < 0.2
+    snow = rng.random((64, 48)) < 0.2
+    beach = rng.random((64, 48)) < 0.2
+
+    labels, stats = _pick_by_palette_lab(np.zeros((64, 48), dtype=np.int16), colormap, LAYERS, cliff, snow, beach)
+    expected, de_all = _brute_force_labels(colormap, cliff, snow, beach)
+
+    np.testing.assert_array_equal(labels, expected)
+    np.testing.assert_allclose(stats["deltaE_mean"], np.mean(de_all), rtol=1e-5)
+    np.testing.assert_allclose(stats["deltaE_p95"], np.percentile(de_all, 95), rtol=1e-5)
+    np.testing.assert_allclose(stats["deltaE_max"], np.max(de_all), rtol=1e-5)
+
+
+def test_palette_dither_mixes_layers_and_is_seam_safe():
+    shape = (40, 56)
+    ramp = np.linspace(0.0, 1.0, shape[1])[None, :, None]
+    grass = np.array(DEFAULT_LAYER_RGB["grass"])
+    rock = np.array(DEFAULT_LAYER_RGB["rock"])
+    colormap = np.broadcast_to(grass * (1.0 - ramp) + rock * ramp, shape + (3,)).copy()
+    off = np.zeros(shape, dtype=bool)
+    base = np.zeros(shape, dtype=np.int16)
+
+    plain, _ = _pick_by_palette_lab(base, colormap, LAYERS, off, off, off)
+    dithered, _ = _pick_by_palette_lab(base, colormap, LAYERS, off, off, off, dither=True)
+    assert all(len(np.unique(plain[:, j])) == 1 for j in range(shape[1]))
+    assert any(len(np.unique(dithered[:, j])) == 2 for j in range(shape[1]))
+    assert np.all(dithered[:, 0] == LAYERS.index("grass"))
+    assert np.all(dithered[:, -1] == LAYERS.index("rock"))
+
+    # A window evaluated on its own with a world origin reproduces the global result.
+    x0, z0 = 13, 21
+    window, _ = _pick_by_palette_lab(
+        base[x0:, z0:], colormap[x0:, z0:], LAYERS, off[x0:, z0:], off[x0:, z0:], off[x0:, z0:],
+        dither=True, origin=(x0, z0),
+    )
+    np.testing.assert_array_equal(window, dithered[x0:, z0:])
+
+
+def test_palette_dither_survives_label_cleanup(tmp_path):
+    import imageio.v3 as iio
+
+    from hyimporter.config import PipelineConfig, map_output_dir
+    from hyimporter.export import run_pipeline
+
+    shape = (96, 128)
+    in_dir = tmp_path / "input" / "dither_map"
+    (in_dir / "height").mkdir(parents=True)
+    (in_dir / "color").mkdir()
+    iio.imwrite(in_dir / "height" / "height.png", np.full(shape, 30000, dtype=np.uint16))
+    ramp = np.linspace(0.0, 1.0, shape[1])[None, :, None]
+    grass = np.array(DEFAULT_LAYER_RGB["grass"])
+    rock = np.array(DEFAULT_LAYER_RGB["rock"])
+    colormap = np.broadcast_to(grass * (1.0 - ramp) + rock * ramp, shape + (3,))
+    iio.imwrite(in_dir / "color" / "colormap.png", np.round(colormap * 255).astype(np.uint8))
+
+    cfg = PipelineConfig()
+    cfg.project.map_name = "dither_map"
+    cfg.paths.input_root = str(tmp_path / "input")
+    cfg.paths.output_root = str(tmp_path / "out")
+    cfg.tiling.tile_size = 64
+    cfg.tiling.overlap = 8
+    cfg.outputs.export_obj = False
+    cfg.qa.write_plots = False
+    cfg.materials.palette_match.enabled = True
+    cfg.materials.palette_match.dither = True
+    for stream in (False, True):
+        cfg.runtime.stream_cleanup = stream
+        cfg.paths.output_root = str(tmp_path / f"out_{stream}")
+        run_pipeline(cfg)
+        (cleaned,) = (map_output_dir(cfg) / "cache" / "stages").glob("cleanup-*.npz")
+        labels = np.load(cleaned)["labels"]
+        # Cleanup alone would flatten the transition back into solid bands; the dither laid on afterwards
+        # keeps mixed columns across it.
+        mixed = sum(len(np.unique(labels[:, j])) > 1 for j in range(shape[1]))
+        assert mixed >= shape[1] // 4
+        assert np.all(labels[:, 0] == LAYERS.index("grass")) and np.all(labels[:, -1] == LAYERS.index("rock"))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+import imageio.v3 as iio
+import numpy as np
+
+from hyimporter.io_images import load_masks, load_weight_maps, load_weight_maps_topk
+
+
+def _write_inputs(root):
+    rng = np.random.default_rng(11)
+    (root / "weights").mkdir()
+    (root / "masks").mkdir()
+    for name in ("dirt", "grass", "rock", "sand", "snow"):
+        iio.imwrite(root / "weights" / f"{name}.png", rng.integers(0, 256, (48, 40)).astype(np.uint8))
+    for name in ("river", "road"):
+        iio.imwrite(root / "masks" / f"{name}.png", (rng.random((48, 40)) < 0.2).astype(np.uint8) * 255)
+
+
+def test_pooled_decode_matches_serial_and_records_timings(tmp_path):
+    _write_inputs(tmp_path)
+
+    dense_ref = load_weight_maps(tmp_path / "weights")
+    tk_ref = load_weight_maps_topk(tmp_path / "weights", k=3)
+    masks_ref = load_masks(tmp_path / "masks")
+
+    timings = {}
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        dense = load_weight_maps(tmp_path / "weights", pool=pool, timings=timings)
+        tk = load_weight_maps_topk(tmp_path / "weights", k=3, pool=pool, prefetch=1)
+        masks = load_masks(tmp_path / "masks", pool=pool, timings=timings)
+
+    assert list(dense) == list(dense_ref)
+    for name in dense_ref:
+        np.testing.assert_array_equal(dense[name], dense_ref[name])
+    assert tk.layers == tk_ref.layers
+    np.testing.assert_array_equal(tk.indices, tk_ref.indices)
+    np.testing.assert_array_equal(tk.values, tk_ref.values)
+    for name in masks_ref:
+        np.testing.assert_array_equal(masks[name], masks_ref[name])
+
+    assert set(timings) == {f"weights/{n}.png" for n in dense_ref} | {f"masks/{n}.png" for n in masks_ref}
+    assert all(v >= 0.0 for v in timings.values())
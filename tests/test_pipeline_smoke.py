@@ -5,6 +5,7 @@ from pathlib import Path
 
 import imageio.v3 as iio
 import numpy as np
+import pytest
 
 from hyimporter.config import PipelineConfig
 from hyimporter.export import run_pipeline
@@ -89,3 +90,18 @@ def test_pipeline_smoke_sync_vs_async(tmp_path: Path):
     rows_sync = _load_manifest_rows(manifest_sync)
     rows_async = _load_manifest_rows(manifest_async)
     assert _tile_index_projection(rows_sync) == _tile_index_projection(rows_async)
+
+
+def test_failing_qa_assert_still_writes_plots(tmp_path: Path):
+    input_root = tmp_path / "input"
+    (input_root / "smoke_map" / "height").mkdir(parents=True, exist_ok=True)
+    _write_height_16bit(input_root / "smoke_map" / "height" / "height.png", 96, 96)
+
+    cfg = _build_cfg(input_root=input_root, output_root=tmp_path / "out", async_tiles=False)
+    cfg.runtime.tile_workers = 1
+    cfg.qa.write_plots = True
+    cfg.qa.assert_height_range = (0, 10)
+    with pytest.raises(AssertionError, match="Height out of range"):
+        run_pipeline(cfg)
+    qa_dir = tmp_path / "out" / "smoke_map" / "qa"
+    assert (qa_dir / "height_hist.png").exists() and (qa_dir / "seam_diff_heatmap.png").exists()
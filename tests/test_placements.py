@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+
+import numpy as np
+
+from hyimporter.placements import (
+    KIND_M2,
+    KIND_WMO,
+    PlacementIndex,
+    iter_json_placements,
+    load_placement_table,
+)
+
+
+def _rows(n: int):
+    rng = np.random.default_rng(2)
+    out = []
+    for k in range(n):
+        out.append(
+            {
+                "type": "wmo" if k % 3 == 0 else "m2",
+                "model": f"world/model_{k % 4}.m2",
+                "position": [float(rng.uniform(0, 1000)), 12.5, float(rng.uniform(0, 600))],
+                "rotation": [0.0, float(k), 0.0],
+                "scale": 1.25,
+            }
+        )
+    return out
+
+
+def test_streaming_json_matches_whole_file_parse(tmp_path):
+    rows = _rows(200)
+    path = tmp_path / "big.json"
+    path.write_text(json.dumps({"meta": {"v": [1, 2, 3]}, "objects": rows}, indent=1), encoding="utf-8")
+
+    streamed = [r for r, _kind in iter_json_placements(path, chunk_size=7)]
+    assert streamed == rows
+
+
+def test_large_json_value_is_decoded_in_few_passes(tmp_path):
+    from hyimporter.placements import _JsonStream
+
+    big = {"model": "castle.wmo", "tags": list(range(20000))}
+    path = tmp_path / "one.json"
+    path.write_text(json.dumps([big]), encoding="utf-8")
+
+    s = _JsonStream(path, chunk_size=64)
+    calls = []
+    decode = s.decoder.raw_decode
+    s.decoder.raw_decode = lambda buf, pos: (calls.append(len(buf)), decode(buf, pos))[1]
+    try:
+        assert list(s.array_items()) == [big]
+    finally:
+        s.close()
+    # The read size doubles per retry: ~log2(size / chunk) passes, not one per 64-byte chunk.
+    assert len(calls) < 20
+
+
+def test_table_from_json_and_wowexport_csv(tmp_path):
+    (tmp_path / "objects").mkdir()
+    (tmp_path / "placements").mkdir()
+    payload = {"wmo": [{"model": "castle.wmo", "position": {"x": 5, "y": 1, "z": 700}}], "m2": [{"model": "tree.m2"}]}
+    (tmp_path / "objects" / "a.json").write_text(json.dumps(payload), encoding="utf-8")
+    (tmp_path / "placements" / "adt_32_48_ModelPlacementInformation.csv").write_text(
+        "ModelFile;PositionX;PositionY;PositionZ;RotationX;RotationY;RotationZ;ScaleFactor;ModelId;Type\n"
+        "tree.m2;600;3;10;0;90;0;0.5;11;m2\n"
+        "tower.wmo;10;4;20;0;0;0;1;12;wmo\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "objects" / "broken.json").write_text('[{"type": "wmo"}, {"type": ', encoding="utf-8")
+
+    table = load_placement_table(tmp_path)
+    assert table.summary() == {"source_files": 3, "entries": 4, "wmo": 2, "m2": 2}
+    assert table.models[table.model[1]] == table.models[table.model[2]] == "tree.m2"
+    np.testing.assert_allclose(table.position[2], [600, 3, 10])
+    np.testing.assert_allclose(table.rotation[2], [0, 90, 0])
+    assert table.scale[2] == 0.5
+    assert list(table.kind) == [KIND_WMO, KIND_M2, KIND_M2, KIND_WMO]
+
+    index = PlacementIndex.build(table, shape=(1024, 1024), tile_size=512)
+    assert list(index.lookup(0, 1)) == [0]
+    assert sorted(index.lookup(0, 0)) == [1, 3]
+    assert list(index.lookup(1, 0)) == [2]
+    assert index.lookup(1, 1).size == 0
+    assert index.lookup(5, 5).size == 0
+
+    small = PlacementIndex.build(table, shape=(512, 512), tile_size=512)
+    assert small.outside == 2
+
+    # A 2048 px heightmap resampled to 1024: castle (5, 700) and tree (600, 10) move with the grid.
+    grid = table.to_grid((2048, 2048), (1024, 1024))
+    np.testing.assert_allclose(grid.position[:, 1], table.position[:, 1])
+    resampled = PlacementIndex.build(grid, shape=(1024, 1024), tile_size=512)
+    assert sorted(resampled.lookup(0, 0)) == [0, 1, 2, 3]
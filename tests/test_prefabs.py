@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import csv
+
+import numpy as np
+
+from hyimporter.placements import load_placement_table
+from hyimporter.prefabs import build_prefab_library, write_tile_placement_list
+
+
+def _write_inputs(root):
+    (root / "models" / "world").mkdir(parents=True)
+    (root / "models" / "world" / "tree.obj").write_text(
+        "v -1 0 -1\nv 1 0 -1\nv 1 0 1\nv -1 0 1\nv 0 6 0\nf 1 2 5\nf 2 3 5\nf 3 4 5\nf 4 1 5\n",
+        encoding="utf-8",
+    )
+    (root / "placements").mkdir()
+    (root / "placements" / "doodads.csv").write_text(
+        "type,model,pos_x,pos_y,pos_z,rot_x,rot_y,rot_z,scale\n"
+        "m2,World\\tree.m2,10,40,20,0,0,0,1\n"
+        "m2,World\\tree.m2,30,41,25,0,2,0,1\n"
+        "m2,World\\tree.m2,50,42,30,0,91,0,1\n"
+        "m2,World\\bush.m2,60,42,30,0,0,0,1\n",
+        encoding="utf-8",
+    )
+
+
+def test_instances_share_prefabs_and_reuse_cached_files(tmp_path):
+    _write_inputs(tmp_path)
+    table = load_placement_table(tmp_path)
+    rows = np.arange(len(table))
+    out = tmp_path / "prefabs"
+
+    lib = build_prefab_library(table, rows, tmp_path / "models", out, rotation_step=90.0)
+    assert lib.stats == {"instances": 3, "unique": 2, "voxelized": 2, "cached": 0, "missing_models": 1}
+    assert lib.instance_prefab[0] == lib.instance_prefab[1] != lib.instance_prefab[2]
+    assert lib.instance_prefab[3] == -1
+    assert len(list(out.glob("*.schematic"))) == 2
+
+    again = build_prefab_library(table, rows, tmp_path / "models", out, rotation_step=90.0)
+    assert again.stats["voxelized"] == 0 and again.stats["cached"] == 2
+    assert [p.name for p in again.prefabs] == [p.name for p in lib.prefabs]
+
+    # Another block id (or BO2 output) is a different prefab, not a cache hit.
+    other = build_prefab_library(table, rows, tmp_path / "models", out, rotation_step=90.0, block_id=4)
+    assert other.stats["voxelized"] == 2
+    assert not {p.name for p in other.prefabs} & {p.name for p in lib.prefabs}
+
+    prefab = lib.prefabs[0]
+    assert prefab.origin == (1, 0, 1)
+    y = np.full((64, 64), 90, dtype=np.int16)
+    y[10, 20] = 57
+    n = write_tile_placement_list(tmp_path / "t.csv", lib, table, rows, tile_origin=(0, 16), y=y)
+    assert n == 3
+    with (tmp_path / "t.csv").open("r", encoding="utf-8", newline="") as f:
+        first = next(csv.DictReader(f))
+    assert first["prefab"] == prefab.name
+    assert (int(first["x"]), int(first["y"]), int(first["z"])) == (10 - 1, 57 - 0, 20 - 1 - 16)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import imageio.v3 as iio
+import numpy as np
+
+from hyimporter.config import PipelineConfig
+from hyimporter.preflight import run_preflight
+
+
+def _cfg(tmp_path) -> PipelineConfig:
+    cfg = PipelineConfig()
+    cfg.project.map_name = "zone"
+    cfg.paths.input_root = str(tmp_path / "input")
+    cfg.paths.output_root = str(tmp_path / "output")
+    return cfg
+
+
+def test_preflight_reports_headers_and_estimates(tmp_path):
+    cfg = _cfg(tmp_path)
+    root = tmp_path / "input" / "zone"
+    (root / "height").mkdir(parents=True)
+    (root / "weights").mkdir()
+    iio.imwrite(root / "height" / "height.png", np.zeros((96, 128), dtype=np.uint16))
+    iio.imwrite(root / "weights" / "grass.png", np.zeros((48, 64), dtype=np.uint8))
+    iio.imwrite(root / "weights" / "rock.png", np.zeros((48, 64), dtype=np.uint8))
+    iio.imwrite(root / "weights" / "lava.png", np.zeros((48, 64), dtype=np.uint8))
+
+    report = run_preflight(cfg)
+    assert report["ok"] is True
+    assert report["height"]["bit_depth"] == 16
+    assert report["height"]["shape"] == [96, 128]
+    assert sorted(report["weights"]) == ["grass", "lava", "rock"]
+    assert report["target_shape"] == [96, 128]
+    assert report["estimated_ram_bytes"]["total"] > 0
+    assert report["estimated_output_bytes"]["tiles"] == 1
+    assert any("lava" in w for w in report["warnings"])
+
+
+def test_preflight_flags_8bit_height_and_mixed_weight_sizes(tmp_path):
+    cfg = _cfg(tmp_path)
+    root = tmp_path / "input" / "zone"
+    (root / "height").mkdir(parents=True)
+    (root / "weights").mkdir()
+    iio.imwrite(root / "height" / "height.png", np.zeros((32, 32), dtype=np.uint8))
+    iio.imwrite(root / "weights" / "grass.png", np.zeros((32, 32), dtype=np.uint8))
+    iio.imwrite(root / "weights" / "rock.png", np.zeros((16, 16), dtype=np.uint8))
+
+    report = run_preflight(cfg)
+    assert report["ok"] is False
+    assert any("8-bit" in e for e in report["errors"])
+
+    report = run_preflight(cfg, allow_8bit_override=True)
+    assert report["ok"] is True
+    assert any("different shapes" in w for w in report["warnings"])
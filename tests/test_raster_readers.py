@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from hyimporter.height_fit import fit_height_to_budget
+from hyimporter.io_images import load_height_image, load_weight_maps_topk
+from hyimporter.rasters import TiledTiffRaster, open_raster
+from hyimporter.topk_weights import topk_from_dense
+
+
+def _height(h: int = 96, w: int = 80) -> np.ndarray:
+    yy, xx = np.mgrid[0:h, 0:w]
+    return ((np.sin(xx / 9.0) + np.cos(yy / 7.0) + 2.0) * 15000.0).astype(np.uint16)
+
+
+def test_npy_and_r16_heights_are_memory_mapped(tmp_path):
+    arr = _height(64, 64)
+    np.save(tmp_path / "height.npy", arr)
+    arr.astype("<u2").tofile(tmp_path / "height.r16")
+
+    for name in ("height.npy", "height.r16"):
+        h, meta = load_height_image(tmp_path / name)
+        assert isinstance(h, np.memmap) or isinstance(getattr(h, "base", None), np.memmap)
+        assert h.dtype == np.uint16
+        assert meta["bit_depth"] == 16
+        np.testing.assert_array_equal(np.asarray(h), arr)
+
+        y, _ = fit_height_to_budget(h)
+        y_ref, _ = fit_height_to_budget(arr.astype(np.float32))
+        np.testing.assert_array_equal(y, y_ref)
+
+
+def test_r16_shape_sidecar(tmp_path):
+    arr = _height(48, 80)
+    arr.astype("<u2").tofile(tmp_path / "height.r16")
+    with pytest.raises(ValueError):
+        open_raster(tmp_path / "height.r16")
+    (tmp_path / "height.json").write_text('{"shape": [48, 80]}', encoding="utf-8")
+    np.testing.assert_array_equal(np.asarray(open_raster(tmp_path / "height.r16")), arr)
+
+
+def test_tiled_tiff_window_reads_match_full_decode(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+    arr = _height()
+    path = tmp_path / "height.tif"
+    tifffile.imwrite(path, arr, tile=(32, 32), compression="zlib")
+
+    r = open_raster(path)
+    assert isinstance(r, TiledTiffRaster)
+    assert r.shape == arr.shape
+    np.testing.assert_array_equal(r[10:70, 5:77], arr[10:70, 5:77])
+    np.testing.assert_array_equal(r[::3, 40:], arr[::3, 40:])
+    np.testing.assert_array_equal(np.asarray(r), arr)
+
+
+def test_striped_compressed_tiff_is_decoded_whole(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+    arr = _height()
+    tifffile.imwrite(tmp_path / "height.tif", arr, compression="zlib")
+
+    h, meta = load_height_image(tmp_path / "height.tif")
+    assert h.dtype == np.uint16 and meta["bit_depth"] == 16
+    np.testing.assert_array_equal(np.asarray(h), arr)
+
+
+def test_topk_weights_from_npy_layers_match_dense(tmp_path):
+    rng = np.random.default_rng(3)
+    dense = {n: rng.random((40, 36)).astype(np.float32) for n in ("dirt", "grass", "rock")}
+    for n, v in dense.items():
+        np.save(tmp_path / f"{n}.npy", v)
+
+    tk = load_weight_maps_topk(tmp_path, k=2)
+    ref = topk_from_dense(dense, k=2)
+    assert tk.layers == ref.layers
+    np.testing.assert_array_equal(tk.indices, ref.indices)
+    np.testing.assert_array_equal(tk.values, ref.values)
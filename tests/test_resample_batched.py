@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import numpy as np
+from skimage.transform import resize, resize_local_mean
+
+from hyimporter.resample import nearest_gather, resample_masks, resample_weights
+
+
+def test_stacked_weight_resample_matches_per_layer():
+    rng = np.random.default_rng(4)
+    weights = {n: rng.random((90, 70)).astype(np.float32) for n in ("dirt", "grass", "rock")}
+    weights["sand"] = rng.random((45, 35)).astype(np.float32)
+
+    up = resample_weights(weights, (180, 150), renormalize=False)
+    down = resample_weights(weights, (40, 30), renormalize=False)
+    assert list(up) == list(weights)
+    for name, v in weights.items():
+        ref_up = resize(v, (180, 150), order=1, mode="reflect", anti_aliasing=True, preserve_range=True)
+        np.testing.assert_allclose(up[name], np.clip(ref_up, 0, 1), atol=1e-6)
+        np.testing.assert_allclose(down[name], np.clip(resize_local_mean(v, (40, 30)), 0, 1), atol=1e-6)
+
+
+def test_mask_gather_matches_order0_resize_without_float_copy():
+    rng = np.random.default_rng(8)
+    for src, dst in [((37, 53), (100, 81)), ((120, 90), (33, 47)), ((64, 64), (64, 200))]:
+        m = rng.random(src) < 0.3
+        ref = resize(m.astype(np.float32), dst, order=0, mode="edge", anti_aliasing=False, preserve_range=True) > 0.5
+        out = resample_masks({"river": m}, dst)["river"]
+        assert out.dtype == np.bool_
+        np.testing.assert_array_equal(out, ref)
+
+    u8 = (rng.random((20, 30)) < 0.5).astype(np.uint8) * 255
+    assert nearest_gather(u8, (41, 17)).dtype == np.uint8
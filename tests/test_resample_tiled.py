@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import numpy as np
+from scipy import ndimage
+from skimage.transform import resize
+
+from hyimporter.height_fit import fit_height_to_budget
+from hyimporter.resample import resample_height
+
+
+def _global(height, shape):
+    out = resize(height, shape, order=3, mode="reflect", anti_aliasing=True, preserve_range=True)
+    return out.astype(np.float32)
+
+
+def test_banded_resample_matches_global_resize():
+    rng = np.random.default_rng(12)
+    cases = [
+        ((150, 130), (300, 260), np.uint16),
+        ((240, 200), (90, 110), np.uint16),
+        ((181, 120), (400, 70), np.float32),
+    ]
+    for src, dst, dtype in cases:
+        height = ndimage.gaussian_filter(rng.random(src) * 4000.0, 2.0).astype(dtype)
+        ref = _global(height, dst)
+        for workers, chunk_rows in [(1, 512), (1, 37), (3, 16)]:
+            out = resample_height(height, dst, workers=workers, chunk_rows=chunk_rows)
+            assert out.dtype == np.float32
+            np.testing.assert_allclose(out, ref, rtol=0, atol=1e-3)
+
+        y_ref, _ = fit_height_to_budget(ref)
+        y, _ = fit_height_to_budget(resample_height(height, dst, workers=3, chunk_rows=16))
+        np.testing.assert_array_equal(y, y_ref)
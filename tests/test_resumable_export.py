@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+import hyimporter.export as export
+from hyimporter.meshing_obj import MeshData, write_obj
+
+
+def test_interrupted_write_keeps_previous_file(tmp_path):
+    path = tmp_path / "tile_0_0.obj"
+    write_obj(path, MeshData(vertices=[(0.0, 0.0, 0.0)], faces=[]))
+    before = path.read_text(encoding="utf-8")
+
+    with pytest.raises(ValueError):
+        write_obj(path, MeshData(vertices=[(1.0, 2.0, 3.0), (1.0, 2.0)], faces=[]))
+    assert path.read_text(encoding="utf-8") == before
+    assert [p.name for p in tmp_path.iterdir()] == ["tile_0_0.obj"]
+
+
+def test_written_file_is_fsynced_before_it_replaces_the_target(tmp_path, monkeypatch):
+    import os
+
+    calls = []
+    real_fsync, real_replace = os.fsync, os.replace
+    monkeypatch.setattr(os, "fsync", lambda fd: (calls.append("fsync"), real_fsync(fd))[1])
+    monkeypatch.setattr(os, "replace", lambda a, b: (calls.append("replace"), real_replace(a, b))[1])
+
+    write_obj(tmp_path / "tile_0_0.obj", MeshData(vertices=[(0.0, 0.0, 0.0)], faces=[]))
+    assert calls[:2] == ["fsync", "replace"]
+    assert "v 0.000000" in (tmp_path / "tile_0_0.obj").read_text(encoding="utf-8")
+
+
+def test_resume_exports_only_unfinished_tiles(tmp_path, monkeypatch, export_cfg):
+    cfg = export_cfg
+    cfg.runtime.async_tile_export = False
+    y = (np.arange(1030 * 520, dtype=np.int32).reshape(1030, 520) % 320).astype(np.int16)
+    labels = np.zeros_like(y)
+    out_dir = tmp_path / "tiles"
+    fp_path = tmp_path / "runbook" / "tile_fingerprints.json"
+    manifest = tmp_path / "runbook" / "tile_manifest.csv"
+
+    real_export = export._export_single_tile
+    monkeypatch.setattr(export, "_JOURNAL_FLUSH_S", 0.0)
+
+    def crash_at_tile_1_0(cfg, t, *args):
+        if (t.i, t.j) == (1, 0):
+            raise KeyboardInterrupt
+        return real_export(cfg, t, *args)
+
+    def run(resume):
+        stats = {}
+        export._export_tiles(
+            cfg,
+            y,
+            labels,
+            out_dir,
+            [],
+            journal=export._TileJournal(fp_path, manifest_path=manifest, resume=resume),
+            export_stats=stats,
+        )
+        return stats
+
+    monkeypatch.setattr(export, "_export_single_tile", crash_at_tile_1_0)
+    with pytest.raises(KeyboardInterrupt):
+        run(resume=False)
+    assert len(manifest.read_text(encoding="utf-8").splitlines()) == 1 + 2
+
+    monkeypatch.setattr(export, "_export_single_tile", real_export)
+    stats = run(resume=True)
+    assert (stats["exported"], stats["reused"], stats["resumed"]) == (4, 2, 1)
+    assert len(manifest.read_text(encoding="utf-8").splitlines()) == 1 + 6
+
+    # Without --resume, tiles journaled by an interrupted export are not trusted.
+    (out_dir / "tile_1_0.meta.json").unlink()
+    monkeypatch.setattr(export, "_export_single_tile", crash_at_tile_1_0)
+    with pytest.raises(KeyboardInterrupt):
+        run(resume=False)
+    monkeypatch.setattr(export, "_export_single_tile", real_export)
+    assert run(resume=False)["exported"] == 6
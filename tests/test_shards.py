@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import csv
+from pathlib import Path
+
+import pytest
+
+from hyimporter.build import parse_shard, parse_tile_list
+from hyimporter.config import PipelineConfig, map_output_dir
+from hyimporter.export import merge_shards, run_pipeline
+from hyimporter.tile_costs import assign_shards
+
+
+def _manifest(cfg: PipelineConfig):
+    with (map_output_dir(cfg) / "runbook" / "tile_manifest.csv").open("r", encoding="utf-8", newline="") as f:
+        return [(r["tile_i"], r["tile_j"], Path(r["tile_schematic"]).name) for r in csv.DictReader(f)]
+
+
+def test_sharded_build_merges_to_the_single_host_result(map_cfg):
+    single_cfg = map_cfg("single")
+    single = run_pipeline(single_cfg)
+
+    cfg = map_cfg("sharded")
+    reports = [run_pipeline(cfg, shard=(k, 3)) for k in (1, 2, 3)]
+    tiles = [tuple(t) for r in reports for t in r["tiles"]]
+    assert len(tiles) == len(set(tiles)) == single["tile_export"]["tiles"] == 12
+    assert not (map_output_dir(cfg) / "qa" / "summary.json").exists()
+
+    merged = merge_shards(cfg)
+    assert merged["tile_export"]["shards"] == 3 and merged["tile_export"]["exported"] == 12
+    assert merged["qa"] == single["qa"]
+    assert merged["warnings"] == single["warnings"]
+    assert _manifest(cfg) == _manifest(single_cfg)
+    assert (map_output_dir(cfg) / "qa" / "summary.json").exists()
+
+
+def test_merge_ignores_leftover_shards_and_reports_missing_tiles(map_cfg):
+    cfg = map_cfg("partial")
+    run_pipeline(cfg, shard=(1, 2))
+    with pytest.raises(RuntimeError, match=r"not exported by any shard.*--tiles"):
+        merge_shards(cfg)
+
+    # An old --tiles run overlapping the shards and a shard from other settings do not block the merge.
+    run_pipeline(cfg, tiles=[(0, 0)])
+    stale = map_output_dir(cfg) / "runbook" / "shards" / "old_inputs"
+    stale.mkdir()
+    (stale / "shard.json").write_text('{"key": "other", "tiles": [[0, 0]]}', encoding="utf-8")
+    run_pipeline(cfg, shard=(2, 2))
+    merged = merge_shards(cfg)
+    assert merged["tile_export"]["tiles"] == 12
+    assert len(_manifest(cfg)) == 12
+    assert any("Ignoring shard old_inputs" in w for w in merged["warnings"])
+
+
+def test_shard_parsing_and_balanced_assignment():
+    assert parse_shard("2/4") == (2, 4)
+    assert parse_tile_list("tile_0_1,2_3") == [(0, 1), (2, 3)]
+    costs = {(0, 0): 5.0, (0, 1): 4.0, (1, 0): 3.0, (1, 1): 2.0, (2, 0): 1.0}
+    shards = assign_shards(costs, 2)
+    assert sorted(k for s in shards for k in s) == sorted(costs)
+    assert [sum(costs[k] for k in s) for s in shards] == [8.0, 7.0]
+
+
+def test_shard_resume_sweeps_only_its_own_temp_files(map_cfg):
+    cfg = map_cfg("sweep")
+    tiles_dir = map_output_dir(cfg) / "tiles"
+    tiles_dir.mkdir(parents=True)
+    mine = tiles_dir / ".tile_0_0.schematic.11.22.partial"
+    other = tiles_dir / ".tile_0_1.schematic.33.44.partial"
+    mine.write_bytes(b"")
+    other.write_bytes(b"")
+    report = run_pipeline(cfg, tiles=[(0, 0)], resume=True)
+    assert report["tile_export"]["stale_temp_files"] == 1
+    assert not mine.exists() and other.exists()
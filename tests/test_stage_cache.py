@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+
+import imageio.v3 as iio
+import numpy as np
+import pytest
+
+import hyimporter.stage_cache as stage_cache
+from hyimporter.config import map_input_dir
+from hyimporter.export import run_pipeline
+from hyimporter.pipeline_stages import PipelineInputs, stage_chain
+from hyimporter.stage_cache import Stage, StageCache
+
+
+def test_rerun_resumes_from_latest_cached_stage(map_cfg):
+    cfg = map_cfg()
+    first = run_pipeline(cfg)
+    assert set(first["stage_cache"]["stages"].values()) == {"miss"}
+
+    second = run_pipeline(cfg)
+    assert second["stage_cache"]["stages"]["cleanup"] == "hit"
+    assert second["stage_cache"]["stages"]["fit"] == "skipped"
+    assert second["input_decode"] is None
+    for key in ("height_input", "height_fit", "height_stats", "qa", "hydrology", "noise", "palette_match", "weights"):
+        assert second[key] == first[key]
+
+    cfg.materials.island_min_area = 8
+    third = run_pipeline(cfg)
+    assert third["stage_cache"]["stages"]["materials"] == "hit"
+    assert third["stage_cache"]["stages"]["cleanup"] == "miss"
+
+
+def test_eviction_keeps_entries_used_by_this_run(tmp_path):
+    arrays = {"y": np.zeros((64, 64), dtype=np.int16)}
+    old = StageCache(tmp_path, max_bytes=0)
+    old.save("fit", old.key("a"), (arrays, {}))
+    old.save("fit", old.key("b"), (arrays, {}))
+
+    cache = StageCache(tmp_path, max_bytes=10_000)
+    stages = [Stage("fit", cache.key("b"), lambda prev: (arrays, {})), Stage("noise", cache.key("c"), lambda prev: prev)]
+    cache.run_chain(stages)
+    assert cache.status == {"fit": "hit", "noise": "miss"}
+    assert cache.evict() == 1
+    assert cache.load("fit", cache.key("a")) is None
+    assert cache.load("fit", cache.key("b")) is not None
+
+
+def test_input_resampling_is_scheduled_only_when_materials_recompute(map_cfg):
+    cfg = map_cfg()
+    cfg.runtime.tile_workers = 2
+    first = run_pipeline(cfg)
+    assert "resample_inputs" in first["stage_graph"]
+    assert {"terrain", "tiles", "summary", "runbook"} <= set(first["stage_graph"])
+
+    second = run_pipeline(cfg)
+    assert "resample_inputs" not in second["stage_graph"]
+    assert second["qa"] == first["qa"]
+
+
+def test_cached_8bit_override_does_not_bypass_the_policy(map_cfg):
+    cfg = map_cfg()
+    height = map_input_dir(cfg) / "height" / "height.png"
+    iio.imwrite(height, (np.arange(200 * 180).reshape(200, 180) % 256).astype(np.uint8))
+    assert run_pipeline(cfg, allow_8bit_override=True)["height_input"]["is_8bit"]
+    with pytest.raises(ValueError, match="8-bit"):
+        run_pipeline(cfg)
+
+
+def test_stage_keys_follow_only_the_code_each_stage_runs(tmp_path, monkeypatch, map_cfg):
+    cfg = map_cfg()
+    cfg.noise.enabled = True
+    cache = StageCache(tmp_path / "stages", max_bytes=0)
+
+    def keys():
+        return {s.name: s.key for s in stage_chain(cfg, cache, PipelineInputs(cfg, False))}
+
+    before = keys()
+    real = stage_cache._module_digest
+
+    def edited(*names):
+        monkeypatch.setattr(stage_cache, "_module_digest", lambda m: real(m) + ("*" if m in names else ""))
+        after = keys()
+        monkeypatch.setattr(stage_cache, "_module_digest", real)
+        return [name for name in before if after[name] != before[name]]
+
+    assert edited("export", "tile_scheduler", "shards") == []
+    assert edited("noise") == ["noise", "materials", "cleanup"]
+    assert edited("tile_cleanup") == ["cleanup"]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from hyimporter.stage_graph import StageGraph
+
+
+def _graph(barrier=None):
+    order = []
+
+    def stage(name, value):
+        def run(**deps):
+            if barrier is not None and name in ("a", "b"):
+                barrier.wait(timeout=10)
+            order.append(name)
+            return value + sum(deps.values())
+
+        return run
+
+    g = StageGraph()
+    g.add("a", stage("a", 1))
+    g.add("b", stage("b", 10))
+    g.add("c", stage("c", 100), deps=("a", "b"))
+    g.add("d", stage("d", 1000), deps=("c",))
+    return g, order
+
+
+def test_independent_stages_overlap_and_dependents_get_results():
+    # "a" and "b" each wait for the other, so this only finishes if they run concurrently.
+    g, order = _graph(threading.Barrier(2))
+    results = g.run(workers=2)
+    assert results == {"a": 1, "b": 10, "c": 111, "d": 1111}
+    assert order[2:] == ["c", "d"]
+    assert set(g.timings) == {"a", "b", "c", "d"}
+
+
+def test_single_worker_runs_in_insertion_order():
+    g, order = _graph()
+    assert g.run(workers=1)["d"] == 1111
+    assert order == ["a", "b", "c", "d"]
+
+
+def test_stage_errors_propagate_and_skip_dependents():
+    g = StageGraph()
+    g.add("ok", lambda: 1)
+    g.add("bad", lambda: 1 / 0)
+    ran = []
+    g.add("after", lambda bad: ran.append(bad), deps=("bad",))
+    with pytest.raises(ZeroDivisionError):
+        g.run(workers=2)
+    assert ran == []
+
+    with pytest.raises(ValueError, match="unknown"):
+        g.add("late", lambda: 0, deps=("missing",))
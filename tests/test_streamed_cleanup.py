@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import gzip
+
+from hyimporter.config import PipelineConfig, map_output_dir
+from hyimporter.export import run_pipeline
+from hyimporter.tile_cleanup import CleanupStream
+
+
+def _cfg(map_cfg, out: str) -> PipelineConfig:
+    cfg = map_cfg(out)
+    cfg.outputs.export_bo2 = True
+    cfg.runtime.tile_workers = 2
+    return cfg
+
+
+def _outputs(cfg: PipelineConfig):
+    tiles = map_output_dir(cfg) / "tiles"
+    return {
+        p.name: gzip.decompress(p.read_bytes()) if p.suffix == ".schematic" else p.read_bytes()
+        for p in sorted(tiles.iterdir())
+        if p.suffix in (".schematic", ".bo2")
+    }
+
+
+def test_tiles_release_once_their_expanded_window_is_clean():
+    cfg = PipelineConfig()
+    cfg.tiling.tile_size = 64
+    cfg.tiling.overlap = 8
+    stream = CleanupStream(cfg, (192, 192))
+    assert stream.done((0, 0), 0.0) == []
+    assert stream.done((0, 1), 0.0) == []
+    assert stream.done((1, 0), 0.0) == []
+    assert [(t.i, t.j) for t in stream.done((1, 1), 0.0)] == [(0, 0)]
+    # Corner tiles have no neighbours past the map edge to wait for.
+    stream.done((0, 2), 0.0)
+    assert [(t.i, t.j) for t in stream.done((1, 2), 0.0)] == [(0, 1), (0, 2)]
+
+
+def test_streamed_cleanup_matches_the_staged_build(map_cfg):
+    staged_cfg = _cfg(map_cfg, "staged")
+    staged_cfg.runtime.stream_cleanup = False
+    staged = run_pipeline(staged_cfg)
+    assert "stream" not in staged["tile_export"]
+
+    cfg = _cfg(map_cfg, "streamed")
+    cfg.runtime.tile_queue_depth = 1
+    streamed = run_pipeline(cfg)
+    stream = streamed["tile_export"]["stream"]
+    # Cleanup stops at one waiting tile; each of the two in-flight cleanups can still complete up to four
+    # windows (its own and those of the tiles before it).
+    assert stream["queue_depth"] == 1 and stream["max_queued"] <= 1 + 2 * 4
+    assert stream["first_release_s"] is not None and stream["first_tile_s"] is not None
+    assert streamed["qa"] == staged["qa"]
+    assert streamed["stage_cache"]["stages"]["cleanup"] == "miss"
+    assert _outputs(cfg) == _outputs(staged_cfg)
+
+    # The streamed cleanup was stored, so the rerun reads it back and reuses every tile.
+    cfg.runtime.tile_executor = "thread"
+    rerun = run_pipeline(cfg)
+    assert rerun["stage_cache"]["stages"]["cleanup"] == "hit"
+    assert "stream" not in rerun["tile_export"]
+    assert rerun["tile_export"]["reused"] == 12 and rerun["qa"] == staged["qa"]
+
+
+def test_streamed_cleanup_on_threads(map_cfg):
+    staged_cfg = _cfg(map_cfg, "staged")
+    staged_cfg.runtime.stream_cleanup = False
+    staged_cfg.runtime.tile_executor = "thread"
+    staged = run_pipeline(staged_cfg)
+
+    cfg = _cfg(map_cfg, "threads")
+    cfg.runtime.tile_executor = "thread"
+    streamed = run_pipeline(cfg)
+    assert streamed["tile_export"]["stream"]["queue_depth"] == 4
+    assert streamed["qa"] == staged["qa"]
+    assert _outputs(cfg) == _outputs(staged_cfg)
@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import csv
+
+import numpy as np
+
+import hyimporter.export as export
+from hyimporter.config import PipelineConfig
+from hyimporter.tile_costs import TileCostModel, estimate_part_cost, tile_cost_features
+from hyimporter.tiling import build_tiles
+
+
+def test_estimates_grow_with_relief_and_layers():
+    cfg = PipelineConfig()
+    model = TileCostModel()
+    t = build_tiles((64, 64), tile_size=64, overlap=0)[0]
+    flat = tile_cost_features(cfg, t, np.full((64, 64), 10, dtype=np.int16), np.zeros((64, 64), dtype=np.int16))
+    cliff_y = np.where(np.arange(64)[:, None] < 32, 10, 250).repeat(64, axis=1).astype(np.int16)
+    mixed = tile_cost_features(cfg, t, cliff_y, (np.arange(64 * 64).reshape(64, 64) % 3).astype(np.int16))
+
+    assert (flat.relief, mixed.relief) == (0, 240)
+    assert sorted(mixed.layer_cells) == [0, 1, 2]
+    assert estimate_part_cost(model, cfg, mixed, "schematic") > estimate_part_cost(model, cfg, flat, "schematic")
+    assert estimate_part_cost(model, cfg, mixed, "shell:1") < estimate_part_cost(model, cfg, flat, "shell:0")
+
+
+def test_largest_tiles_are_submitted_first_and_costs_logged(tmp_path, monkeypatch, export_cfg):
+    cfg = export_cfg
+    cfg.runtime.tile_executor = "thread"
+    cfg.runtime.tile_workers = 2
+
+    # Row tiles are 512, 512 and 6 deep and column tiles 512 and 8 wide: only two are full size.
+    y = (np.arange(1030 * 520, dtype=np.int32).reshape(1030, 520) % 50).astype(np.int16)
+    labels = np.zeros_like(y)
+    started = []
+    real = export._export_single_tile
+
+    def record(cfg, t, *args, **kwargs):
+        started.append((t.i, t.j))
+        return real(cfg, t, *args, **kwargs)
+
+    monkeypatch.setattr(export, "_export_single_tile", record)
+    log = tmp_path / "tile_costs.csv"
+    stats = {}
+    export._export_tiles(cfg, y, labels, tmp_path / "tiles", [], export_stats=stats, cost_log_path=log)
+
+    assert set(started[:2]) == {(0, 0), (1, 0)}
+    with log.open("r", encoding="utf-8", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 6
+    full = [r for r in rows if r["cells"] == str(512 * 512)]
+    assert len(full) == 2 and all(float(r["actual_s"]) > 0 and float(r["estimated_s"]) > 0 for r in full)
+    assert stats["estimated_s"] > 0 and stats["actual_s"] > 0
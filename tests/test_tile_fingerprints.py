@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import numpy as np
+
+from hyimporter.export import _TileJournal, _export_tiles
+
+
+def test_only_changed_tiles_are_reexported(tmp_path, export_cfg):
+    cfg = export_cfg
+    cfg.runtime.tile_workers = 2
+    y = (np.arange(1030 * 520, dtype=np.int32).reshape(1030, 520) % 320).astype(np.int16)
+    labels = np.zeros_like(y, dtype=np.int16)
+    out_dir = tmp_path / "tiles"
+    fp_path = tmp_path / "runbook" / "tile_fingerprints.json"
+
+    def export(y, labels):
+        stats = {}
+        rows, grids = _export_tiles(cfg, y, labels, out_dir, [], journal=_TileJournal(fp_path), export_stats=stats)
+        return rows, grids, stats
+
+    rows, grids, stats = export(y, labels)
+    assert {k: v for k, v in stats.items() if k != "memory"} == {"tiles": 6, "exported": 6, "reused": 0, "resumed": 0}
+
+    rows2, grids2, stats = export(y, labels)
+    assert stats["reused"] == 6
+    assert rows2 == rows
+    for key in grids:
+        np.testing.assert_array_equal(grids2[key], grids[key])
+
+    labels = labels.copy()
+    labels[700:720, 100:120] = 2
+    _rows, _grids, stats = export(y, labels)
+    assert stats["exported"] == 1
+
+    (out_dir / "tile_0_1.meta.json").unlink()
+    _rows, _grids, stats = export(y, labels)
+    assert stats["exported"] == 1 and (out_dir / "tile_0_1.meta.json").exists()
+
+    cfg.hytale.default_import_height = 256
+    _rows, _grids, stats = export(y, labels)
+    assert stats["exported"] == 6
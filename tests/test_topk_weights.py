@@ -0,0 +1,117 @@
+import numpy as np
+
+from hyimporter.materials import assign_material_labels
+from hyimporter.resample import resample_topk, resample_weights
+from hyimporter.topk_weights import topk_from_dense
+
+LAYERS = ["grass", "dirt", "rock", "sand", "snow", "mud", "gravel"]
+
+
+def _dense_weights(h: int = 48, w: int = 40, names=("dirt", "grass", "gravel", "mud", "sand", "rock")):
+    rng = np.random.default_rng(9)
+    weights = {n: (rng.integers(0, 256, size=(h, w)) / 255.0).astype(np.float32) for n in names}
+    # Keep at most four non-zero layers per pixel, like wow.export splats.
+    drop = rng.random((h, w, len(names))).argsort(axis=-1)[..., :2]
+    for i, n in enumerate(names):
+        weights[n][np.any(drop == i, axis=-1)] = 0.0
+    return weights
+
+
+def _classify(weights, shape):
+    labels, _masks, _ = assign_material_labels(
+        y_int=np.full(shape, 150, dtype=np.int16),
+        slope=np.zeros(shape, dtype=np.float32),
+        weights=weights,
+        masks={},
+        layer_names=LAYERS,
+        default_layer="grass",
+        sea_level_y=96,
+        snowline_y=220,
+        beach_band_dy=6,
+        cliff_slope_high=2.2,
+        cliff_slope_low=1.6,
+        chunk_rows=16,
+    )
+    return labels
+
+
+def test_topk_roundtrip_and_memory():
+    dense = _dense_weights()
+    tk = topk_from_dense(dense, k=4)
+    for name, plane in dense.items():
+        np.testing.assert_allclose(tk.plane(name), plane, atol=0.5 / 255.0)
+    assert tk.nbytes * 3 <= sum(v.nbytes for v in dense.values())
+
+
+def test_topk_labels_match_dense_argmax():
+    dense = _dense_weights()
+    for n in dense:
+        dense[n][:4] = 0.0
+    tk = topk_from_dense(dense, k=4)
+    np.testing.assert_array_equal(_classify(tk, (48, 40)), _classify(dense, (48, 40)))
+
+
+def test_topk_resample_tracks_dense_resample():
+    dense = _dense_weights()
+    for target in ((96, 80), (24, 20)):
+        tk = resample_topk(topk_from_dense(dense, k=4), target)
+        ref = resample_weights(dense, target)
+        agree = np.mean(_classify(tk, target) == _classify(ref, target))
+        assert agree > 0.97
+        sums = np.sum(tk.values.astype(np.int32), axis=-1)
+        assert np.all(np.abs(sums[sums > 0] - 255) <= 3)
+
+
+def test_topk_loading_resamples_mixed_size_layers(tmp_path):
+    import imageio.v3 as iio
+
+    from hyimporter.io_images import load_weight_maps, load_weight_maps_topk
+
+    rng = np.random.default_rng(3)
+    iio.imwrite(tmp_path / "grass.png", rng.integers(0, 256, size=(32, 24)).astype(np.uint8))
+    iio.imwrite(tmp_path / "rock.png", rng.integers(0, 256, size=(16, 12)).astype(np.uint8))
+    tk = load_weight_maps_topk(tmp_path, k=4)
+    assert tk.shape == (32, 24) and tk.layers == ["grass", "rock"]
+    dense = resample_weights(load_weight_maps(tmp_path), (32, 24), renormalize=False)
+    assert np.max(np.abs(tk.plane("rock") - dense["rock"])) <= 1.0 / 255.0 + 1e-6
+
+
+def test_topk_resample_works_in_bands_without_dense_planes():
+    import tracemalloc
+
+    from hyimporter.topk_weights import empty_topk
+
+    rng = np.random.default_rng(0)
+    tk = empty_topk([f"layer{i}" for i in range(12)], (512, 512), 4)
+    tk.indices[:] = rng.integers(0, 12, tk.indices.shape)
+    tk.values[:] = rng.integers(1, 256, tk.values.shape)
+    for target in ((384, 384), (768, 768)):
+        dense_plane_bytes = max(512 * 512, target[0] * target[1]) * 4
+        tracemalloc.start()
+        try:
+            out = resample_topk(tk, target, chunk_rows=32)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        # Besides the output table, only band-sized temporaries: less than one dense float32 plane.
+        assert peak - out.nbytes < dense_plane_bytes
+
+
+def test_topk_loading_reads_a_resampled_layer_band_by_band(tmp_path, monkeypatch):
+    import hyimporter.io_images as io_images
+
+    rng = np.random.default_rng(4)
+    np.save(tmp_path / "grass.npy", rng.random((1024, 96)).astype(np.float32))
+    np.save(tmp_path / "rock.npy", rng.random((512, 48)).astype(np.float32))
+    rows_read = {}
+    real = io_images.Float01Rows.__getitem__
+
+    def recording(self, key):
+        arr = real(self, key)
+        rows_read[self.shape] = max(rows_read.get(self.shape, 0), arr.shape[0])
+        return arr
+
+    monkeypatch.setattr(io_images.Float01Rows, "__getitem__", recording)
+    tk = io_images.load_weight_maps_topk(tmp_path, k=4)
+    assert tk.shape == (1024, 96)
+    assert rows_read[(512, 48)] < 512